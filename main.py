@@ -1,10 +1,12 @@
-from server import mcp
+import anyio
+
+from server import serve
 
 def main():
     print("Hello from my mcp server!")
     
     # Start the MCP server using http transport
-    mcp.run(transport="streamable-http")
+    anyio.run(serve)
 
 if __name__ == "__main__":
     main()
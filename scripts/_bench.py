@@ -0,0 +1,19 @@
+"""Setup shared by the scripts/bench_*.py benchmarks.
+
+Importing it puts the project root on sys.path, so a benchmark run as
+`python scripts/bench_<name>.py` can import `src` from any working directory.
+Each benchmark's docstring is its usage text.
+"""
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+
+def require_args(usage: str, n: int = 1):
+    """Exits with the usage text unless at least `n` command-line arguments were given."""
+    if len(sys.argv) <= n:
+        sys.exit(usage.strip())
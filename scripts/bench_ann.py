@@ -0,0 +1,68 @@
+"""Reports recall@k and latency of the IVF index against exact search.
+
+Usage:
+    python scripts/bench_ann.py [db_path] [--k 10] [--queries 200]
+
+Without a db_path, a temporary index is filled with clustered random vectors.
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+import _bench  # noqa: F401  (puts the project root on sys.path)
+from src.index.ann import IVFIndex, recall_at_k
+from src.index.core import Index
+from src.index.search import VectorSearch
+
+
+def synthetic_index(directory: str, n_nodes: int, dim: int, seed: int = 0) -> Index:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, n_nodes // 500), dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), n_nodes)] + 0.5 * rng.standard_normal((n_nodes, dim)).astype(np.float32)
+    doc = Path(directory, 'synthetic.pdf')
+    doc.write_bytes(b'synthetic')
+    index = Index(str(Path(directory, 'bench.db')))
+    index.index_doc(str(doc), [{'node_id': str(i), 'embedding': v.tobytes(), 'metadata': {}} for i, v in enumerate(vectors)])
+    return index
+
+
+def timed(fn, queries, **kwargs) -> float:
+    start = time.perf_counter()
+    for q in queries:
+        fn(q, **kwargs)
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('db_path', nargs='?')
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--nodes', type=int, default=200_000)
+    parser.add_argument('--dim', type=int, default=384)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = Index(args.db_path) if args.db_path else synthetic_index(tmp, args.nodes, args.dim)
+        exact = VectorSearch(index).load()
+        ann = IVFIndex(index, path=str(Path(tmp, 'bench.ivf.npz')))
+        start = time.perf_counter()
+        ann.build()
+        print(f'nodes={len(exact.ids)} lists={len(ann.centroids)} build={time.perf_counter() - start:.2f}s')
+
+        rng = np.random.default_rng(1)
+        queries = exact.matrix.to_float32(rng.choice(len(exact.ids), args.queries)) + 0.05 * rng.standard_normal(
+            (args.queries, exact.matrix.dim)).astype(np.float32)
+
+        print(f'exact        {timed(exact.top_k, queries, k=args.k):7.2f} ms/query')
+        for nprobe in (1, 2, 4, 8, 16, 32):
+            recall = recall_at_k(ann, exact, queries, k=args.k, nprobe=nprobe)
+            latency = timed(ann.top_k, queries, k=args.k, nprobe=nprobe)
+            print(f'nprobe={nprobe:<4d} {latency:7.2f} ms/query  recall@{args.k}={recall:.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Times TopDownSerializeStrategy.merge_elements_into_tuples on large synthetic pages.
+
+Usage:
+    python scripts/bench_merge.py
+
+Builds textmap-like tuple lists with tens of thousands of chars and dozens of
+table/image elements, and compares the one-pass merge against placing the same
+elements with repeated list.insert (the approach it replaced).
+"""
+import random
+import time
+
+import _bench  # noqa: F401  (puts the project root on sys.path)
+from src.pdf.text import TopDownSerializeStrategy
+
+
+def synthetic_page(n_lines: int, chars_per_line: int, n_elements: int, seed: int = 0):
+    rng = random.Random(seed)
+    tuples = []
+    for line in range(n_lines):
+        top = 10 + line * 12
+        for c in range(chars_per_line):
+            tuples.append(('x', {'top': top, 'bottom': top + 10, 'x0': c * 5, 'x1': c * 5 + 5}))
+        tuples.append(('\n', None))
+    elements = [{'content': f'| element {i} |', 'object': {'top': rng.uniform(0, n_lines * 12), 'bot': 0}}
+                for i in range(n_elements)]
+    return tuples, elements
+
+
+def insert_baseline(tuples, elements):
+    tuples = list(tuples)
+    for e in sorted(elements, key=lambda e: e['object']['top']):
+        for i, (text, obj) in enumerate(tuples):
+            if obj is not None and obj['top'] > e['object']['top']:
+                while i > 0 and tuples[i - 1][1] is not None:
+                    i -= 1
+                tuples.insert(i, ('\n' + e['content'] + '\n', None))
+                break
+        else:
+            tuples.append(('\n' + e['content'] + '\n', None))
+    return tuples
+
+
+def main():
+    strategy = TopDownSerializeStrategy()
+    print(f"{'chars':>8} {'elements':>8} {'merge ms':>10} {'insert ms':>10}  same")
+    for n_lines, chars_per_line, n_elements in [(200, 50, 12), (500, 80, 48), (1000, 100, 96)]:
+        tuples, elements = synthetic_page(n_lines, chars_per_line, n_elements)
+        start = time.perf_counter()
+        merged = strategy.merge_elements_into_tuples('ltr', 'ttb', tuples, elements)
+        merge_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        baseline = insert_baseline(tuples, elements)
+        insert_ms = (time.perf_counter() - start) * 1000
+        print(f'{n_lines * chars_per_line:>8} {n_elements:>8} {merge_ms:>10.1f} {insert_ms:>10.1f}  {merged == baseline}')
+
+
+if __name__ == '__main__':
+    main()
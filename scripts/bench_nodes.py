@@ -0,0 +1,94 @@
+"""Memory and construction time of the node models in src/index/schema.py.
+
+Usage:
+    python scripts/bench_nodes.py [n_nodes]
+
+Builds n linked nodes (and their index_doc dicts) three ways: the previous
+TextNode (instance __dict__, uuid4 ids, RelatedNodeInfo objects), the
+__slots__ TextNode, and a NodeBatch. Memory is what tracemalloc still holds
+once the nodes are built, texts excluded.
+"""
+import sys
+import time
+import tracemalloc
+import uuid
+
+import _bench  # noqa: F401  (puts the project root on sys.path)
+from src.index.schema import NodeBatch, NodeRelationship, TextNode
+from src.pdf.extract import link_nodes
+
+
+class LegacyRelatedNodeInfo:
+    def __init__(self, node_id):
+        self.node_id = node_id
+
+
+class LegacyTextNode:
+    def __init__(self, text, metadata=None):
+        self.text = text
+        self.node_id = str(uuid.uuid4())
+        self.metadata = metadata or {}
+        self.relationships = {}
+
+
+def legacy(texts):
+    nodes = [LegacyTextNode(text, {'page': 1}) for text in texts]
+    for i, n in enumerate(nodes):
+        if i > 0:
+            n.relationships[NodeRelationship.PREVIOUS] = LegacyRelatedNodeInfo(nodes[i - 1].node_id)
+        if i < len(nodes) - 1:
+            n.relationships[NodeRelationship.NEXT] = LegacyRelatedNodeInfo(nodes[i + 1].node_id)
+    return nodes
+
+
+def slotted(texts):
+    return link_nodes([TextNode(text, {'page': 1}) for text in texts])
+
+
+def batch(texts):
+    nodes = NodeBatch()
+    for text in texts:
+        nodes.append(text, {'page': 1})
+    return nodes
+
+
+def legacy_to_dicts(nodes):
+    out = []
+    for node in nodes:
+        metadata = dict(node.metadata)
+        for relationship, info in node.relationships.items():
+            metadata[relationship.value] = info.node_id
+        out.append({'node_id': node.node_id, 'text': node.text, 'embedding': None, 'metadata': metadata})
+    return out
+
+
+def measure(build, convert, texts):
+    """(bytes held by the built nodes, build seconds, to-dicts seconds); timed without tracemalloc."""
+    tracemalloc.start()
+    nodes = build(texts)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del nodes
+
+    start = time.perf_counter()
+    nodes = build(texts)
+    build_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    convert(nodes)
+    return size, build_seconds, time.perf_counter() - start
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    texts = [f'node text {i}' for i in range(n)]
+    print(f"{'model':<16} {'bytes/node':>10} {'build s':>8} {'to_dicts s':>10}")
+    for name, build, convert in [
+        ('legacy TextNode', legacy, legacy_to_dicts),
+        ('slots TextNode', slotted, lambda nodes: [node.to_dict() for node in nodes]),
+        ('NodeBatch', batch, lambda nodes: nodes.to_dicts()),
+    ]:
+        size, build_seconds, convert_seconds = measure(build, convert, texts)
+        print(f'{name:<16} {size / n:>10.0f} {build_seconds:>8.2f} {convert_seconds:>10.2f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Reports peak RSS and time of the eager and streaming Pdf pipelines.
+
+Usage:
+    python scripts/bench_pdf_memory.py path/to/doc.pdf [more.pdf ...]
+
+Each mode runs in a fresh subprocess so peak RSS is measured independently.
+The streaming mode's peak should stay flat as the page count grows.
+"""
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from _bench import require_args
+
+
+def run(mode: str, path: str) -> dict:
+    from src.pdf.pdf import Pdf
+
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        if mode == 'eager':
+            pdf = Pdf(path, save_directory=tmp)
+            pages, nodes = len(pdf.pages), len(pdf.nodes)
+        else:
+            pdf = Pdf(path, save_directory=tmp, lazy=True)
+            pages = nodes = 0
+            for page in pdf.iter_pages():
+                page.text  # renders the page's images, as the eager path does
+                pages += 1
+                nodes += len(page.nodes)
+    return {'mode': mode, 'pages': pages, 'nodes': nodes,
+            'seconds': round(time.perf_counter() - start, 2),
+            'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024}
+
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] in ('eager', 'stream'):
+        print(json.dumps(run(sys.argv[1], sys.argv[2])))
+        return
+    require_args(__doc__)
+    for path in sys.argv[1:]:
+        for mode in ('eager', 'stream'):
+            out = subprocess.run([sys.executable, __file__, mode, path], capture_output=True, text=True, check=True)
+            result = json.loads(out.stdout.strip().splitlines()[-1])
+            print(f"{Path(path).name:<24} {result['mode']:<7} pages={result['pages']:<5} nodes={result['nodes']:<6} "
+                  f"{result['seconds']:>7.2f}s  peak_rss={result['peak_rss_mb']} MB")
+
+
+if __name__ == '__main__':
+    main()
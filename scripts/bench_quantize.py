@@ -0,0 +1,83 @@
+"""Storage size, load time, search memory, latency and recall per embedding precision.
+
+Usage:
+    python scripts/bench_quantize.py [--nodes 100000] [--dim 384] [--k 10] [--queries 200]
+
+Fills one temporary index per storage precision (float32, float16, int8) with
+the same clustered random vectors, then for each reports the SQLite file size,
+the time to load the search matrix, the matrix's memory, ms per query and
+recall@k against exact float32 search. The last row keeps a float32 index in
+memory as int8 and re-ranks the top candidates in float32 (`rescore`).
+"""
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+import _bench  # noqa: F401  (puts the project root on sys.path)
+from src.index.core import Index
+from src.index.quantize import PRECISIONS
+from src.index.search import VectorSearch
+
+
+def clustered_vectors(n_nodes: int, dim: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, n_nodes // 500), dim)).astype(np.float32)
+    return centers[rng.integers(0, len(centers), n_nodes)] + 0.5 * rng.standard_normal((n_nodes, dim)).astype(np.float32)
+
+
+def build_index(directory: str, vectors: np.ndarray, precision: str) -> Index:
+    doc = Path(directory, f'{precision}.pdf')
+    doc.write_bytes(precision.encode())
+    index = Index(str(Path(directory, f'{precision}.db')), embedding_precision=precision)
+    index.index_doc(str(doc), [{'node_id': str(i), 'embedding': v.tobytes(), 'metadata': {}}
+                               for i, v in enumerate(vectors)])
+    index._conn().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return index
+
+
+def measure(name: str, index: Index, queries: np.ndarray, truth, k: int, **kwargs):
+    search = VectorSearch(index, **kwargs)
+    start = time.perf_counter()
+    search.load()
+    load = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = [search.top_k(query, k)[0] for query in queries]
+    latency = (time.perf_counter() - start) / len(queries) * 1000
+    recall = sum(len(np.intersect1d(ids, expected)) for ids, expected in zip(results, truth)) / (len(queries) * k)
+    size = os.path.getsize(index.db_path) / 2 ** 20
+    print(f'{name:<18} db={size:7.1f} MB  load={load:6.2f}s  matrix={search.matrix.nbytes / 2 ** 20:7.1f} MB  '
+          f'{latency:6.2f} ms/query  recall@{k}={recall:.3f}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--nodes', type=int, default=100_000)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    vectors = clustered_vectors(args.nodes, args.dim)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(args.nodes, args.queries)] + 0.05 * rng.standard_normal(
+        (args.queries, args.dim)).astype(np.float32)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        indexes = {precision: build_index(tmp, vectors, precision) for precision in PRECISIONS}
+        exact = VectorSearch(indexes['float32']).load()
+        truth = [exact.top_k(query, args.k)[0] for query in queries]
+        print(f'nodes={args.nodes} dim={args.dim}')
+        for precision, index in indexes.items():
+            measure(precision, index, queries, truth, args.k)
+        measure('float32 as int8', indexes['float32'], queries, truth, args.k, precision='int8', rescore=4)
+        for index in indexes.values():
+            index.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""Pages per second of the textmap and NumPy (src.pdf.lines) text engines, and whether they agree.
+
+Usage:
+    python scripts/bench_text_engine.py path/to/doc.pdf [more.pdf ...]
+
+Both engines run on every page with upright text (page.chars is loaded
+before timing, so only text assembly is measured). Any page where the two
+strings differ is listed; the NumPy engine is only used by
+LineAssemblySerializeStrategy when they are expected to be identical.
+"""
+import sys
+import time
+
+import pdfplumber
+
+from _bench import require_args
+from src.pdf.lines import assemble_text
+
+
+def main():
+    require_args(__doc__)
+    textmap_seconds = numpy_seconds = 0.0
+    pages = 0
+    mismatches = []
+    for path in sys.argv[1:]:
+        with pdfplumber.open(path) as pdf:
+            for page in pdf.pages:
+                chars = page.chars
+                start = time.perf_counter()
+                fast = assemble_text(chars)
+                numpy_seconds += time.perf_counter() - start
+                if fast is None:  # rotated text: not handled by the NumPy engine
+                    page.close()
+                    continue
+                start = time.perf_counter()
+                reference = page.get_textmap().as_string
+                textmap_seconds += time.perf_counter() - start
+                pages += 1
+                if fast != reference:
+                    mismatches.append(f'{path}:{page.page_number}')
+                page.close()
+
+    print(f'{pages} pages')
+    print(f'textmap: {pages / max(textmap_seconds, 1e-9):10.1f} pages/s')
+    print(f'numpy:   {pages / max(numpy_seconds, 1e-9):10.1f} pages/s')
+    print(f'mismatches: {len(mismatches)}', *mismatches, sep='\n  ' if mismatches else ' ')
+
+
+if __name__ == '__main__':
+    main()
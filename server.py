@@ -1,10 +1,24 @@
-from mcp.server.fastmcp import FastMCP
-import requests
+from mcp.server.fastmcp import FastMCP, Context
+import anyio
+import functools
+import httpx
+import json
+import math
+import numpy as np
+from contextlib import aclosing
 from string import Template
 
 from src.common.config import set_config_path, get_config_value
+from src.common.http_client import UpstreamClient
 from src.index.core import Index
-from typing import Dict
+from src.index.search import VectorSearch, LexicalSearch, HybridSearch
+from src.index.ann import IVFIndex
+from src.index.embed import EMBEDDING_ERRORS, Embedder, embedder_from_config
+from src.index.ingest import BulkIngest, chunking_from_config
+from src.pdf.pdf import Pdf
+from src.pdf.cache import PageCache, TableCache
+from src.pdf.text import serialization_strategy
+from typing import Dict, List, Optional
 
 # Initialize config (only needed once, e.g., at app startup)
 set_config_path('config/custom_config.toml')
@@ -12,15 +26,50 @@ set_config_path('config/custom_config.toml')
 # Access the [api] port value
 port = get_config_value(['api', 'port'], 5005)  # 5005 is the default if not found
 mcp_port = get_config_value(['mcp', 'port'], 3003)
+# Plain JSON replies instead of SSE; StreamableHTTP then drops notifications sent during a call,
+# so generate's streamed tokens (progress notifications) only reach clients with this off.
+mcp_json_response = get_config_value(['mcp', 'json_response'], False)
+max_ongoing_requests = get_config_value(['api', 'max_ongoing_requests'], 80)
+request_timeout = get_config_value(['api', 'request_timeout'], 60.0)
 
 # Access the [RAG] index file
 index_path = get_config_value(['rag', 'db_path'], 'chunking_study/processed_sources/index0.db')
 
+# Stored embedding precision, and the precision of the in-memory search matrix
+embedding_precision = get_config_value(['rag', 'embedding_precision'], 'float32')
+search_precision = get_config_value(['rag', 'search_precision'], '')
+rescore = get_config_value(['rag', 'rescore'], 4)
+
+# Paging through nodes and documents (list_nodes / list_documents)
+fetch_batch_size = get_config_value(['rag', 'fetch_batch_size'], 1000)
+page_size = get_config_value(['rag', 'page_size'], 100)
+max_page_size = get_config_value(['rag', 'max_page_size'], 1000)
+
+# Approximate search (IVF sidecar next to the index file) instead of exact scoring
+use_ann = get_config_value(['rag', 'ann'], False)
+ann_n_lists = get_config_value(['rag', 'ann_n_lists'], 0)
+ann_nprobe = get_config_value(['rag', 'ann_nprobe'], 8)
+
+# Bulk ingest process pool
+ingest_workers = get_config_value(['ingest', 'workers'], 0)
+ingest_timeout = get_config_value(['ingest', 'timeout'], 300)
+ingest_max_in_flight_mb = get_config_value(['ingest', 'max_in_flight_mb'], 1024)
+ingest_batch_size = get_config_value(['ingest', 'batch_size'], 16)
+
+# Text engine of the index tools: 'textmap' (pdfplumber) or 'numpy' (faster on text-only pages)
+text_engine = get_config_value(['pdf', 'text_engine'], 'textmap')
+# On-disk cache of detected tables, shared by the index tools
+table_cache_path = get_config_value(['pdf', 'table_cache'], 'processed_sources/table_cache.db')
+table_cache_mb = get_config_value(['pdf', 'table_cache_mb'], 256)
+# Serialized pages (markdown + nodes; index_dir workers store nodes only, under their own keys)
+page_cache_path = get_config_value(['pdf', 'page_cache'], 'processed_sources/page_cache.db')
+page_cache_mb = get_config_value(['pdf', 'page_cache_mb'], 1024)
+
 # Initialize the MCP server with a name
 mcp = FastMCP("Retrieval Server", host="0.0.0.0", port=mcp_port, 
               
-              # Encountered problems with SSE(text/event-stream) on client side.
-              json_response=True  
+              # Some clients had problems with SSE (text/event-stream); see [mcp].json_response.
+              json_response=mcp_json_response
               )
 
 # Template for chatbot request
@@ -36,42 +85,209 @@ api_format = """{
 }"""
 generate_request_template = Template(api_format)
 
+# Shared connection pool to the chatbot api; opened and closed by serve().
+upstream = UpstreamClient(f"http://127.0.0.1:{port}",
+                          max_ongoing_requests=max_ongoing_requests,
+                          timeout=request_timeout)
+
+# Shared by all tool calls so its per-thread sqlite connections are reused.
+_index = None
+
+def get_index() -> Index:
+    global _index
+    if _index is None:
+        _index = Index(index_path, embedding_precision=embedding_precision, fetch_batch_size=fetch_batch_size)
+    return _index
+
+# The caches below are opened on first use, so importing this module creates no files.
+@functools.cache
+def get_table_cache() -> Optional[TableCache]:
+    return TableCache(table_cache_path, table_cache_mb) if table_cache_path else None
+
+@functools.cache
+def get_page_cache() -> Optional[PageCache]:
+    return PageCache(page_cache_path, page_cache_mb) if page_cache_path else None
+
+# Node vectors from [llm_server].embedding_url, cached by text hash; None stores nodes without vectors
+@functools.cache
+def get_embedder() -> Optional[Embedder]:
+    return embedder_from_config()
+
+# Loaded lazily on the first retrieve, and dropped whenever index() adds nodes.
+_vector_search = None
+
+def get_vector_search() -> VectorSearch:
+    global _vector_search
+    if _vector_search is None:
+        if use_ann:
+            _vector_search = IVFIndex(get_index(), n_lists=ann_n_lists, nprobe=ann_nprobe)
+        else:
+            _vector_search = VectorSearch(get_index(), precision=search_precision or None, rescore=rescore)
+    return _vector_search
+
 @mcp.tool()
-async def retrieve() -> str:
+async def retrieve(query: str = '', query_embedding: Optional[List[float]] = None,
+                   top_k: int = 5, mode: str = 'vector', nprobe: int = 0,
+                   doc_path: Optional[List[str]] = None, page_from: int = 0, page_to: int = 0,
+                   element: Optional[List[str]] = None) -> str:
     """
-    Use when customer requests to be reminded about payment at a later time.
-    Retrieves a tool response corresponding to the RemindLater intent.
+    Retrieves the nodes most relevant to a query.
+    mode='vector' ranks by cosine similarity to query_embedding, mode='lexical' by BM25 over
+    the words (and CJK bigrams) of query, and mode='hybrid' fuses both rankings.
+    Without query_embedding, query is embedded with the configured embedding endpoint; if that
+    fails, hybrid falls back to the lexical ranking alone.
+    With [rag].ann enabled, nprobe sets how many IVF lists are scanned (higher is slower but more accurate).
+    doc_path, page_from/page_to (inclusive, 0 for open) and element ('text', 'table', 'image')
+    restrict the search to matching nodes; the filters run in SQL before any scoring.
     
     Returns:
-        str: A JSON string containing nodes.
+        str: A JSON string containing nodes, each with its id, node_id, doc_path, text, score and metadata.
     """
-    data = {
-      
-    }
-    # requests.post("url")
+    search_params = {'nprobe': nprobe} if use_ann and nprobe else {}
+    filters = {'doc_path': doc_path, 'page_from': page_from or None, 'page_to': page_to or None,
+               'element': element}
+    if any(value for value in filters.values()):
+        search_params['filters'] = filters
+    embedder = get_embedder()
+    if mode in ('vector', 'hybrid') and query_embedding is None and query and embedder is not None:
+        try:
+            query_embedding = await anyio.to_thread.run_sync(embedder.embed_query, query)
+        except EMBEDDING_ERRORS as e:
+            if mode == 'vector':
+                return f"Error: embedding the query failed: {str(e)}"
+    if mode == 'lexical':
+        search = functools.partial(LexicalSearch(get_index()).search, query, top_k,
+                                   search_params.get('filters'))
+    elif mode == 'hybrid':
+        hybrid = HybridSearch(get_vector_search(), LexicalSearch(get_index()))
+        search = functools.partial(hybrid.search, query, query_embedding, top_k, **search_params)
+    elif mode == 'vector' and query_embedding is not None:
+        search = functools.partial(get_vector_search().search, query_embedding, top_k, **search_params)
+    else:
+        return f"Error: mode must be 'vector' (with query or query_embedding), 'lexical' or 'hybrid', got {mode!r}"
+    try:
+        nodes = await anyio.to_thread.run_sync(search)
+    except ValueError as e:
+        return f"Error: {str(e)}"
+    return json.dumps(nodes, ensure_ascii=False)
 
-    return "嗨 \n-Darren"
+@mcp.tool()
+async def list_documents(cursor: int = 0, limit: int = 0, columns: Optional[List[str]] = None) -> str:
+    """
+    Pages through the indexed documents in id order.
+    Pass the returned next_cursor as cursor to get the following page; it is null on the last page.
+    limit defaults to [rag].page_size and is capped at [rag].max_page_size.
+    columns picks fields among path, name, hash, size and mtime_ns (default: all); id is always returned.
+    
+    Returns:
+        str: A JSON string {"items": [documents], "next_cursor": int or null}.
+    """
+    page = functools.partial(get_index().page_documents, cursor, min(limit or page_size, max_page_size),
+                             **({'columns': columns} if columns else {}))
+    try:
+        items, next_cursor = await anyio.to_thread.run_sync(page)
+    except ValueError as e:
+        return f"Error: {str(e)}"
+    return json.dumps({'items': items, 'next_cursor': next_cursor}, ensure_ascii=False)
+
+@mcp.tool()
+async def list_nodes(doc_path: str = '', cursor: int = 0, limit: int = 0, columns: Optional[List[str]] = None,
+                     page_from: int = 0, page_to: int = 0, element: Optional[List[str]] = None) -> str:
+    """
+    Pages through nodes in id order, optionally those of one document, a page range
+    (inclusive, 0 for open) or element types ('text', 'table', 'image').
+    Pass the returned next_cursor as cursor to get the following page; it is null on the last page.
+    limit defaults to [rag].page_size and is capped at [rag].max_page_size.
+    columns picks fields among node_id, doc_path, text, metadata, page, last_page, element and
+    embedding (default: node_id, doc_path, metadata, text); id is always returned.
+    
+    Returns:
+        str: A JSON string {"items": [nodes], "next_cursor": int or null}.
+    """
+    filters = {'page_from': page_from or None, 'page_to': page_to or None, 'element': element}
+    page = functools.partial(get_index().page_nodes, doc_path or None, cursor, min(limit or page_size, max_page_size),
+                             **({'columns': columns} if columns else {}), filters=filters)
+    try:
+        items, next_cursor = await anyio.to_thread.run_sync(page)
+    except ValueError as e:
+        return f"Error: {str(e)}"
+    for item in items:
+        if item.get('embedding') is not None:
+            item['embedding'] = np.frombuffer(item['embedding'], dtype=np.float32).tolist()
+    return json.dumps({'items': items, 'next_cursor': next_cursor}, ensure_ascii=False)
 
 @mcp.tool()
 async def index(doc_path:str) -> str:
     """
-    Use when customer requests to be reminded about payment at a later time.
-    Retrieves a tool response corresponding to the RemindLater intent.
+    Parses a pdf into markdown and nodes (each page serialized once), embeds the nodes
+    and indexes them. Unchanged documents are skipped.
+    If the embedding endpoint fails, the nodes are indexed without vectors; embed_missing adds them later.
     
     Returns:
-        str: A JSON string containing nodes.
+        str: A JSON string with the counts of indexed and unchanged files (like index_dir), the number
+        of nodes written and, with an embedding endpoint, the embedding stats; embedding.deferred counts
+        the nodes left without a vector.
     """
     doc_path = doc_path or 'formatting_study/primary_sources/0_新進同仁入職指南.pdf'
-    cur = Index(index_path)
-    cur.index_doc(doc_path)
-    # requests.post("url")
+    cur = get_index()
+    report = {'path': doc_path, 'indexed': 0, 'unchanged': 1, 'nodes': 0}
+    if await anyio.to_thread.run_sync(cur.needs_indexing, doc_path):
+        serialization = serialization_strategy(text_engine, get_table_cache())
+        pdf = await anyio.to_thread.run_sync(functools.partial(Pdf, doc_path, serialization=serialization,
+                                                               chunking=chunking_from_config(),
+                                                               page_cache=get_page_cache()))
+        indexed = await anyio.to_thread.run_sync(pdf.index, cur, get_embedder())
+        get_vector_search().invalidate()
+        report.update(indexed=int(indexed), unchanged=int(not indexed), nodes=len(pdf.nodes) if indexed else 0)
+        if pdf.embedding is not None:
+            report['embedding'] = pdf.embedding.to_dict()
+    return json.dumps(report, ensure_ascii=False)
 
-    return "嗨 \n-Darren"
+@mcp.tool()
+async def index_dir(target: str) -> str:
+    """
+    Indexes every new or changed PDF in a directory (recursively) or matching a glob
+    such as 'docs/**/*.pdf', parsing them in parallel worker processes.
+    Documents whose files were deleted from the directory are removed from the index.
+    
+    Returns:
+        str: A JSON string with the counts of indexed and unchanged files, failures, removed paths
+        and embedding throughput (nodes per second).
+    """
+    ingest = BulkIngest(get_index(), workers=ingest_workers, timeout=ingest_timeout,
+                        max_in_flight_mb=ingest_max_in_flight_mb, batch_size=ingest_batch_size,
+                        table_cache=get_table_cache(), page_cache=get_page_cache(),
+                        chunking=chunking_from_config(), embedder=get_embedder(), text_engine=text_engine)
+    report = await anyio.to_thread.run_sync(ingest.run, target)
+    get_vector_search().invalidate()
+    return json.dumps(report, ensure_ascii=False)
 
 @mcp.tool()
-async def generate(input: Dict) -> str:
+async def embed_missing() -> str:
+    """
+    Embeds the indexed nodes that were stored without a vector, e.g. while the embedding
+    endpoint was down, and makes them searchable by vector.
+    
+    Returns:
+        str: A JSON string with the number of nodes embedded, cache hits, requests and nodes per second.
+    """
+    embedder = get_embedder()
+    if embedder is None:
+        return "Error: no embedding endpoint is configured ([llm_server].embedding_url)"
+    try:
+        stats = await anyio.to_thread.run_sync(embedder.embed_missing, get_index())
+    except EMBEDDING_ERRORS as e:
+        return f"Error: embedding failed: {str(e)}"
+    finally:
+        # Batches written before a failure are searchable too.
+        get_vector_search().invalidate()
+    return json.dumps(stats.to_dict(), ensure_ascii=False)
+
+@mcp.tool()
+async def generate(input: Dict, ctx: Context) -> str:
     """
     Calls the chatbot FastApi to generate text.
+    Set input['stream'] to relay tokens as progress notifications while the answer is generated.
     
     Returns:
         str: A JSON string containing the answer.
@@ -92,17 +308,62 @@ async def generate(input: Dict) -> str:
     index = input.get('index_name', 'index1')
 
     # Hard-coded path operation to call chatbot_api
-    cb_generate_endpoint = f"http://127.0.0.1:{port}/api/v1/{index}/chats/{input.get('chat_name', 'testChat1')}/generate"
+    cb_generate_endpoint = f"/api/v1/{index}/chats/{input.get('chat_name', 'testChat1')}/generate"
     
     try:
-        response = requests.post(cb_generate_endpoint, json=payload)
-        response.raise_for_status()
+        timeout = parse_timeout(input.get('timeout'))
+    except ValueError as e:
+        return f"Error: {str(e)}"
+    if input.get('stream'):
+        return await stream_generate(cb_generate_endpoint, payload, timeout, ctx)
+
+    try:
+        response = await upstream.post(cb_generate_endpoint, json=payload, timeout=timeout)
         return response.text
-    except requests.RequestException as e:
+    except httpx.HTTPError as e:
         return f"Error: {str(e)}"
 
 
+def parse_timeout(value) -> Optional[float]:
+    """Seconds to wait for the upstream answer; None (the client default) when not given or 0."""
+    if not value:
+        return None
+    try:
+        timeout = float(value)
+    except (TypeError, ValueError):
+        timeout = math.nan
+    if not 0 < timeout < math.inf:
+        raise ValueError(f"timeout must be a positive number of seconds, got {value!r}")
+    return timeout
+
+
+async def stream_generate(endpoint: str, payload: Dict, timeout, ctx: Context) -> str:
+    """Relays each SSE token to the client as a progress notification and returns the joined answer."""
+    tokens = []
+    try:
+        async with aclosing(upstream.stream_sse(endpoint, json=payload, timeout=timeout)) as stream:
+            async for token in stream:
+                tokens.append(token)
+                await ctx.report_progress(len(tokens), message=token)
+    except httpx.HTTPError as e:
+        if not tokens:
+            return f"Error: {str(e)}"
+        # Upstream dropped mid-answer; keep what was generated so far.
+        await ctx.warning(f"generate stream interrupted after {len(tokens)} tokens: {e}")
+    return ''.join(tokens)
+
+
+async def serve():
+    """Runs the MCP server over http with the upstream pool open for its whole lifetime."""
+    async with upstream:
+        try:
+            await mcp.run_streamable_http_async()
+        finally:
+            if _index is not None:
+                _index.close()
+
+
 if __name__ == "__main__":
     
     # Start the MCP server using http transport
-    mcp.run(transport="streamable-http")
+    anyio.run(serve)
@@ -0,0 +1,43 @@
+"""File content hashes, shared by src.index (change detection) and src.pdf (cache keys)."""
+import hashlib
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+
+def hash_file(file_path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        while chunk := f.read(8192):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+# sha256 by file_key, so a file is hashed once per process until it is modified.
+_DIGESTS: Dict[Tuple[str, int, int], str] = {}
+_DIGESTS_MAX = 1024
+_digests_lock = threading.Lock()
+
+
+def file_key(file_path) -> Tuple[str, int, int]:
+    """(path, size, mtime_ns): stands for the file's content until it is modified."""
+    stat = os.stat(file_path)
+    return str(file_path), stat.st_size, stat.st_mtime_ns
+
+
+def file_digest(file_path, key: Optional[Tuple[str, int, int]] = None) -> str:
+    """sha256 of a file, memoized by its file_key (pass `key` if it was just taken)."""
+    key = key or file_key(file_path)
+    digest = _DIGESTS.get(key)
+    if digest is None:
+        digest = hash_file(file_path)
+        remember_digest(key, digest)
+    return digest
+
+
+def remember_digest(key: Tuple[str, int, int], digest: str):
+    """Records a digest computed elsewhere, e.g. by the process that handed a file to a worker."""
+    with _digests_lock:
+        if len(_DIGESTS) >= _DIGESTS_MAX:
+            del _DIGESTS[next(iter(_DIGESTS))]
+        _DIGESTS[key] = digest
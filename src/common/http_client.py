@@ -0,0 +1,94 @@
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+
+SSE_DONE = '[DONE]'
+
+
+class UpstreamClient:
+    """Shared async HTTP client for calls from the MCP tools to the chatbot API.
+
+    One instance is opened at server startup and closed at shutdown, so every
+    tool call reuses the same keep-alive connection pool instead of opening a
+    new TCP connection per request. At most `max_ongoing_requests` calls are in
+    flight at once; the rest wait on the semaphore without blocking the loop.
+    """
+
+    def __init__(self, base_url: str, max_ongoing_requests: int = 80, timeout: float = 60.0):
+        self.base_url = base_url
+        self.max_ongoing_requests = max_ongoing_requests
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def open(self):
+        if self._client is not None:
+            return
+        limits = httpx.Limits(
+            max_connections=self.max_ongoing_requests,
+            max_keepalive_connections=self.max_ongoing_requests,
+        )
+        self._client = httpx.AsyncClient(base_url=self.base_url, limits=limits,
+                                         timeout=httpx.Timeout(self.timeout))
+        self._semaphore = asyncio.Semaphore(self.max_ongoing_requests)
+
+    async def close(self):
+        if self._client is None:
+            return
+        await self._client.aclose()
+        self._client = None
+        self._semaphore = None
+
+    async def __aenter__(self) -> 'UpstreamClient':
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def post(self, path: str, json: Dict[str, Any], timeout: Optional[float] = None) -> httpx.Response:
+        """Posts `json` to `path` and returns the fully read response.
+
+        Falls back to opening the pool lazily if the server was started without
+        entering the client (e.g. `mcp.run()` called directly).
+        """
+        if self._client is None:
+            await self.open()
+        async with self._semaphore:
+            response = await self._client.post(path, json=json,
+                                               timeout=timeout if timeout is not None else self.timeout)
+        response.raise_for_status()
+        return response
+
+    async def stream_sse(self, path: str, json: Dict[str, Any],
+                         timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """Posts `json` to `path` and yields the `data` of each server-sent event as it arrives.
+
+        Stops after the `[DONE]` sentinel or when the upstream closes the stream.
+        Closing the generator (e.g. on client cancellation) releases the
+        connection back to the pool.
+        """
+        if self._client is None:
+            await self.open()
+        async with self._semaphore:
+            async with self._client.stream('POST', path, json=json,
+                                           timeout=timeout if timeout is not None else self.timeout) as response:
+                response.raise_for_status()
+                data: List[str] = []
+                async for line in response.aiter_lines():
+                    if line == '':
+                        # Blank line dispatches the buffered event.
+                        if not data:
+                            continue
+                        event = '\n'.join(data)
+                        data = []
+                        if event.strip() == SSE_DONE:
+                            return
+                        yield event
+                    elif line.startswith('data:'):
+                        value = line[5:]
+                        data.append(value[1:] if value.startswith(' ') else value)
+                    # Comments (':') and other fields (event, id, retry) are ignored.
+                if data and '\n'.join(data).strip() != SSE_DONE:
+                    yield '\n'.join(data)
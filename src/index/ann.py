@@ -0,0 +1,210 @@
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src.index.core import Index
+from src.index.search import VectorSearch, as_query, decode_embeddings, normalize, select_top_k
+
+
+def assign_to_centroids(vectors: np.ndarray, centroids: np.ndarray, batch_size: int = 65536) -> np.ndarray:
+    """Returns the index of the closest (highest cosine) centroid for every row."""
+    labels = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), batch_size):
+        labels[start:start + batch_size] = np.argmax(vectors[start:start + batch_size] @ centroids.T, axis=1)
+    return labels
+
+
+def spherical_kmeans(vectors: np.ndarray, n_clusters: int, n_iter: int = 10,
+                     points_per_cluster: int = 256, seed: int = 0) -> np.ndarray:
+    """Clusters unit vectors by cosine similarity and returns unit-length centroids.
+
+    Trains on a random sample of `points_per_cluster` rows per cluster, which is
+    enough for good centroids and keeps training time independent of corpus size.
+    """
+    rng = np.random.default_rng(seed)
+    n_clusters = max(1, min(n_clusters, len(vectors)))
+    sample_size = min(len(vectors), n_clusters * points_per_cluster)
+    sample = vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))]
+    centroids = sample[rng.choice(len(sample), n_clusters, replace=False)].copy()
+
+    for _ in range(n_iter):
+        labels = assign_to_centroids(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+
+        # Re-seed empty clusters with random points so every list is used.
+        empty = np.bincount(labels, minlength=n_clusters) == 0
+        if empty.any():
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+        centroids = normalize(sums).astype(np.float32)
+    return centroids
+
+
+class IVFIndex(VectorSearch):
+    """Approximate top-k search with an inverted file (IVF) over node embeddings.
+
+    Node vectors are partitioned into `n_lists` clusters by spherical k-means.
+    A query is compared against the centroids first and only the `nprobe`
+    closest lists are scored exactly, so raising `nprobe` trades latency for
+    recall. The structure is saved as a sidecar file next to the SQLite database
+    (`<db_path>.ivf.npz`) and extended with nodes added after it was built.
+    """
+
+    def __init__(self, index: Index, n_lists: int = 0, nprobe: int = 8, path: Optional[str] = None):
+        super().__init__(index)
+        self.path = Path(path) if path else Path(f'{index.db_path}.ivf.npz')
+        self.n_lists = n_lists  # 0 picks sqrt(number of nodes)
+        self.nprobe = nprobe
+        self.centroids: Optional[np.ndarray] = None
+        self.list_ids: List[np.ndarray] = []
+        self.list_vectors: List[np.ndarray] = []
+        self.max_id = 0
+        self._stale = False
+
+    def load(self) -> 'IVFIndex':
+        if self.path.exists():
+            with np.load(self.path) as data:
+                self.centroids = data['centroids']
+                offsets = data['offsets']
+                ids, vectors = data['ids'], data['vectors']
+                self.max_id = int(data['max_id'])
+            self.list_ids = [ids[offsets[i]:offsets[i + 1]] for i in range(len(self.centroids))]
+            self.list_vectors = [vectors[offsets[i]:offsets[i + 1]] for i in range(len(self.centroids))]
+            self.update()
+        else:
+            self.build()
+        return self
+
+    def build(self, n_iter: int = 10, seed: int = 0) -> 'IVFIndex':
+        """Trains the centroids on every embedded node and writes the sidecar file."""
+        ids, vectors = decode_embeddings(self.index.get_embeddings(), self.index.db_path,
+                                         self.index.embedding_precision)
+        self.max_id = int(ids.max()) if len(ids) else 0
+        if len(ids) == 0:
+            self.centroids = None
+            self.list_ids, self.list_vectors = [], []
+            return self
+
+        n_lists = self.n_lists or int(np.sqrt(len(ids)))
+        self.centroids = spherical_kmeans(vectors, n_lists, n_iter=n_iter, seed=seed)
+        self.list_ids, self.list_vectors = [], []
+        labels = assign_to_centroids(vectors, self.centroids)
+        order = np.argsort(labels, kind='stable')
+        bounds = np.searchsorted(labels[order], np.arange(len(self.centroids) + 1))
+        for i in range(len(self.centroids)):
+            members = order[bounds[i]:bounds[i + 1]]
+            self.list_ids.append(ids[members])
+            self.list_vectors.append(vectors[members])
+        self.save()
+        return self
+
+    def update(self) -> int:
+        """Drops deleted nodes and adds nodes embedded since the last build/update to their closest lists.
+
+        Returns the number of nodes added. Centroids are not retrained; call
+        `build()` again once the corpus has drifted far from the training set.
+        """
+        self._stale = False
+        if self.centroids is None:
+            self.build()
+            return sum(len(ids) for ids in self.list_ids)
+
+        live = np.asarray(self.index.get_node_ids(), dtype=np.int64)
+        removed = self._remove_deleted(live)
+        rows = self.index.get_embeddings(after_id=self.max_id)
+        # Older nodes that got their embedding after they were inserted (Embedder.embed_missing).
+        known = np.concatenate(self.list_ids) if self.list_ids else np.empty(0, dtype=np.int64)
+        backfilled = live[live <= self.max_id]
+        backfilled = backfilled[~np.isin(backfilled, known)].tolist()
+        for start in range(0, len(backfilled), 10000):
+            rows.extend(self.index.get_embeddings_by_ids(backfilled[start:start + 10000]).items())
+        ids, vectors = decode_embeddings(rows, self.index.db_path, self.index.embedding_precision)
+        if len(ids) == 0:
+            if removed:
+                self.save()
+            return 0
+        if vectors.shape[1] != self.centroids.shape[1]:
+            raise ValueError(f'{self.index.db_path}: node embeddings have inconsistent dimensions')
+
+        labels = assign_to_centroids(vectors, self.centroids)
+        for i in np.unique(labels):
+            members = labels == i
+            self.list_ids[i] = np.concatenate([self.list_ids[i], ids[members]])
+            self.list_vectors[i] = np.concatenate([self.list_vectors[i], vectors[members]])
+        self.max_id = max(self.max_id, int(ids.max()))
+        self.save()
+        return len(ids)
+
+    def _remove_deleted(self, live: np.ndarray) -> int:
+        """Removes ids from the lists whose nodes are not in `live`, e.g. after a changed document was re-indexed."""
+        removed = 0
+        for i, ids in enumerate(self.list_ids):
+            keep = np.isin(ids, live, assume_unique=True)
+            if not keep.all():
+                removed += int(len(ids) - keep.sum())
+                self.list_ids[i] = ids[keep]
+                self.list_vectors[i] = self.list_vectors[i][keep]
+        return removed
+
+    def save(self):
+        if self.centroids is None:
+            return
+        offsets = np.cumsum([0] + [len(ids) for ids in self.list_ids])
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, centroids=self.centroids, offsets=offsets,
+                     ids=np.concatenate(self.list_ids), vectors=np.concatenate(self.list_vectors),
+                     max_id=np.int64(self.max_id))
+        os.replace(tmp_path, self.path)
+
+    def invalidate(self):
+        """Marks the lists as behind the database; the next search picks up new nodes."""
+        self._stale = True
+
+    def top_k(self, query: np.ndarray, k: int, nprobe: Optional[int] = None,
+              filters: Optional[Dict[str, Any]] = None):
+        """Returns (row ids, cosine scores) of the best k nodes among the `nprobe` closest lists.
+
+        With `filters` (see Index.filter_clause), the lists are bypassed: the
+        matching nodes are selected in SQL and scored exactly, since a narrow
+        filter could leave the probed lists with fewer than k matches.
+        """
+        # Lists are refreshed under the lock and searched outside it: update()
+        # replaces list arrays rather than writing into them, so the copied
+        # references stay consistent while another thread updates.
+        with self._lock:
+            if self.centroids is None:
+                self.load()
+            elif self._stale:
+                self.update()
+            centroids, list_ids, list_vectors = self.centroids, list(self.list_ids), list(self.list_vectors)
+        if centroids is None or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        query = as_query(query, centroids.shape[1])
+        if filters:
+            ids, vectors = decode_embeddings(self.index.get_embeddings(filters=filters), self.index.db_path,
+                                             self.index.embedding_precision)
+            if len(ids) == 0:
+                return ids, np.empty(0, dtype=np.float32)
+            scores = vectors @ query
+            best = select_top_k(scores, k)
+            return ids[best], scores[best]
+        probes = select_top_k(centroids @ query, nprobe or self.nprobe)
+        ids = np.concatenate([list_ids[i] for i in probes])
+        scores = np.concatenate([list_vectors[i] @ query for i in probes])
+        best = select_top_k(scores, k)
+        return ids[best], scores[best]
+
+
+def recall_at_k(ann: IVFIndex, exact: VectorSearch, queries: np.ndarray, k: int = 10,
+                nprobe: Optional[int] = None) -> float:
+    """Fraction of the exact top-k nodes that the ANN search also returns, averaged over queries."""
+    hits = 0
+    for query in queries:
+        exact_ids, _ = exact.top_k(query, k)
+        ann_ids, _ = ann.top_k(query, k, nprobe=nprobe)
+        hits += len(np.intersect1d(exact_ids, ann_ids))
+    return hits / max(1, len(queries) * k)
@@ -1,25 +1,146 @@
 import sqlite3
-import hashlib
-from typing import Optional, List, Dict, Any
+import ast
+import json
+import threading
+import weakref
+from contextlib import contextmanager
+from typing import Optional, Iterator, List, Dict, Any, Sequence, Tuple
 from pathlib import Path
 
+from src.common.digest import file_digest, file_key
+from src.index.quantize import check_precision, decode, encode, encode_blobs
+from src.index.tokenizer import fts_document, fts_query
+
+# Applied to every connection. WAL lets readers run while an ingest is writing;
+# synchronous=NORMAL is durable in WAL mode except across power loss.
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,       # KiB (negative), i.e. 64 MB of page cache
+    'mmap_size': 268435456,     # 256 MB memory-mapped reads
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000,       # ms to wait for the write lock
+}
+
+# Keys accepted by Index.filter_clause: node filters applied in SQL before any scoring.
+FILTER_KEYS = ('doc_path', 'page_from', 'page_to', 'element')
+
+# Columns iter_nodes / iter_documents can project, and the SQL they read. The
+# row id ('id') is always returned: it is the pagination cursor.
+NODE_COLUMNS = {
+    'node_id': 'nodes.node_id', 'doc_path': 'documents.path', 'text': 'nodes.text',
+    'metadata': 'nodes.metadata', 'page': 'nodes.page', 'last_page': 'nodes.last_page',
+    'element': 'nodes.element', 'embedding': 'nodes.embedding',
+}
+DEFAULT_NODE_COLUMNS = ('node_id', 'doc_path', 'metadata', 'text')
+DOCUMENT_COLUMNS = ('path', 'name', 'hash', 'size', 'mtime_ns')
+
+def load_metadata(value: Optional[str]) -> Dict[str, Any]:
+    """Parses stored node metadata: JSON, or the Python repr written by older versions."""
+    if not value:
+        return {}
+    try:
+        return json.loads(value)
+    except ValueError:
+        pass
+    try:
+        metadata = ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return {}
+    return metadata if isinstance(metadata, dict) else {}
+
+class _ThreadConnection:
+    """One thread's connection, referenced strongly only by that thread's locals.
+
+    It is closed when the thread exits (its locals are dropped) or by
+    Index.close(), whichever comes first.
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.close = weakref.finalize(self, conn.close)
+
+
 class Index:
-    def __init__(self, db_path: str):
+    """SQLite store of documents and their nodes.
+
+    Each thread gets one long-lived connection (a sqlite3 connection must not be
+    used by two threads at once), opened on first use and closed when the
+    thread exits or by close(), so recycled worker threads do not leak them.
+
+    Node embeddings are passed in and handed out as float32 BLOBs but stored in
+    `embedding_precision` (see src.index.quantize), which is recorded in the
+    database. Opening an existing database with a different precision
+    re-encodes its embeddings; None keeps the recorded one (float32 for new
+    databases).
+    """
+
+    def __init__(self, db_path: str, pragmas: Optional[Dict[str, Any]] = None,
+                 embedding_precision: Optional[str] = None, fetch_batch_size: int = 1000):
         self.db_path = str(Path(db_path))
+        self.pragmas = {**DEFAULT_PRAGMAS, **(pragmas or {})}
+        self.fetch_batch_size = fetch_batch_size  # rows per query when iterating nodes or documents
+        self.embedding_precision = check_precision(embedding_precision) if embedding_precision else None
+        self._local = threading.local()
+        self._connections: 'weakref.WeakSet[_ThreadConnection]' = weakref.WeakSet()
+        self._lock = threading.Lock()
         self._init_db()
 
-    def _init_db(self):
-        conn = sqlite3.connect(self.db_path)
+    def _conn(self) -> sqlite3.Connection:
+        holder = getattr(self._local, 'conn', None)
+        if holder is None:
+            # Autocommit mode; writes open their own transaction in _transaction().
+            conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+            for name, value in self.pragmas.items():
+                conn.execute(f"PRAGMA {name} = {value}")
+            holder = self._local.conn = _ThreadConnection(conn)
+            with self._lock:
+                self._connections.add(holder)
+        return holder.conn
+
+    @contextmanager
+    def _transaction(self):
+        """Runs the block in one write transaction, rolling back if it raises."""
+        conn = self._conn()
         c = conn.cursor()
+        c.execute("BEGIN IMMEDIATE")
+        try:
+            yield c
+        except BaseException:
+            c.execute("ROLLBACK")
+            raise
+        c.execute("COMMIT")
+
+    def close(self):
+        """Closes the connections of every live thread."""
+        with self._lock:
+            for holder in list(self._connections):
+                holder.close()
+            self._connections = weakref.WeakSet()
+        self._local = threading.local()
+
+    def _init_db(self):
+        with self._transaction() as c:
+            self._create_tables(c)
+            self._set_precision(c)
+
+    def _create_tables(self, c: sqlite3.Cursor):
         # Table for documents
         c.execute("""
             CREATE TABLE IF NOT EXISTS documents (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 path TEXT UNIQUE,
                 name TEXT,
-                hash TEXT
+                hash TEXT,
+                size INTEGER,
+                mtime_ns INTEGER
             )
         """)
+        # Databases created before the (size, mtime) change check
+        columns = [row[1] for row in c.execute("PRAGMA table_info(documents)")]
+        for column in ('size', 'mtime_ns'):
+            if column not in columns:
+                c.execute(f"ALTER TABLE documents ADD COLUMN {column} INTEGER")
         # Table for nodes
         c.execute("""
             CREATE TABLE IF NOT EXISTS nodes (
@@ -28,70 +149,421 @@ class Index:
                 node_id TEXT,
                 embedding BLOB,
                 metadata TEXT,
+                text TEXT,
+                page INTEGER,
+                last_page INTEGER,
+                element TEXT,
                 FOREIGN KEY(doc_id) REFERENCES documents(id)
             )
         """)
-        conn.commit()
-        conn.close()
-
-    def _hash_file(self, file_path: str) -> str:
-        hasher = hashlib.sha256()
-        with open(file_path, 'rb') as f:
-            while chunk := f.read(8192):
-                hasher.update(chunk)
-        return hasher.hexdigest()
-
-    def index_doc(self, file_path: str, nodes: Optional[List[Dict[str, Any]]] = None):
-        """Indexes a document and optionally its nodes."""
+        c.execute("CREATE INDEX IF NOT EXISTS nodes_doc_id ON nodes (doc_id)")
+        # Databases created before node text was stored
+        columns = [row[1] for row in c.execute("PRAGMA table_info(nodes)")]
+        if 'text' not in columns:
+            c.execute("ALTER TABLE nodes ADD COLUMN text TEXT")
+        # metadata is JSON; page, last_page and element are copied out of it into
+        # indexed columns so filters run in SQL (see filter_clause).
+        if 'page' not in columns:
+            for column, kind in (('page', 'INTEGER'), ('last_page', 'INTEGER'), ('element', 'TEXT')):
+                c.execute(f"ALTER TABLE nodes ADD COLUMN {column} {kind}")
+            self._migrate_metadata(c)
+        c.execute("CREATE INDEX IF NOT EXISTS nodes_doc_page ON nodes (doc_id, page)")
+        c.execute("CREATE INDEX IF NOT EXISTS nodes_element ON nodes (element, page)")
+        # Nodes written while the embedding endpoint was down, see iter_unembedded()
+        c.execute("CREATE INDEX IF NOT EXISTS nodes_unembedded ON nodes (id) WHERE embedding IS NULL")
+        # Lexical index over node text; rowid is nodes.id. Text is pre-split into
+        # CJK bigrams and words by src.index.tokenizer, see fts_document().
+        c.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS nodes_fts USING fts5(tokens, tokenize='unicode61')
+        """)
+        # Index-wide settings, such as the embedding precision
+        c.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)")
+
+    def _migrate_metadata(self, c: sqlite3.Cursor):
+        """Rewrites Python-repr metadata as JSON and fills the filter columns."""
+        from src.pdf.element import element_type
+
+        updates = []
+        for row_id, value, text in c.execute("SELECT id, metadata, text FROM nodes").fetchall():
+            metadata = load_metadata(value)
+            metadata.setdefault('element', element_type(text))
+            updates.append((self._dump_metadata(metadata), *self._filter_columns(metadata), row_id))
+        c.executemany("UPDATE nodes SET metadata = ?, page = ?, last_page = ?, element = ? WHERE id = ?", updates)
+
+    @staticmethod
+    def _dump_metadata(metadata: Optional[Dict[str, Any]]) -> str:
+        return json.dumps(metadata or {}, ensure_ascii=False, default=str)
+
+    @staticmethod
+    def _filter_columns(metadata: Optional[Dict[str, Any]]) -> Tuple[Optional[int], Optional[int], Optional[str]]:
+        """(page, last_page, element) of a node; last_page is the page for nodes on a single page."""
+        metadata = metadata or {}
+        page = metadata.get('page')
+        return page, metadata.get('last_page', page), metadata.get('element')
+
+    def _set_precision(self, c: sqlite3.Cursor):
+        """Records the embedding precision, re-encoding stored embeddings if it changed."""
+        row = c.execute("SELECT value FROM settings WHERE key = 'embedding_precision'").fetchone()
+        # Databases created before precisions were selectable hold float32.
+        stored = row[0] if row else 'float32'
+        precision = self.embedding_precision or stored
+        if precision != stored:
+            rows = c.execute("SELECT id, embedding FROM nodes WHERE embedding IS NOT NULL").fetchall()
+            c.executemany("UPDATE nodes SET embedding = ? WHERE id = ?", [
+                (encode(decode(blob, stored, len(blob)), precision), row_id) for row_id, blob in rows
+            ])
+        c.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('embedding_precision', ?)", (precision,))
+        self.embedding_precision = precision
+
+    def _check(self, file_path: Path) -> Tuple[bool, str]:
+        """Returns (changed, hash) for a file compared to its stored document row.
+
+        Only hashes when size or mtime differ from the stored values, and
+        through file_digest, so checking a changed file again before it is
+        written (needs_indexing, then index_doc) reuses the first hash. A file
+        that was touched but not modified gets its stored stat refreshed.
+        """
+        key = file_key(file_path)
+        _, size, mtime_ns = key
+        row = self._conn().execute(
+            "SELECT hash, size, mtime_ns FROM documents WHERE path = ?", (str(file_path),)).fetchone()
+        if row and row[1] == size and row[2] == mtime_ns:
+            return False, row[0]
+        doc_hash = file_digest(file_path, key)
+        if row and row[0] == doc_hash:
+            with self._transaction() as c:
+                c.execute("UPDATE documents SET size = ?, mtime_ns = ? WHERE path = ?",
+                          (size, mtime_ns, str(file_path)))
+            return False, doc_hash
+        return True, doc_hash
+
+    def needs_indexing(self, file_path: str) -> bool:
+        """True if the file is new or its content changed since it was indexed."""
+        return self._check(Path(file_path))[0]
+
+    def index_doc(self, file_path: str, nodes: Optional[List[Dict[str, Any]]] = None,
+                  force: bool = False) -> bool:
+        """Indexes a document and optionally its nodes.
+
+        Unchanged documents are skipped unless `force` is set. A changed document
+        has its old nodes replaced by `nodes` in the same transaction.
+
+        Returns:
+            bool: True if the document was (re)indexed.
+        """
         file_path = Path(file_path)
-        doc_name = file_path.name
-        doc_hash = self._hash_file(str(file_path))
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        # Insert or ignore document
+        changed, doc_hash = self._check(file_path)
+        if not changed and not force:
+            return False
+        with self._transaction() as c:
+            self._write_doc(c, file_path, doc_hash, nodes)
+        return True
+
+    def index_docs(self, docs: List[Tuple[str, str, Optional[List[Dict[str, Any]]]]]) -> int:
+        """Indexes several (file_path, sha256, nodes) triples in one transaction.
+
+        Unlike index_doc, every document is written; callers are expected to have
+        filtered unchanged files with needs_indexing() before producing nodes.
+
+        Returns:
+            int: The number of documents written.
+        """
+        with self._transaction() as c:
+            for file_path, doc_hash, nodes in docs:
+                self._write_doc(c, Path(file_path), doc_hash or file_digest(file_path), nodes)
+        return len(docs)
+
+    def _write_doc(self, c: sqlite3.Cursor, file_path: Path, doc_hash: str,
+                   nodes: Optional[List[Dict[str, Any]]]):
+        """Upserts the document row and replaces its nodes; must run inside _transaction()."""
+        stat = file_path.stat()
+        # Insert or update document
         c.execute("""
-            INSERT OR IGNORE INTO documents (path, name, hash) VALUES (?, ?, ?)
-        """, (str(file_path), doc_name, doc_hash))
+            INSERT INTO documents (path, name, hash, size, mtime_ns) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(path) DO UPDATE SET
+                name = excluded.name, hash = excluded.hash,
+                size = excluded.size, mtime_ns = excluded.mtime_ns
+        """, (str(file_path), file_path.name, doc_hash, stat.st_size, stat.st_mtime_ns))
         # Get doc_id
         c.execute("SELECT id FROM documents WHERE path = ?", (str(file_path),))
         doc_id = c.fetchone()[0]
+        self._delete_nodes(c, doc_id)
         # Insert nodes if provided
         if nodes:
-            for node in nodes:
-                c.execute("""
-                    INSERT INTO nodes (doc_id, node_id, embedding, metadata)
-                    VALUES (?, ?, ?, ?)
-                """, (
-                    doc_id,
-                    node.get('node_id'),
-                    node.get('embedding'),
-                    str(node.get('metadata'))
-                ))
-        conn.commit()
-        conn.close()
+            self._insert_nodes(c, doc_id, nodes)
+
+    def _delete_nodes(self, c: sqlite3.Cursor, doc_id: int):
+        c.execute("DELETE FROM nodes_fts WHERE rowid IN (SELECT id FROM nodes WHERE doc_id = ?)", (doc_id,))
+        c.execute("DELETE FROM nodes WHERE doc_id = ?", (doc_id,))
+
+    def remove_doc(self, file_path: str) -> bool:
+        """Deletes a document and its nodes. Returns False if it was not indexed."""
+        with self._transaction() as c:
+            row = c.execute("SELECT id FROM documents WHERE path = ?", (str(Path(file_path)),)).fetchone()
+            if not row:
+                return False
+            self._delete_nodes(c, row[0])
+            c.execute("DELETE FROM documents WHERE id = ?", (row[0],))
+        return True
+
+    def remove_missing(self, root: Optional[str] = None) -> List[str]:
+        """Deletes documents whose files no longer exist, optionally only those under `root`.
+
+        Returns:
+            List[str]: The removed document paths.
+        """
+        paths = [row[0] for row in self._conn().execute("SELECT path FROM documents")]
+        root = Path(root).resolve() if root else None
+        removed = [
+            path for path in paths
+            if not Path(path).exists() and (root is None or root in Path(path).resolve().parents)
+        ]
+        for path in removed:
+            self.remove_doc(path)
+        return removed
+
+    def _insert_nodes(self, c: sqlite3.Cursor, doc_id: int, nodes: List[Dict[str, Any]]):
+        """Bulk-inserts nodes and their FTS rows; must run inside _transaction()."""
+        last_id = c.execute("SELECT COALESCE(MAX(id), 0) FROM nodes").fetchone()[0]
+        embeddings = encode_blobs([node.get('embedding') for node in nodes], self.embedding_precision)
+        c.executemany("""
+            INSERT INTO nodes (doc_id, node_id, embedding, metadata, text, page, last_page, element)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, [(
+            doc_id,
+            node.get('node_id'),
+            embedding,
+            self._dump_metadata(node.get('metadata')),
+            node.get('text'),
+            *self._filter_columns(node.get('metadata'))
+        ) for node, embedding in zip(nodes, embeddings)])
+        # The write lock is held, so the new rows are exactly those after last_id, in insertion order.
+        row_ids = [row[0] for row in c.execute(
+            "SELECT id FROM nodes WHERE id > ? ORDER BY id", (last_id,))]
+        c.executemany("INSERT INTO nodes_fts (rowid, tokens) VALUES (?, ?)", [
+            (row_id, fts_document(node['text']))
+            for row_id, node in zip(row_ids, nodes) if node.get('text')
+        ])
 
     def get_documents(self) -> List[Dict[str, Any]]:
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute("SELECT path, name, hash FROM documents")
-        docs = [{'path': row[0], 'name': row[1], 'hash': row[2]} for row in c.fetchall()]
-        conn.close()
-        return docs
+        return list(self.iter_documents(('path', 'name', 'hash')))
 
     def get_nodes(self, doc_path: str) -> List[Dict[str, Any]]:
-        doc_path = str(Path(doc_path))
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute("SELECT id FROM documents WHERE path = ?", (doc_path,))
-        doc = c.fetchone()
-        if not doc:
-            conn.close()
-            return []
-        doc_id = doc[0]
-        c.execute("SELECT node_id, embedding, metadata FROM nodes WHERE doc_id = ?", (doc_id,))
-        nodes = [
-            {'node_id': row[0], 'embedding': row[1], 'metadata': row[2]}
+        return list(self.iter_nodes(doc_path, ('node_id', 'embedding', 'metadata', 'text')))
+
+    def iter_documents(self, columns: Sequence[str] = DOCUMENT_COLUMNS, after_id: int = 0,
+                       batch_size: Optional[int] = None, limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Yields documents with their `id` and `columns`, in id order, after the cursor `after_id`.
+
+        Rows are read `batch_size` at a time (default: the index's fetch_batch_size)
+        with keyset pagination on id, so no query holds more than one batch.
+        """
+        unknown = set(columns) - set(DOCUMENT_COLUMNS)
+        if unknown:
+            raise ValueError(f'Unknown document columns {sorted(unknown)}; expected some of {DOCUMENT_COLUMNS}')
+        sql = f"SELECT {', '.join(('id', *columns))} FROM documents WHERE id > ? ORDER BY id LIMIT ?"
+        for row in self._keyset(sql, [], after_id, batch_size, limit):
+            yield dict(zip(('id', *columns), row))
+
+    def iter_nodes(self, doc_path: Optional[str] = None, columns: Sequence[str] = DEFAULT_NODE_COLUMNS,
+                   after_id: int = 0, batch_size: Optional[int] = None, limit: Optional[int] = None,
+                   filters: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+        """Yields nodes with their `id` and `columns` (see NODE_COLUMNS), in id order, after the cursor `after_id`.
+
+        Embeddings are only read when asked for, and come back as float32 BLOBs;
+        metadata comes back as a dict. `doc_path` and `filters` (see
+        filter_clause) select the nodes in SQL. Rows are read `batch_size` at a
+        time with keyset pagination on id.
+        """
+        unknown = set(columns) - set(NODE_COLUMNS)
+        if unknown:
+            raise ValueError(f'Unknown node columns {sorted(unknown)}; expected some of {tuple(NODE_COLUMNS)}')
+        filters = {**(filters or {}), 'doc_path': doc_path} if doc_path else filters
+        clause, params = self.filter_clause(filters)
+        join = "LEFT JOIN documents ON documents.id = nodes.doc_id" if 'doc_path' in columns else ''
+        sql = f"""
+            SELECT {', '.join(('nodes.id', *(NODE_COLUMNS[column] for column in columns)))} FROM nodes {join}
+            WHERE nodes.id > ? {'AND ' + clause if clause else ''} ORDER BY nodes.id LIMIT ?
+        """
+        for row in self._keyset(sql, params, after_id, batch_size, limit):
+            node = dict(zip(('id', *columns), row))
+            if 'metadata' in node:
+                node['metadata'] = load_metadata(node['metadata'])
+            if 'embedding' in node:
+                node['embedding'] = self._float32_blob(node['embedding'])
+            yield node
+
+    def iter_unembedded(self, after_id: int = 0, batch_size: Optional[int] = None,
+                        limit: Optional[int] = None) -> Iterator[Tuple[int, Optional[str]]]:
+        """Yields (row id, text) of the nodes stored without an embedding, in id order, after `after_id`."""
+        sql = "SELECT id, text FROM nodes WHERE id > ? AND embedding IS NULL ORDER BY id LIMIT ?"
+        yield from self._keyset(sql, [], after_id, batch_size, limit)
+
+    def set_embeddings(self, embeddings: List[Tuple[int, bytes]]) -> int:
+        """Stores float32 embedding BLOBs for nodes that have none, by row id; returns how many were set.
+
+        Nodes that were deleted or embedded meanwhile are left alone.
+        """
+        blobs = encode_blobs([blob for _, blob in embeddings], self.embedding_precision)
+        with self._transaction() as c:
+            c.executemany("UPDATE nodes SET embedding = ? WHERE id = ? AND embedding IS NULL",
+                          [(blob, row_id) for (row_id, _), blob in zip(embeddings, blobs)])
+            return c.rowcount
+
+    def _keyset(self, sql: str, params: List[Any], after_id: int, batch_size: Optional[int],
+                limit: Optional[int]) -> Iterator[Tuple]:
+        """Runs `sql` (taking `id > ?` first and `LIMIT ?` last) batch by batch from `after_id`.
+
+        Each batch is a separate query that is fully read before it is yielded,
+        so no statement stays open between batches (and no read snapshot is
+        held) however slowly the caller consumes the rows.
+        """
+        batch_size = batch_size or self.fetch_batch_size
+        remaining = limit if limit is not None else float('inf')
+        while remaining > 0:
+            size = int(min(batch_size, remaining))
+            rows = self._conn().execute(sql, (after_id, *params, size)).fetchall()
+            yield from rows
+            if len(rows) < size:
+                return
+            after_id = rows[-1][0]
+            remaining -= len(rows)
+
+    def page_nodes(self, doc_path: Optional[str] = None, cursor: int = 0, limit: int = 100,
+                   columns: Sequence[str] = DEFAULT_NODE_COLUMNS,
+                   filters: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """One page of iter_nodes: (up to `limit` nodes after `cursor`, the cursor of the next page or None)."""
+        if limit < 1:
+            raise ValueError(f'limit must be at least 1, got {limit}')
+        nodes = list(self.iter_nodes(doc_path, columns, cursor, batch_size=limit + 1, limit=limit + 1,
+                                     filters=filters))
+        return nodes[:limit], nodes[limit - 1]['id'] if len(nodes) > limit else None
+
+    def page_documents(self, cursor: int = 0, limit: int = 100,
+                       columns: Sequence[str] = DOCUMENT_COLUMNS) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """One page of iter_documents: (up to `limit` documents after `cursor`, the next cursor or None)."""
+        if limit < 1:
+            raise ValueError(f'limit must be at least 1, got {limit}')
+        documents = list(self.iter_documents(columns, cursor, batch_size=limit + 1, limit=limit + 1))
+        return documents[:limit], documents[limit - 1]['id'] if len(documents) > limit else None
+
+    def _float32_blob(self, blob: Optional[bytes]) -> Optional[bytes]:
+        if blob is None or self.embedding_precision == 'float32':
+            return blob
+        return decode(blob, self.embedding_precision, len(blob)).tobytes()
+
+    def get_embeddings(self, after_id: int = 0,
+                       filters: Optional[Dict[str, Any]] = None) -> List[Tuple[int, bytes]]:
+        """Returns (row id, stored embedding BLOB) for every node after `after_id` that has an embedding.
+
+        `filters` (see filter_clause) restricts the rows in SQL.
+        """
+        clause, params = self.filter_clause(filters)
+        c = self._conn().cursor()
+        c.execute(f"SELECT id, embedding FROM nodes WHERE embedding IS NOT NULL AND id > ? "
+                  f"{'AND ' + clause if clause else ''} ORDER BY id", (after_id, *params))
+        return c.fetchall()
+
+    def get_embedding_buffer(self, after_id: int = 0, batch_size: int = 4096) -> Tuple[List[int], bytes, int]:
+        """Returns (row ids, their stored embeddings back to back, bytes per row) for nodes after `after_id`.
+
+        Rows are fetched `batch_size` at a time and joined into one buffer, which
+        src.index.quantize decodes with a single np.frombuffer.
+        """
+        c = self._conn().cursor()
+        c.execute("SELECT id, embedding FROM nodes WHERE embedding IS NOT NULL AND id > ? ORDER BY id",
+                  (after_id,))
+        ids: List[int] = []
+        blobs: List[bytes] = []
+        while rows := c.fetchmany(batch_size):
+            for row_id, blob in rows:
+                ids.append(row_id)
+                blobs.append(blob)
+        row_bytes = len(blobs[0]) if blobs else 0
+        if any(len(blob) != row_bytes for blob in blobs):
+            raise ValueError(f'{self.db_path}: node embeddings have inconsistent dimensions')
+        return ids, b''.join(blobs), row_bytes
+
+    def get_embeddings_by_ids(self, ids: List[int]) -> Dict[int, bytes]:
+        """Returns the stored embedding BLOBs of the given nodes, keyed by row id."""
+        if not ids:
+            return {}
+        c = self._conn().cursor()
+        c.execute(f"SELECT id, embedding FROM nodes WHERE id IN ({','.join('?' * len(ids))}) "
+                  "AND embedding IS NOT NULL", list(ids))
+        return dict(c.fetchall())
+
+    def get_nodes_by_ids(self, ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Returns node rows keyed by row id, without their embeddings."""
+        if not ids:
+            return {}
+        c = self._conn().cursor()
+        c.execute(f"""
+            SELECT nodes.id, nodes.node_id, nodes.metadata, documents.path, nodes.text
+            FROM nodes LEFT JOIN documents ON documents.id = nodes.doc_id
+            WHERE nodes.id IN ({','.join('?' * len(ids))})
+        """, list(ids))
+        return {
+            row[0]: {'node_id': row[1], 'metadata': load_metadata(row[2]), 'doc_path': row[3], 'text': row[4]}
             for row in c.fetchall()
-        ]
-        conn.close()
-        return nodes
+        }
+
+    def filter_clause(self, filters: Optional[Dict[str, Any]]) -> Tuple[str, List[Any]]:
+        """SQL condition on `nodes` (and its parameters) for a filters dict; '' for no filters.
+
+        Keys (see FILTER_KEYS): doc_path (a path or a list of paths), page_from
+        and page_to (nodes overlapping the inclusive page range; a node merged
+        across pages spans page..last_page) and element ('text', 'table',
+        'image' or a list of them). Raises ValueError on unknown keys.
+        """
+        filters = {key: value for key, value in (filters or {}).items() if value not in (None, '', [])}
+        unknown = set(filters) - set(FILTER_KEYS)
+        if unknown:
+            raise ValueError(f'Unknown node filters {sorted(unknown)}; expected some of {FILTER_KEYS}')
+        clauses, params = [], []
+        if 'doc_path' in filters:
+            paths = [filters['doc_path']] if isinstance(filters['doc_path'], str) else filters['doc_path']
+            if len(paths) == 1:
+                # '=' lets SQLite walk nodes_doc_id in id order instead of sorting the document's nodes.
+                clauses.append("nodes.doc_id = (SELECT id FROM documents WHERE path = ?)")
+            else:
+                clauses.append(f"nodes.doc_id IN (SELECT id FROM documents WHERE path IN ({','.join('?' * len(paths))}))")
+            params.extend(str(Path(path)) for path in paths)
+        if 'page_from' in filters:
+            clauses.append("COALESCE(nodes.last_page, nodes.page) >= ?")
+            params.append(int(filters['page_from']))
+        if 'page_to' in filters:
+            clauses.append("nodes.page <= ?")
+            params.append(int(filters['page_to']))
+        if 'element' in filters:
+            elements = [filters['element']] if isinstance(filters['element'], str) else filters['element']
+            clauses.append(f"nodes.element IN ({','.join('?' * len(elements))})")
+            params.extend(elements)
+        return ' AND '.join(clauses), params
+
+    def filter_ids(self, filters: Optional[Dict[str, Any]]) -> List[int]:
+        """Returns the row ids of the nodes matching `filters` (see filter_clause), in order."""
+        clause, params = self.filter_clause(filters)
+        return [row[0] for row in self._conn().execute(
+            f"SELECT id FROM nodes {'WHERE ' + clause if clause else ''} ORDER BY id", params)]
+
+    def search_text(self, query: str, k: int = 5,
+                    filters: Optional[Dict[str, Any]] = None) -> List[Tuple[int, float]]:
+        """Returns (row id, BM25 score) of the k best lexical matches among the nodes matching `filters`."""
+        match = fts_query(query)
+        if not match or k <= 0:
+            return []
+        clause, params = self.filter_clause(filters)
+        restrict = f"AND rowid IN (SELECT id FROM nodes WHERE {clause})" if clause else ''
+        c = self._conn().cursor()
+        # bm25() is lower-is-better, so negate it for a higher-is-better score.
+        c.execute(f"""
+            SELECT rowid, -bm25(nodes_fts) FROM nodes_fts
+            WHERE nodes_fts MATCH ? {restrict} ORDER BY bm25(nodes_fts) LIMIT ?
+        """, (match, *params, k))
+        return c.fetchall()
+
+    def get_node_ids(self) -> List[int]:
+        """Returns the row ids of all nodes that have an embedding."""
+        return [row[0] for row in self._conn().execute(
+            "SELECT id FROM nodes WHERE embedding IS NOT NULL ORDER BY id")]
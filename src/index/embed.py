@@ -0,0 +1,286 @@
+import asyncio
+import hashlib
+import logging
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import httpx
+import numpy as np
+
+from src.index.tokenizer import estimate_tokens
+from src.pdf.cache import DiskLRU
+
+# Statuses worth retrying: rate limited, or the embedding server is busy/restarting.
+_RETRY_STATUSES = (408, 429, 500, 502, 503, 504)
+# What a failed embedding request raises once retries are used up; a garbled
+# response is raised as httpx.DecodingError, so bugs elsewhere are not mistaken for an outage.
+EMBEDDING_ERRORS = (httpx.HTTPError,)
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache(DiskLRU):
+    """float32 embedding BLOBs keyed by sha256 of (endpoint url, model, text).
+
+    Headers, footers and boilerplate paragraphs repeat across pages and
+    documents; each distinct text is embedded once per endpoint and model.
+    The url is part of the key because servers often serve one model without
+    a model name, so switching servers must not reuse another model's vectors.
+    """
+
+    def key(self, url: str, model: str, text: str) -> str:
+        return hashlib.sha256(f'{url}\0{model}\0{text}'.encode()).hexdigest()
+
+
+class EmbeddingStats:
+    """Nodes embedded, how many came from the cache, requests sent and seconds spent.
+
+    `deferred` counts nodes stored without an embedding because the endpoint failed.
+    """
+
+    def __init__(self):
+        self.nodes = 0
+        self.cached = 0
+        self.requests = 0
+        self.seconds = 0.0
+        self.deferred = 0
+
+    def update(self, other: 'EmbeddingStats'):
+        self.nodes += other.nodes
+        self.cached += other.cached
+        self.requests += other.requests
+        self.seconds += other.seconds
+        self.deferred += other.deferred
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'nodes': self.nodes, 'cached': self.cached, 'requests': self.requests, 'deferred': self.deferred,
+                'seconds': round(self.seconds, 3),
+                'nodes_per_second': round(self.nodes / self.seconds, 1) if self.seconds else 0.0}
+
+
+class Embedder:
+    """Embeds node texts through an OpenAI-compatible `POST {url}/embeddings` endpoint.
+
+    Distinct uncached texts are packed into requests of at most `batch_size`
+    texts and `max_batch_tokens` estimated tokens, and up to `concurrency`
+    requests are in flight at once, started no faster than
+    `requests_per_second` (0 for no limit). Timeouts, connection errors and
+    retryable statuses are retried `retries` times with exponential backoff
+    (or the server's Retry-After). Vectors come back as packed float32 BLOBs,
+    the format `Index` stores and `decode_embeddings` reads.
+    """
+
+    def __init__(self, url: str, model: str = '', api_key: str = '', batch_size: int = 64,
+                 max_batch_tokens: int = 8192, concurrency: int = 4, requests_per_second: float = 0,
+                 retries: int = 3, backoff: float = 0.5, timeout: float = 60.0,
+                 cache: Optional[EmbeddingCache] = None):
+        self.url = url.rstrip('/')
+        self.model = model
+        self.api_key = api_key
+        self.batch_size = batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.concurrency = concurrency
+        self.requests_per_second = requests_per_second
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.cache = cache
+        self.stats = EmbeddingStats()
+
+    def batches(self, texts: Sequence[str]) -> Iterator[List[int]]:
+        """Positions of `texts` grouped into requests; a text over the token budget goes alone."""
+        batch: List[int] = []
+        tokens = 0
+        for i, text in enumerate(texts):
+            cost = estimate_tokens(text)
+            if batch and (len(batch) >= self.batch_size or tokens + cost > self.max_batch_tokens):
+                yield batch
+                batch, tokens = [], 0
+            batch.append(i)
+            tokens += cost
+        if batch:
+            yield batch
+
+    def embed(self, texts: Sequence[str]) -> List[bytes]:
+        """float32 BLOB for each text, in order. Blocking; call it from a worker thread, not the event loop."""
+        return asyncio.run(self.embed_async(texts))[0]
+
+    def embed_nodes(self, nodes: List[Dict[str, Any]]) -> EmbeddingStats:
+        """Fills the 'embedding' of node dicts (the shape Index.index_doc expects) in place."""
+        blobs, stats = asyncio.run(self.embed_async([node.get('text') or '' for node in nodes]))
+        for node, blob in zip(nodes, blobs):
+            node['embedding'] = blob
+        return stats
+
+    def try_embed_nodes(self, nodes: List[Dict[str, Any]]) -> EmbeddingStats:
+        """Like embed_nodes, but a failing endpoint is logged instead of raised.
+
+        The nodes are then left without an 'embedding', so they can be indexed
+        anyway and embedded later by embed_missing(); the returned stats count
+        them as deferred.
+        """
+        try:
+            return self.embed_nodes(nodes)
+        except EMBEDDING_ERRORS as e:
+            logger.warning('Embedding %d nodes failed, storing them without vectors: %s: %s',
+                           len(nodes), type(e).__name__, e)
+            stats = EmbeddingStats()
+            stats.deferred = len(nodes)
+            self.stats.update(stats)
+            return stats
+
+    def embed_query(self, text: str) -> np.ndarray:
+        """float32 vector of a search query. Blocking, like embed()."""
+        return np.frombuffer(self.embed([text])[0], dtype=np.float32)
+
+    def embed_missing(self, index, batch_size: int = 1024) -> EmbeddingStats:
+        """Embeds the nodes of an src.index.core.Index that were stored without an embedding.
+
+        Works through them `batch_size` at a time, writing each batch before
+        requesting the next, so an interrupted run keeps what it finished.
+        Raises like embed() if the endpoint fails.
+        """
+        stats = EmbeddingStats()
+        after_id = 0
+        while rows := list(index.iter_unembedded(after_id, limit=batch_size)):
+            blobs, batch_stats = asyncio.run(self.embed_async([text or '' for _, text in rows]))
+            index.set_embeddings([(row_id, blob) for (row_id, _), blob in zip(rows, blobs)])
+            stats.update(batch_stats)
+            after_id = rows[-1][0]
+        return stats
+
+    async def embed_async(self, texts: Sequence[str]) -> Tuple[List[bytes], EmbeddingStats]:
+        """float32 BLOB for each text, in order, and the stats of this call (also added to self.stats)."""
+        start = time.perf_counter()
+        stats = EmbeddingStats()
+        stats.nodes = len(texts)
+
+        # Identical texts are embedded once, and cached ones not at all.
+        keys = [self._key(text) for text in texts]
+        vectors: Dict[str, bytes] = {}
+        if self.cache is not None:
+            for key in dict.fromkeys(keys):
+                blob = self.cache.get(key)
+                if blob is not None:
+                    vectors[key] = blob
+        todo = {key: text for key, text in zip(keys, texts) if key not in vectors}
+        stats.cached = len(texts) - sum(1 for key in keys if key in todo)
+
+        if todo:
+            todo_keys, todo_texts = list(todo), list(todo.values())
+            batches = list(self.batches(todo_texts))
+            stats.requests = len(batches)
+            headers = {'Authorization': f'Bearer {self.api_key}'} if self.api_key else None
+            limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+            semaphore = asyncio.Semaphore(self.concurrency)
+            throttle = _Throttle(self.requests_per_second)
+            async with httpx.AsyncClient(limits=limits, headers=headers, timeout=httpx.Timeout(self.timeout)) as client:
+
+                async def run(batch: List[int]) -> Tuple[List[int], np.ndarray]:
+                    async with semaphore:
+                        return batch, await self._request(client, throttle, [todo_texts[i] for i in batch])
+
+                results = await asyncio.gather(*(run(batch) for batch in batches))
+            fresh = self._pack(todo_keys, results)
+            if self.cache is not None:
+                self.cache.put_many(list(fresh.items()))
+            vectors.update(fresh)
+
+        stats.seconds = time.perf_counter() - start
+        self.stats.update(stats)
+        return [vectors[key] for key in keys], stats
+
+    def _key(self, text: str) -> str:
+        if self.cache is not None:
+            return self.cache.key(self.url, self.model, text)
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    @staticmethod
+    def _pack(keys: List[str], results: List[Tuple[List[int], np.ndarray]]) -> Dict[str, bytes]:
+        dims = {matrix.shape[1] for _, matrix in results}
+        if len(dims) > 1:
+            raise httpx.DecodingError(f'Embedding endpoint returned vectors of several dimensions: {sorted(dims)}')
+        return {keys[i]: row.tobytes() for batch, matrix in results for i, row in zip(batch, matrix)}
+
+    @staticmethod
+    def _vectors(response: httpx.Response, n_texts: int) -> np.ndarray:
+        """The (n_texts, dim) float32 matrix of an embeddings response; httpx.DecodingError if it is malformed."""
+        try:
+            data = sorted(response.json()['data'], key=lambda item: item.get('index', 0))
+            vectors = np.asarray([item['embedding'] for item in data], dtype=np.float32)
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            raise httpx.DecodingError(f'Malformed embeddings response: {type(e).__name__}: {e}',
+                                      request=response.request) from e
+        if vectors.ndim != 2 or len(vectors) != n_texts:
+            raise httpx.DecodingError(f'Embedding endpoint returned {len(vectors)} vectors for {n_texts} texts',
+                                      request=response.request)
+        return vectors
+
+    async def _request(self, client: httpx.AsyncClient, throttle: '_Throttle', texts: List[str]) -> np.ndarray:
+        """Embeds one batch, retrying transient failures; returns a (len(texts), dim) float32 matrix."""
+        payload: Dict[str, Any] = {'input': texts}
+        if self.model:
+            payload['model'] = self.model
+        for attempt in range(self.retries + 1):
+            await throttle.wait()
+            try:
+                response = await client.post(f'{self.url}/embeddings', json=payload)
+                response.raise_for_status()
+            except httpx.HTTPStatusError as e:
+                if attempt == self.retries or e.response.status_code not in _RETRY_STATUSES:
+                    raise
+                delay = _retry_after(e.response) or self.backoff * 2 ** attempt
+            except httpx.TransportError:
+                if attempt == self.retries:
+                    raise
+                delay = self.backoff * 2 ** attempt
+            else:
+                return self._vectors(response, len(texts))
+            await asyncio.sleep(delay)
+
+
+class _Throttle:
+    """Spaces request starts at least 1 / rate seconds apart; a rate of 0 never waits."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next_slot = 0.0
+
+    async def wait(self):
+        if not self.interval:
+            return
+        # No await between reading and moving next_slot, so concurrent callers get distinct slots.
+        now = time.monotonic()
+        slot = max(now, self.next_slot)
+        self.next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    try:
+        return float(response.headers['Retry-After'])
+    except (KeyError, ValueError):
+        return None
+
+
+def embedder_from_config(url: Optional[str] = None) -> Optional[Embedder]:
+    """Embedder for `url` (default [llm_server].embedding_url) tuned by [embedding]; None when the url is ''."""
+    from src.common.config import get_config_value
+
+    if url is None:
+        url = get_config_value(['llm_server', 'embedding_url'], '')
+    if not url:
+        return None
+    cache_path = get_config_value(['embedding', 'cache'], 'processed_sources/embedding_cache.db')
+    cache = EmbeddingCache(cache_path, get_config_value(['embedding', 'cache_mb'], 1024)) if cache_path else None
+    return Embedder(url,
+                    model=get_config_value(['embedding', 'model'], ''),
+                    api_key=get_config_value(['llm_server', 'api_key'], ''),
+                    batch_size=get_config_value(['embedding', 'batch_size'], 64),
+                    max_batch_tokens=get_config_value(['embedding', 'max_batch_tokens'], 8192),
+                    concurrency=get_config_value(['embedding', 'concurrency'], 4),
+                    requests_per_second=get_config_value(['embedding', 'requests_per_second'], 0.0),
+                    retries=get_config_value(['embedding', 'retries'], 3),
+                    timeout=get_config_value(['embedding', 'timeout'], 60.0),
+                    cache=cache)
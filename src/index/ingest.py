@@ -0,0 +1,262 @@
+import argparse
+import glob
+import json
+import os
+import signal
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import pdfplumber
+
+from src.common.digest import file_digest, file_key, remember_digest
+from src.index.core import Index
+from src.index.embed import Embedder, EmbeddingStats, embedder_from_config
+from src.index.schema import NodeBatch
+from src.pdf.cache import PageCache, TableCache
+from src.pdf.extract import ExtractionStrategy, NodesFromPageStrategy, TokenBudgetChunkingStrategy
+from src.pdf.pdf import PageTask
+from src.pdf.text import TEXT_ENGINES, serialization_strategy
+from src.pdf.triage import PAGE_SCANNED, TriageReport
+
+
+def expand_paths(target: str) -> List[Path]:
+    """Returns the PDFs in a directory (recursively), matching a glob, or the file itself."""
+    path = Path(target)
+    if path.is_dir():
+        return sorted(p for p in path.rglob('*') if p.suffix.lower() == '.pdf' and p.is_file())
+    if path.is_file():
+        return [path]
+    return sorted(Path(p) for p in glob.glob(target, recursive=True) if p.lower().endswith('.pdf'))
+
+
+def _raise_timeout(signum, frame):
+    raise TimeoutError('PDF processing exceeded the per-file timeout')
+
+
+def pdf_to_nodes(path: str, table_settings: Optional[Dict] = None, timeout: int = 0,
+                 table_cache: Optional[TableCache] = None,
+                 page_cache: Optional[PageCache] = None,
+                 chunking: Optional[ExtractionStrategy] = None,
+                 digest: Optional[Tuple[Tuple[str, int, int], str]] = None,
+                 text_engine: str = 'textmap'
+                 ) -> Tuple[str, str, NodeBatch, Dict, List[int]]:
+    """Worker: serializes every page of a PDF into nodes.
+
+    Runs in a pool process. Pages go through the same PageTask as Pdf, without
+    an extraction strategy since only the nodes are kept, so no markdown is
+    built; `text_engine` picks the serialization (see src.pdf.text.TEXT_ENGINES)
+    and `chunking` defaults to NodesFromPageStrategy. `timeout` (seconds, 0 for
+    none) is enforced with SIGALRM where available, so a pathological file
+    aborts instead of holding the worker forever. `digest` is the (file_key,
+    sha256) the caller already computed; it is reused unless the file changed since.
+
+    Returns:
+        (path, sha256, the nodes as a NodeBatch (see NodeBatch.to_dicts),
+         TriageReport.to_dict(), numbers of the pages without a text layer)
+    """
+    use_alarm = timeout > 0 and hasattr(signal, 'SIGALRM')
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.alarm(timeout)
+    try:
+        if digest is not None:
+            remember_digest(*digest)
+        task = PageTask(serialization_strategy(text_engine, table_cache), None,
+                        chunking or NodesFromPageStrategy(), table_settings, page_cache)
+        nodes = []
+        triage = TriageReport()
+        scanned = []
+        with pdfplumber.open(path) as pdf:
+            for page in pdf.pages:
+                result = task(page)
+                nodes.extend(result.nodes)
+                triage.add(result.page_class, result.seconds)
+                if result.page_class == PAGE_SCANNED:
+                    scanned.append(result.page_number)
+                page.close()
+        if hasattr(task.chunking, 'merge'):
+            nodes = list(task.chunking.merge(nodes))
+        return path, file_digest(path), NodeBatch.from_nodes(nodes), triage.to_dict(), scanned
+    finally:
+        if use_alarm:
+            signal.alarm(0)
+
+
+class BulkIngest:
+    """Fans PDFs out to a process pool and writes the results from a single writer.
+
+    Workers only parse; the calling process is the only one touching SQLite and
+    writes finished documents `batch_size` at a time in one transaction. New
+    files are submitted while the summed size of the PDFs in flight stays under
+    `max_in_flight_mb` (the parse results of a PDF scale with its size), so
+    thousands of documents can be ingested without holding them all in memory.
+    With an `embedder`, each write batch is embedded in one go first, so its
+    requests are packed and sent concurrently across documents.
+    """
+
+    def __init__(self, index: Index, workers: int = 0, timeout: int = 300,
+                 max_in_flight_mb: int = 1024, batch_size: int = 16,
+                 table_settings: Optional[Dict] = None, table_cache: Optional[TableCache] = None,
+                 page_cache: Optional[PageCache] = None, chunking: Optional[ExtractionStrategy] = None,
+                 embedder: Optional[Embedder] = None, text_engine: str = 'textmap'):
+        if text_engine not in TEXT_ENGINES:
+            raise ValueError(f'Unknown text engine {text_engine!r}; expected one of {sorted(TEXT_ENGINES)}')
+        self.index = index
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.max_in_flight_bytes = max_in_flight_mb * 1024 * 1024
+        self.batch_size = batch_size
+        self.table_settings = table_settings
+        self.table_cache = table_cache
+        self.page_cache = page_cache
+        self.chunking = chunking
+        self.embedder = embedder
+        self.text_engine = text_engine
+
+    def run(self, target: str, remove_missing: bool = True) -> Dict[str, Any]:
+        """Ingests every new or changed PDF under `target`.
+
+        A worker process that dies fails the files in flight with it; the
+        remaining files go to a new pool and finished ones are still written.
+
+        Returns:
+            Dict: counts of indexed / unchanged files, failures by path, removed paths,
+            pages and seconds per page class, scanned page numbers by path, embedding
+            throughput (nodes, cache hits, requests, nodes per second, nodes deferred
+            because the endpoint failed) and timings.
+        """
+        start = time.perf_counter()
+        paths = expand_paths(target)
+        # needs_indexing hashes changed files; the digests go to the workers so they do not hash again.
+        digests = {}
+        for p in paths:
+            key = file_key(p)
+            if self.index.needs_indexing(str(p)):
+                digests[p] = (key, file_digest(p, key))
+        todo = list(digests)
+        report: Dict[str, Any] = {'found': len(paths), 'unchanged': len(paths) - len(todo),
+                                  'indexed': 0, 'failed': {}, 'removed': [], 'scanned': {}}
+        triage = TriageReport()
+        embedding = EmbeddingStats()
+
+        pending: Dict[Future, Tuple[Path, int]] = {}
+        batch: List[Tuple[str, str, List[Dict[str, Any]]]] = []
+        in_flight = 0
+        queue = list(reversed(todo))
+        pool = ProcessPoolExecutor(max_workers=self.workers)
+        try:
+            while queue or pending:
+                # Keep at least one file in flight so a single huge PDF still gets processed.
+                while queue and (not pending or in_flight + queue[-1].stat().st_size <= self.max_in_flight_bytes):
+                    path = queue.pop()
+                    size = path.stat().st_size
+                    try:
+                        future = pool.submit(pdf_to_nodes, str(path), self.table_settings, self.timeout,
+                                             self.table_cache, self.page_cache, self.chunking, digests[path],
+                                             self.text_engine)
+                    except BrokenProcessPool:
+                        # A worker died (killed, out of memory, a crash in native code) and took the
+                        # pool down; the files in flight fail with it below, the rest go to a new pool.
+                        queue.append(path)
+                        pool.shutdown(wait=False)
+                        pool = ProcessPoolExecutor(max_workers=self.workers)
+                        continue
+                    pending[future] = (path, size)
+                    in_flight += size
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path, size = pending.pop(future)
+                    in_flight -= size
+                    try:
+                        doc_path, digest, nodes, page_triage, scanned = future.result()
+                    except Exception as e:
+                        report['failed'][str(path)] = f'{type(e).__name__}: {e}'
+                        continue
+                    batch.append((doc_path, digest, nodes.to_dicts()))
+                    triage.update(page_triage)
+                    if scanned:
+                        report['scanned'][doc_path] = scanned
+                if len(batch) >= self.batch_size:
+                    self._write(batch, report, embedding)
+                    batch = []
+        finally:
+            pool.shutdown(cancel_futures=True)
+        if batch:
+            self._write(batch, report, embedding)
+
+        if remove_missing and Path(target).is_dir():
+            report['removed'] = self.index.remove_missing(target)
+        report['pages'] = triage.to_dict()
+        if self.embedder is not None:
+            report['embedding'] = embedding.to_dict()
+        report['seconds'] = round(time.perf_counter() - start, 3)
+        return report
+
+    def _write(self, batch: List[Tuple[str, str, List[Dict[str, Any]]]], report: Dict[str, Any],
+               embedding: EmbeddingStats):
+        """Embeds the batch's nodes (if there is an embedder) and writes it in one transaction.
+
+        If the embedding endpoint fails, the nodes are written without vectors
+        and counted as deferred; `--embed-missing` (Embedder.embed_missing) fills them in later.
+        """
+        if self.embedder is not None:
+            nodes = [node for _, _, doc_nodes in batch for node in doc_nodes]
+            embedding.update(self.embedder.try_embed_nodes(nodes))
+        report['indexed'] += self.index.index_docs(batch)
+
+
+def chunking_from_config() -> TokenBudgetChunkingStrategy:
+    """Token-budget chunker sized by [rag].chunk_size / chunk_overlap, capped at [api].token_limit."""
+    from src.common.config import get_config_value
+
+    max_tokens = min(get_config_value(['rag', 'chunk_size'], 1024), get_config_value(['api', 'token_limit'], 16384))
+    return TokenBudgetChunkingStrategy(max_tokens, get_config_value(['rag', 'chunk_overlap'], 128))
+
+
+def main():
+    # Run from the project root: python -m src.index.ingest <dir|glob>
+    from src.common.config import set_config_path, get_config_value
+
+    set_config_path('config/custom_config.toml')
+    parser = argparse.ArgumentParser(description='Bulk-ingest PDFs into the index.')
+    parser.add_argument('target', help='A directory, a glob such as "docs/**/*.pdf", or a single PDF.')
+    parser.add_argument('--db', default=get_config_value(['rag', 'db_path'], 'chunking_study/processed_sources/index0.db'))
+    parser.add_argument('--workers', type=int, default=get_config_value(['ingest', 'workers'], 0))
+    parser.add_argument('--timeout', type=int, default=get_config_value(['ingest', 'timeout'], 300))
+    parser.add_argument('--max-in-flight-mb', type=int, default=get_config_value(['ingest', 'max_in_flight_mb'], 1024))
+    parser.add_argument('--batch-size', type=int, default=get_config_value(['ingest', 'batch_size'], 16))
+    parser.add_argument('--table-cache', default=get_config_value(['pdf', 'table_cache'], 'processed_sources/table_cache.db'),
+                        help="SQLite file caching detected tables; '' disables it.")
+    parser.add_argument('--page-cache', default=get_config_value(['pdf', 'page_cache'], 'processed_sources/page_cache.db'),
+                        help="SQLite file caching serialized pages; '' disables it.")
+    parser.add_argument('--text-engine', choices=sorted(TEXT_ENGINES),
+                        default=get_config_value(['pdf', 'text_engine'], 'textmap'))
+    parser.add_argument('--embedding-url', default=get_config_value(['llm_server', 'embedding_url'], ''),
+                        help="OpenAI-compatible embeddings endpoint; '' stores nodes without vectors.")
+    parser.add_argument('--embed-missing', action='store_true',
+                        help='Afterwards, embed nodes stored without vectors, e.g. while the endpoint was down.')
+    args = parser.parse_args()
+
+    index = Index(args.db, embedding_precision=get_config_value(['rag', 'embedding_precision'], 'float32'))
+    table_cache = TableCache(args.table_cache, get_config_value(['pdf', 'table_cache_mb'], 256)) if args.table_cache else None
+    page_cache = PageCache(args.page_cache, get_config_value(['pdf', 'page_cache_mb'], 1024)) if args.page_cache else None
+    embedder = embedder_from_config(args.embedding_url)
+    report = BulkIngest(index, workers=args.workers, timeout=args.timeout,
+                        max_in_flight_mb=args.max_in_flight_mb, batch_size=args.batch_size,
+                        table_cache=table_cache, page_cache=page_cache,
+                        chunking=chunking_from_config(), embedder=embedder,
+                        text_engine=args.text_engine).run(args.target)
+    if args.embed_missing and embedder is not None:
+        report['embed_missing'] = embedder.embed_missing(index).to_dict()
+    index.close()
+    json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+# Storage precisions of node embeddings, from exact to smallest. An int8 row is
+# a float32 scale (max |x| / 127) followed by one int8 code per dimension.
+PRECISIONS = ('float32', 'float16', 'int8')
+
+_FLOAT_DTYPES = {'float32': np.dtype('<f4'), 'float16': np.dtype('<f2')}
+
+
+def check_precision(precision: str) -> str:
+    if precision not in PRECISIONS:
+        raise ValueError(f'Embedding precision must be one of {PRECISIONS}, got {precision!r}')
+    return precision
+
+
+def row_dtype(dim: int, precision: str) -> np.dtype:
+    """dtype of one stored row, so a buffer of rows decodes with a single np.frombuffer."""
+    if precision == 'int8':
+        return np.dtype([('scale', '<f4'), ('codes', 'i1', (dim,))])
+    return np.dtype((_FLOAT_DTYPES[precision], (dim,)))
+
+
+def dim_of(row_bytes: int, precision: str) -> int:
+    if precision == 'int8':
+        return row_bytes - 4
+    return row_bytes // _FLOAT_DTYPES[precision].itemsize
+
+
+def encode(matrix: np.ndarray, precision: str) -> bytes:
+    """Packs float32 rows into the stored row format, back to back."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if precision != 'int8':
+        return matrix.astype(_FLOAT_DTYPES[precision], copy=False).tobytes()
+    rows = np.empty(len(matrix), dtype=row_dtype(matrix.shape[1], precision))
+    scales = np.abs(matrix).max(axis=1) / 127
+    scales[scales == 0] = 1.0
+    rows['scale'] = scales
+    rows['codes'] = np.clip(np.rint(matrix / scales[:, None]), -127, 127)
+    return rows.tobytes()
+
+
+def encode_blobs(blobs: Sequence[Optional[bytes]], precision: str) -> List[Optional[bytes]]:
+    """Re-encodes float32 embedding BLOBs (None for nodes without one) in `precision`."""
+    blobs = list(blobs)
+    present = [i for i, blob in enumerate(blobs) if blob is not None]
+    if precision == 'float32' or not present:
+        return blobs
+    if len({len(blobs[i]) for i in present}) > 1:
+        raise ValueError('Node embeddings have inconsistent dimensions')
+    encoded = encode(np.frombuffer(b''.join(blobs[i] for i in present), dtype='<f4').reshape(len(present), -1),
+                     precision)
+    size = len(encoded) // len(present)
+    for n, i in enumerate(present):
+        blobs[i] = encoded[n * size:(n + 1) * size]
+    return blobs
+
+
+def decode(buffer: bytes, precision: str, row_bytes: int) -> np.ndarray:
+    """Dequantized float32 rows of a buffer of stored rows."""
+    return QuantizedMatrix.from_buffer(buffer, precision, row_bytes).to_float32()
+
+
+class QuantizedMatrix:
+    """Row vectors kept in their stored precision, scored against float32 queries.
+
+    `codes` is a zero-copy view into the fetched buffer when built with
+    from_buffer. Scores are cosine similarities: each row's dot product with
+    the (unit) query times its precomputed 1 / ||row||, so the int8 scale
+    cancels out and is only needed to dequantize. float16 and int8 rows are
+    widened to float32 `block` rows at a time into one reused buffer, small
+    enough to stay in cache, which bounds the temporary memory of a query.
+    """
+
+    def __init__(self, codes: np.ndarray, precision: str, scales: Optional[np.ndarray] = None,
+                 block: int = 1024):
+        self.codes = codes
+        self.precision = check_precision(precision)
+        self.scales = scales
+        self.block = block
+        norms = np.empty(len(codes), dtype=np.float32)
+        for start, rows in self._blocks():
+            norms[start:start + len(rows)] = np.linalg.norm(rows, axis=1)
+        self.inv_norms = 1.0 / np.maximum(norms, 1e-12)
+
+    @classmethod
+    def from_buffer(cls, buffer: bytes, precision: str, row_bytes: int, **kwargs) -> 'QuantizedMatrix':
+        rows = np.frombuffer(buffer, dtype=row_dtype(dim_of(row_bytes, precision), precision))
+        if precision == 'int8':
+            return cls(rows['codes'], precision, rows['scale'], **kwargs)
+        return cls(rows, precision, **kwargs)
+
+    @classmethod
+    def from_float32(cls, matrix: np.ndarray, precision: str, **kwargs) -> 'QuantizedMatrix':
+        """Quantizes float32 rows, e.g. to search in int8 an index stored in float32."""
+        return cls.from_buffer(encode(matrix, precision), precision,
+                               row_dtype(matrix.shape[1], precision).itemsize, **kwargs)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def dim(self) -> int:
+        return self.codes.shape[1] if self.codes.ndim == 2 else 0
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.inv_norms.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def _blocks(self, positions: Optional[np.ndarray] = None):
+        """Yields (offset, float32 rows) over all rows, or over the rows at `positions`."""
+        n = len(self.codes) if positions is None else len(positions)
+        if self.precision == 'float32' and positions is None:
+            yield 0, self.codes
+            return
+        buffer = np.empty((min(self.block, n), self.dim), dtype=np.float32)
+        for start in range(0, n, self.block):
+            rows = buffer[:n - start] if start + self.block > n else buffer
+            codes = (self.codes[start:start + self.block] if positions is None
+                     else self.codes[positions[start:start + self.block]])
+            np.copyto(rows, codes, casting='unsafe')
+            yield start, rows
+
+    def scores(self, query: np.ndarray, positions: Optional[np.ndarray] = None) -> np.ndarray:
+        """Cosine similarity to a unit-length float32 query of every row, or of the rows at `positions`."""
+        scores = np.empty(len(self.codes) if positions is None else len(positions), dtype=np.float32)
+        for start, rows in self._blocks(positions):
+            scores[start:start + len(rows)] = rows @ query
+        return scores * (self.inv_norms if positions is None else self.inv_norms[positions])
+
+    def to_float32(self, positions: Optional[np.ndarray] = None) -> np.ndarray:
+        """Dequantized rows (all of them, or those at `positions`)."""
+        codes = self.codes if positions is None else self.codes[positions]
+        matrix = codes.astype(np.float32)
+        if self.scales is not None:
+            matrix *= (self.scales if positions is None else self.scales[positions])[:, None]
+        return matrix
@@ -1,4 +1,6 @@
-from typing import Dict, Optional
+from typing import Any, Dict, Iterator, List, Optional
+import itertools
+import os
 import uuid
 from enum import Enum
 
@@ -7,11 +9,99 @@ class NodeRelationship(str, Enum):
     NEXT = "next"
 
 class RelatedNodeInfo:
+    __slots__ = ('node_id',)
+
     def __init__(self, node_id: str):
         self.node_id = node_id
 
+
+# Node ids are '<random process prefix>-<counter>' rather than one uuid4 per
+# node: unique across processes and runs, at the cost of a counter increment.
+_id_prefix = uuid.uuid4().hex
+_id_counter = itertools.count()
+
+def _reset_ids():
+    global _id_prefix, _id_counter
+    _id_prefix = uuid.uuid4().hex
+    _id_counter = itertools.count()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_ids)  # forked pool workers must not repeat the parent's ids
+
+def new_node_id() -> str:
+    return f'{_id_prefix}-{next(_id_counter):x}'
+
+
 class TextNode:
-    def __init__(self, text: str):
+    __slots__ = ('text', 'node_id', 'metadata', 'relationships')
+
+    def __init__(self, text: str, metadata: Optional[Dict[str, Any]] = None):
         self.text = text
-        self.node_id = str(uuid.uuid4())
-        self.relationships: Dict[NodeRelationship, RelatedNodeInfo] = {}
\ No newline at end of file
+        self.node_id = new_node_id()
+        self.metadata: Dict[str, Any] = metadata or {}
+        self.relationships: Dict[NodeRelationship, RelatedNodeInfo] = {}
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns the node in the shape Index.index_doc expects."""
+        metadata = dict(self.metadata)
+        for relationship, info in self.relationships.items():
+            metadata[relationship.value] = info.node_id
+        return {'node_id': self.node_id, 'text': self.text, 'embedding': None, 'metadata': metadata}
+
+
+class NodeBatch:
+    """A document's nodes stored by column: texts and metadata lists under one id prefix.
+
+    Node i has the id '<batch id>-<i>', and its neighbours are i - 1 and i + 1,
+    so no per-node object, id or link is built until to_dicts() or nodes()
+    asks for them. Cheap to pickle back from a worker process.
+    """
+    __slots__ = ('batch_id', 'texts', 'metadata')
+
+    def __init__(self, texts: Optional[List[str]] = None, metadata: Optional[List[Dict[str, Any]]] = None):
+        self.batch_id = new_node_id()
+        self.texts: List[str] = texts if texts is not None else []
+        self.metadata: List[Dict[str, Any]] = metadata if metadata is not None else [{} for _ in self.texts]
+        if len(self.metadata) != len(self.texts):
+            raise ValueError('NodeBatch needs one metadata dict per text')
+
+    @classmethod
+    def from_nodes(cls, nodes: List[TextNode]) -> 'NodeBatch':
+        return cls([node.text for node in nodes], [node.metadata for node in nodes])
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def append(self, text: str, metadata: Optional[Dict[str, Any]] = None):
+        self.texts.append(text)
+        self.metadata.append(metadata or {})
+
+    def node_id(self, i: int) -> str:
+        return f'{self.batch_id}-{i}'
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """The nodes in the shape Index.index_doc expects, linked previous/next in order."""
+        ids = [self.node_id(i) for i in range(len(self.texts))]
+        out = []
+        for i, (text, metadata) in enumerate(zip(self.texts, self.metadata)):
+            metadata = dict(metadata)
+            if i > 0:
+                metadata[NodeRelationship.PREVIOUS.value] = ids[i - 1]
+            if i < len(ids) - 1:
+                metadata[NodeRelationship.NEXT.value] = ids[i + 1]
+            out.append({'node_id': ids[i], 'text': text, 'embedding': None, 'metadata': metadata})
+        return out
+
+    def nodes(self) -> Iterator[TextNode]:
+        """Materializes linked TextNodes, for code that needs node objects."""
+        previous = None
+        for i, (text, metadata) in enumerate(zip(self.texts, self.metadata)):
+            node = TextNode(text, dict(metadata))
+            node.node_id = self.node_id(i)
+            if previous is not None:
+                node.relationships[NodeRelationship.PREVIOUS] = RelatedNodeInfo(previous.node_id)
+                previous.relationships[NodeRelationship.NEXT] = RelatedNodeInfo(node.node_id)
+                yield previous
+            previous = node
+        if previous is not None:
+            yield previous
@@ -0,0 +1,231 @@
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.index.core import Index
+from src.index.quantize import PRECISIONS, QuantizedMatrix, check_precision, decode
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scales each row to unit length, so dot products are cosine similarities."""
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+
+def decode_embeddings(rows: List[Tuple[int, bytes]], source: str = '', precision: str = 'float32'):
+    """Turns (row id, stored BLOB) rows into an id array and a normalized float32 matrix."""
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32)
+
+    dim_bytes = len(rows[0][1])
+    if any(len(blob) != dim_bytes for _, blob in rows):
+        raise ValueError(f'{source}: node embeddings have inconsistent dimensions')
+
+    ids = np.fromiter((row_id for row_id, _ in rows), dtype=np.int64, count=len(rows))
+    matrix = decode(b''.join(blob for _, blob in rows), precision, dim_bytes)
+    return ids, normalize(matrix)
+
+
+def load_matrix(index: Index, precision: Optional[str] = None) -> Tuple[np.ndarray, QuantizedMatrix]:
+    """Reads every node embedding of an index into an id array and a QuantizedMatrix.
+
+    The matrix is a zero-copy view of the fetched rows when `precision` is the
+    stored one (the default); otherwise it is converted, e.g. to keep an index
+    stored in float32 as int8 in memory.
+    """
+    stored = index.embedding_precision
+    ids, buffer, row_bytes = index.get_embedding_buffer()
+    ids = np.asarray(ids, dtype=np.int64)
+    if not row_bytes:
+        return ids, QuantizedMatrix(np.empty((0, 0), dtype=np.float32), 'float32')
+    matrix = QuantizedMatrix.from_buffer(buffer, stored, row_bytes)
+    if precision and precision != stored:
+        matrix = QuantizedMatrix.from_float32(matrix.to_float32(), precision)
+    return ids, matrix
+
+
+def select_top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Returns the positions of the k highest scores, best first."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    best = np.argpartition(-scores, k - 1)[:k]
+    return best[np.argsort(-scores[best], kind='stable')]
+
+
+def find_positions(sorted_ids: np.ndarray, ids: Sequence[int]) -> np.ndarray:
+    """Positions of `ids` in the sorted array `sorted_ids`; ids not in it are skipped."""
+    ids = np.asarray(ids, dtype=np.int64)
+    positions = np.searchsorted(sorted_ids, ids)
+    found = positions < len(sorted_ids)
+    found[found] = sorted_ids[positions[found]] == ids[found]
+    return positions[found]
+
+
+def as_query(query, dim: int) -> np.ndarray:
+    query = np.asarray(query, dtype=np.float32).ravel()
+    if query.shape[0] != dim:
+        raise ValueError(f'Expected a query of dimension {dim}, but got {query.shape[0]}')
+    return normalize(query)
+
+
+def with_nodes(index: Index, ids: Sequence[int], scores: Sequence[float]) -> List[Dict[str, Any]]:
+    """Attaches node_id, doc_path, text and metadata to ranked (id, score) pairs.
+
+    Ids whose nodes were deleted since the search structures were loaded are dropped.
+    """
+    ids = [int(row_id) for row_id in ids]
+    nodes = index.get_nodes_by_ids(ids)
+    return [
+        {'id': row_id, 'score': float(score), **nodes[row_id]}
+        for row_id, score in zip(ids, scores) if row_id in nodes
+    ]
+
+
+def reciprocal_rank_fusion(rankings: List[Sequence[int]], k: int = 60) -> List[Tuple[int, float]]:
+    """Fuses ranked id lists; each list adds 1 / (k + rank) to the score of its ids."""
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, row_id in enumerate(ranking, start=1):
+            fused[int(row_id)] = fused.get(int(row_id), 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+class VectorSearch:
+    """Exact top-k search over the node embeddings of an `Index`.
+
+    Embeddings are read once into a QuantizedMatrix (one row per node, in the
+    index's storage precision unless `precision` asks for a smaller one) with a
+    parallel array of node row ids. A query is scored against every node with
+    one matrix-vector product and the best k are picked with `argpartition`
+    instead of a full sort. When the matrix is held in a lossier precision than
+    the index stores, the best `rescore * k` candidates are re-ranked in
+    float32 from their stored embeddings.
+    """
+
+    def __init__(self, index: Index, precision: Optional[str] = None, rescore: int = 4):
+        self.index = index
+        self.precision = check_precision(precision) if precision else None
+        self.rescore = rescore
+        # (ids, matrix) of one load, replaced as a whole so that concurrent
+        # searches never see the ids of one load with the matrix of another.
+        self._loaded: Optional[Tuple[np.ndarray, QuantizedMatrix]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def ids(self) -> Optional[np.ndarray]:
+        loaded = self._loaded
+        return None if loaded is None else loaded[0]
+
+    @property
+    def matrix(self) -> Optional[QuantizedMatrix]:
+        loaded = self._loaded
+        return None if loaded is None else loaded[1]
+
+    def load(self) -> 'VectorSearch':
+        with self._lock:
+            self._loaded = load_matrix(self.index, self.precision)
+        return self
+
+    def invalidate(self):
+        """Drops the loaded matrix; the next search reloads it from the index.
+
+        Waits for a load in progress, so a matrix read before the index changed
+        is not kept. Searches already running finish on the matrix they started with.
+        """
+        with self._lock:
+            self._loaded = None
+
+    def snapshot(self) -> Tuple[np.ndarray, QuantizedMatrix]:
+        """The loaded (ids, matrix), loading them first if needed; one load per invalidation across threads."""
+        loaded = self._loaded
+        if loaded is None:
+            with self._lock:
+                if self._loaded is None:
+                    self._loaded = load_matrix(self.index, self.precision)
+                loaded = self._loaded
+        return loaded
+
+    def top_k(self, query: np.ndarray, k: int, filters: Optional[Dict[str, Any]] = None):
+        """Returns (row ids, cosine scores) of the k best nodes, best first.
+
+        With `filters` (see Index.filter_clause), the matching ids are selected
+        in SQL first and only their rows are scored.
+        """
+        all_ids, matrix = self.snapshot()
+        if len(all_ids) == 0 or k <= 0:
+            return all_ids[:0], np.empty(0, dtype=np.float32)
+
+        query = as_query(query, matrix.dim)
+        ids, positions = all_ids, None
+        if filters:
+            positions = find_positions(all_ids, self.index.filter_ids(filters))
+            ids = all_ids[positions]
+        scores = matrix.scores(query, positions)
+        if self.rescore > 0 and PRECISIONS.index(matrix.precision) > PRECISIONS.index(self.index.embedding_precision):
+            candidates = select_top_k(scores, k * self.rescore)
+            return self.exact_top_k(ids[candidates], query, k)
+        best = select_top_k(scores, k)
+        return ids[best], scores[best]
+
+    def exact_top_k(self, ids: Sequence[int], query: np.ndarray, k: int):
+        """The k best of the given node ids by float32 cosine similarity to their stored embeddings.
+
+        Reads only those rows from the index; `query` must be unit length.
+        """
+        blobs = self.index.get_embeddings_by_ids([int(row_id) for row_id in ids])
+        ids = np.asarray([row_id for row_id in ids if int(row_id) in blobs], dtype=np.int64)
+        if len(ids) == 0:
+            return ids, np.empty(0, dtype=np.float32)
+        row_bytes = len(next(iter(blobs.values())))
+        vectors = decode(b''.join(blobs[int(row_id)] for row_id in ids), self.index.embedding_precision, row_bytes)
+        scores = normalize(vectors) @ query
+        best = select_top_k(scores, k)
+        return ids[best], scores[best]
+
+    def search(self, query: np.ndarray, k: int = 5, **search_params) -> List[Dict[str, Any]]:
+        """Returns the k best nodes with their scores and metadata."""
+        ids, scores = self.top_k(query, k, **search_params)
+        return with_nodes(self.index, ids, scores)
+
+
+class LexicalSearch:
+    """BM25 keyword search over the FTS5 table of an `Index`.
+
+    Answers exact-term queries (form numbers, product codes, CJK words) from the
+    inverted index, without touching the embeddings.
+    """
+
+    def __init__(self, index: Index):
+        self.index = index
+
+    def top_k(self, query: str, k: int, filters: Optional[Dict[str, Any]] = None):
+        rows = self.index.search_text(query, k, filters)
+        return [row_id for row_id, _ in rows], [score for _, score in rows]
+
+    def search(self, query: str, k: int = 5, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        ids, scores = self.top_k(query, k, filters)
+        return with_nodes(self.index, ids, scores)
+
+
+class HybridSearch:
+    """Fuses the lexical and vector rankings with reciprocal rank fusion.
+
+    Each engine contributes its best `candidates` nodes; the fused score only
+    depends on ranks, so BM25 and cosine scores need no calibration.
+    """
+
+    def __init__(self, vector: VectorSearch, lexical: LexicalSearch, candidates: int = 50, rrf_k: int = 60):
+        self.vector = vector
+        self.lexical = lexical
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+
+    def search(self, query: str, query_embedding: np.ndarray, k: int = 5,
+               filters: Optional[Dict[str, Any]] = None, **search_params) -> List[Dict[str, Any]]:
+        rankings = [self.lexical.top_k(query, max(k, self.candidates), filters)[0]]
+        if query_embedding is not None:
+            rankings.append(self.vector.top_k(query_embedding, max(k, self.candidates), filters=filters,
+                                              **search_params)[0])
+        fused = reciprocal_rank_fusion(rankings, self.rrf_k)[:k]
+        return with_nodes(self.lexical.index, [row_id for row_id, _ in fused], [score for _, score in fused])
@@ -0,0 +1,56 @@
+import functools
+import re
+from typing import List
+
+# Han, kana and hangul; these scripts are written without spaces between words.
+_CJK = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af'
+
+# A run is either a block of CJK characters or a code-like word such as
+# `MTAN001-A` whose parts are joined by '-', '_', '.' or '/'.
+_RUN = re.compile(rf'[{_CJK}]+|[^\W_{_CJK}]+(?:[-_./][^\W_{_CJK}]+)*')
+_WORD_SEPARATOR = re.compile(r'[-_./]')
+_IS_CJK = re.compile(rf'[{_CJK}]')
+_SPACE = re.compile(r'\s')
+
+
+def token_runs(text: str) -> List[List[str]]:
+    """Splits text into runs of adjacent tokens.
+
+    CJK blocks become overlapping character bigrams ('入職指南' -> '入職', '職指',
+    '指南'), so two-character words match without a dictionary. Other words are
+    lower-cased and split on their inner separators ('MTAN001-A' -> 'mtan001', 'a').
+    """
+    runs = []
+    for match in _RUN.finditer(text or ''):
+        run = match.group()
+        if _IS_CJK.match(run):
+            runs.append([run] if len(run) == 1 else [run[i:i + 2] for i in range(len(run) - 1)])
+        else:
+            runs.append([word.lower() for word in _WORD_SEPARATOR.split(run)])
+    return runs
+
+
+def fts_document(text: str) -> str:
+    """Space-separated tokens stored in the FTS5 table (tokenized there by unicode61)."""
+    return ' '.join(token for run in token_runs(text) for token in run)
+
+
+def fts_query(text: str) -> str:
+    """FTS5 MATCH expression: one phrase per run, OR-ed together and ranked by BM25.
+
+    Returns an empty string when the text has no searchable tokens.
+    """
+    return ' OR '.join('"' + ' '.join(run) + '"' for run in token_runs(text))
+
+
+@functools.lru_cache(maxsize=65536)
+def estimate_tokens(text: str) -> int:
+    """Approximate LLM token count without a tokenizer.
+
+    BPE vocabularies spend about one token per CJK character and one per four
+    characters of other text; whitespace is mostly absorbed into the following
+    token. Cached, since headers, footers and table rows repeat across pages.
+    """
+    cjk = len(_IS_CJK.findall(text))
+    other = len(text) - cjk - len(_SPACE.findall(text))
+    return cjk + -(-other // 4)
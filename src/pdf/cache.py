@@ -0,0 +1,201 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import pdfplumber
+
+
+def settings_digest(settings: Optional[Dict[str, Any]]) -> str:
+    """Canonical hash of a settings dict (key order does not matter)."""
+    return hashlib.sha256(json.dumps(settings or {}, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def fingerprint(obj) -> Any:
+    """JSON-able description of a strategy: its class and public attributes, recursively.
+
+    Attributes named in the class's `fingerprint_exclude` (output locations,
+    pool sizes, caches) do not change the output and are left out.
+    """
+    if obj is None or isinstance(obj, (str, int, float, bool)):
+        return obj
+    if isinstance(obj, dict):
+        return {str(k): fingerprint(v) for k, v in sorted(obj.items(), key=lambda item: str(item[0]))}
+    if isinstance(obj, (list, tuple)):
+        return [fingerprint(v) for v in obj]
+    if hasattr(obj, '__dict__'):
+        exclude = getattr(type(obj), 'fingerprint_exclude', ())
+        params = {k: fingerprint(v) for k, v in sorted(vars(obj).items())
+                  if not k.startswith('_') and k not in exclude}
+        return {'class': f'{type(obj).__module__}.{type(obj).__qualname__}', **params}
+    return repr(obj)
+
+
+class DiskLRU:
+    """Key/value store in a SQLite file, capped at `max_mb` by evicting the least recently used entries.
+
+    Safe to share between threads (one connection per thread) and processes
+    (WAL; the strategy holding it can be pickled into page-shard workers).
+    The total size is kept in a `stats` row by triggers, so checking the cap
+    reads one row, and a hit only rewrites its `used` time when that is more
+    than `touch_seconds` old: recency is tracked to that granularity.
+    """
+
+    def __init__(self, path: str, max_mb: int = 256, touch_seconds: float = 60.0):
+        self.path = str(Path(path))
+        self.max_bytes = max_mb * 1024 * 1024
+        self.touch_seconds = touch_seconds
+        self._local = threading.local()
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    value BLOB,
+                    size INTEGER,
+                    used REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_used ON entries(used)")
+            # Running total of entries.size; files written before it existed are summed once here.
+            conn.execute("CREATE TABLE IF NOT EXISTS stats (key TEXT PRIMARY KEY, value INTEGER)")
+            conn.execute("INSERT OR IGNORE INTO stats (key, value) "
+                         "SELECT 'bytes', COALESCE(SUM(size), 0) FROM entries")
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN
+                    UPDATE stats SET value = value + NEW.size WHERE key = 'bytes';
+                END
+            """)
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN
+                    UPDATE stats SET value = value - OLD.size WHERE key = 'bytes';
+                END
+            """)
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS entries_resize AFTER UPDATE OF size ON entries BEGIN
+                    UPDATE stats SET value = value + NEW.size - OLD.size WHERE key = 'bytes';
+                END
+            """)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_local']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute("PRAGMA busy_timeout = 5000")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        row = self._conn().execute("SELECT value, used FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if now - row[1] > self.touch_seconds:
+            self._conn().execute("UPDATE entries SET used = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def put(self, key: str, value: bytes):
+        self.put_many([(key, value)])
+
+    def put_many(self, items: List[Tuple[str, bytes]]):
+        """Stores several entries in one transaction, evicting once at the end."""
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # An upsert rather than INSERT OR REPLACE: REPLACE deletes without firing the delete trigger.
+            conn.executemany("""
+                INSERT INTO entries (key, value, size, used) VALUES (?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET value = excluded.value, size = excluded.size, used = excluded.used
+            """, [(key, value, len(value), now) for key, value in items])
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        self.evict()
+
+    def size(self) -> int:
+        """Total bytes of the stored values."""
+        return self._conn().execute("SELECT value FROM stats WHERE key = 'bytes'").fetchone()[0]
+
+    def evict(self) -> int:
+        """Drops least recently used entries until the store fits in max_bytes; returns how many."""
+        excess = self.size() - self.max_bytes
+        if excess <= 0:
+            return 0
+        conn = self._conn()
+        victims = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY used"):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+        return len(victims)
+
+    def clear(self):
+        self._conn().execute("DELETE FROM entries")
+
+
+class TableCache(DiskLRU):
+    """Detected tables per page, keyed by (file sha256, page number, table_settings hash).
+
+    Stores each table's bbox and extracted cells, so a warm run skips
+    `page.find_tables` entirely; formatting is still applied on every run.
+    """
+
+    def key(self, doc_hash: str, page_number: int, table_settings: Optional[Dict]) -> str:
+        # pdfplumber's version is part of the settings: detection can change between releases.
+        settings = {'table_settings': table_settings or {}, 'pdfplumber': pdfplumber.__version__}
+        return f'{doc_hash}:{page_number}:{settings_digest(settings)}'
+
+    def get_tables(self, key: str) -> Optional[List[Tuple[Tuple[float, float, float, float], List[List]]]]:
+        value = self.get(key)
+        if value is None:
+            return None
+        return [(tuple(table['bbox']), table['rows']) for table in json.loads(value)]
+
+    def put_tables(self, key: str, tables: List[Tuple[Tuple[float, float, float, float], List[List]]]):
+        self.put(key, json.dumps([{'bbox': list(bbox), 'rows': rows} for bbox, rows in tables],
+                                 ensure_ascii=False).encode())
+
+
+class PageCache(DiskLRU):
+    """Per-page pipeline output (markdown and nodes), keyed by (file sha256, page number, config hash).
+
+    The config hash covers the strategy fingerprints, the table settings and
+    the pipeline version, so changing one of them only misses the pages it is
+    keyed on and the old entries age out of the LRU.
+    """
+
+    def key(self, doc_hash: str, page_number: int, config: Any) -> str:
+        return f'{doc_hash}:{page_number}:{settings_digest(config)}'
+
+    def get_page(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self.get(key)
+        return None if value is None else json.loads(value)
+
+    def put_page(self, key: str, text: str, nodes: List[Dict[str, Any]], has_images: bool, page_class: str):
+        """Stores the page markdown, its nodes as {'text', 'metadata'} dicts and its triage class."""
+        self.put(key, json.dumps({'text': text, 'nodes': nodes, 'has_images': has_images, 'page_class': page_class},
+                                 ensure_ascii=False).encode())
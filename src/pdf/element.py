@@ -1,6 +1,9 @@
 from typing import Dict, Any, List
 from pathlib import Path
 import os
+import re
+
+from src.pdf.utils import image_filename
 
 # This module is responsible for postprocessing json tables [List[List]] into a string.
 
@@ -32,10 +35,35 @@ class GithubTableFormattingStrategy(ElementFormattingStrategy):
         return text
 
 class UriFormattingStrategy(ElementFormattingStrategy):
-    def format(self, image_name : Path) -> str:   
+    def format(self, image) -> str:
+        """Markdown link to an image under images/.
+
+        A pdfplumber image object links to its content-addressed file (see
+        utils.image_filename), so repeated images share one file; a bare name
+        links to images/<name>.png.
+        """
+        if isinstance(image, dict):
+            return f"![{image['name']}]({Path('images', image_filename(image))})"
 
         # add images folder to name
-        return f"![{image_name}]({Path('images', image_name).with_suffix('.png')})"
+        return f"![{image}]({Path('images', image).with_suffix('.png')})"
+
+
+# --- Element type of a node, read back from the markdown written by the strategies above ---
+ELEMENT_TEXT = 'text'
+ELEMENT_TABLE = 'table'
+ELEMENT_IMAGE = 'image'
+
+_TABLE_ROW = re.compile(r'^\|.*\|$', re.MULTILINE)
+_IMAGE_LINK = re.compile(r'!\[[^\]]*\]\([^)]*\)')
+
+def element_type(text: str) -> str:
+    """'table' if the text holds a table row, else 'image' if it links an image, else 'text'."""
+    if _TABLE_ROW.search(text or ''):
+        return ELEMENT_TABLE
+    if _IMAGE_LINK.search(text or ''):
+        return ELEMENT_IMAGE
+    return ELEMENT_TEXT
         
 # For organizing cells with many rect objects within them.        
 class TableCell():
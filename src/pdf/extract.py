@@ -1,78 +1,178 @@
 import os 
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Tuple, Any
+from typing import Dict, Iterable, Iterator, List, Tuple, Any
+import PIL.Image
 from pdfplumber.pdf import Page
 
-from element import GithubTableFormattingStrategy, UriFormattingStrategy
-from index.schema import TextNode, NodeRelationship, RelatedNodeInfo
+from src.pdf.element import GithubTableFormattingStrategy, UriFormattingStrategy, element_type
+from src.pdf.utils import image_filename
+from src.index.schema import TextNode, NodeRelationship, RelatedNodeInfo
+from src.index.tokenizer import estimate_tokens
+
+_RENDER_LOCK = threading.Lock()
+
+def link_nodes(nodes: List[TextNode]) -> List[TextNode]:
+    """Hooks up PREVIOUS/NEXT relationships between consecutive nodes, in place."""
+    for i, n in enumerate(nodes):
+        if i > 0:
+            n.relationships[NodeRelationship.PREVIOUS] = RelatedNodeInfo(node_id=nodes[i-1].node_id)
+        if i < len(nodes) - 1:
+            n.relationships[NodeRelationship.NEXT] = RelatedNodeInfo(node_id=nodes[i+1].node_id)
+    return nodes
 
 class ExtractionStrategy:
     def extract(self, page:Page):
         raise NotImplementedError
 
 class MdExtractionStrategy(ExtractionStrategy):
+    fingerprint_exclude = ('savedir',)  # see src.pdf.cache.fingerprint
+
     def __init__(self, image_strategy = None, save_directory = None):
         self.savedir = save_directory
         self.image_strategy = image_strategy or ImageExtractionStrategy()
 
     def extract(self, page:Page) -> str:
-        # Save image in given folder
+        # Save image in given folder (written in the background; see flush())
         if self.savedir is not None: 
-            #
-            print(f'pdf: saving images to {self.savedir}')
             self.image_strategy.extract(page, self.savedir)
         text = page.extract_text()
         return text 
     # It would be great to use Pdf.extract(table_settings).save('/processes_sources')
 
+    def save_images(self, page:Page):
+        """Saves the page's images without extracting text (used when the text comes from a cache)."""
+        if self.savedir is not None:
+            self.image_strategy.extract(page, self.savedir)
+
+    def flush(self):
+        """Blocks until every image referenced by the extracted text is on disk."""
+        self.image_strategy.flush()
+
 
 class ImageExtractionStrategy(ExtractionStrategy):
-    def __init__(self, formatting_strategy=None):
+    """Saves each distinct embedded image once, under images/<content hash>.
+
+    JPEG streams are written as-is and 8-bit RGB/gray (and 1-bit) streams are
+    decoded straight into a PNG; anything else (CMYK, indexed, JBIG2, ...) is
+    rendered from the page at `res` dpi. embedded=False always renders.
+
+    Decoding, rendering and encoding run on `workers` background threads, so
+    the next page is serialized while images are written. At most
+    `max_pending` images wait in the pool; extract() blocks beyond that.
+    Call flush() before relying on the files. workers=0 writes synchronously.
+    """
+    fingerprint_exclude = ('workers', 'max_pending')  # see src.pdf.cache.fingerprint
+
+    def __init__(self, formatting_strategy=None, embedded=True, workers=2, max_pending=32):
         self.formatting_strategy = formatting_strategy or UriFormattingStrategy()
+        self.embedded = embedded
+        self.workers = workers
+        self.max_pending = max_pending
+        self._written = set()
+        self._pool = None
+        self._slots = None
+        self._pending: List[Future] = []
+
+    def __getstate__(self):
+        # Page shards pickle the strategy into worker processes; each starts its own pool.
+        self.flush()
+        state = self.__dict__.copy()
+        state.update(_pool=None, _slots=None, _pending=[])
+        return state
 
     def extract(self, cur_page, md_document_directory, res=200) -> List:
-        """Saves images to md_document_directory and returns a list of image paths"""
-        images = cur_page.images
+        """Queues the images of a page for saving to md_document_directory and returns their paths"""
         buffer = []
-        for image in images:
-            image_element_text = self.formatting_strategy.format(image['name'])
-            
-            # Check for reducancy        
-            for filename in os.listdir(md_document_directory):
-                if filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp')):
-                    if filename.lower().split('.')[-1].endswith(image['name']):
-                        continue
-                
-            bbox = [
-                image['x0'], 
-                cur_page.cropbox[3]-image['y1'], # top, where origin is top left
-                image['x1'], 
-                cur_page.cropbox[3]-image['y0']  # bot, " 
-                ]
-            
-            # Ensure bbox is not larger than page.
-            if bbox[2] > cur_page.cropbox[2]:
-                bbox[2] = cur_page.cropbox[2]
-            if bbox[3] > cur_page.cropbox[3]:
-                bbox[3] = cur_page.cropbox[3]
-            
-            img_page = cur_page.crop(bbox=bbox)
-            img_obj = img_page.to_image(resolution=res)
-            
-            # messy
-            _ = image_element_text.split('(')[-1]
-            image_path = _.split(')')[0]
-            image_path = Path(md_document_directory, image_path)
-            image_path.parent.mkdir(parents=True, exist_ok=True)  # Ensure directory exists
-
-            img_obj.save(image_path)
+        for image in cur_page.images:
+            image_path = Path(md_document_directory, 'images', image_filename(image))
             buffer.append(image_path)
+
+            # Content-addressed: an existing (or queued) file already holds these bytes.
+            if image_path in self._written or image_path.exists():
+                self._written.add(image_path)
+                continue
+            image_path.parent.mkdir(parents=True, exist_ok=True)  # Ensure directory exists
+            self._written.add(image_path)
+            self.submit(image, image_path, self.crop(cur_page, image), res)
         return buffer
-             
+
+    def submit(self, image, image_path: Path, img_page, res):
+        if self.workers <= 0:
+            self.write(image, image_path, img_page, res)
+            return
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='image-writer')
+            self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._slots.acquire()  # backpressure
+        future = self._pool.submit(self.write, image, image_path, img_page, res)
+        future.add_done_callback(lambda _: self._slots.release())
+        self._pending = [f for f in self._pending if not f.done() or f.exception() is not None]
+        self._pending.append(future)
+
+    def flush(self):
+        """Waits for all queued images; re-raises the first error from a writer thread."""
+        pending, self._pending = self._pending, []
+        for future in pending:
+            future.result()
+
+    def write(self, image, image_path: Path, img_page, res):
+        # Write to a temporary name first; parallel page shards may save the same image.
+        tmp_path = image_path.with_name(f'{image_path.name}.{os.getpid()}.tmp')
+        if not (self.embedded and self.save_embedded(image, tmp_path, image_path.suffix)):
+            # pdfium is not thread-safe: renders take turns, encoding does not.
+            with _RENDER_LOCK:
+                img_obj = img_page.to_image(resolution=res)
+            img_obj.save(tmp_path, format='PNG')
+        os.replace(tmp_path, image_path)
+
+    def save_embedded(self, image, path: Path, suffix: str) -> bool:
+        """Writes the image from its stream bytes; returns False if it has to be rendered instead."""
+        stream = image['stream']
+        try:
+            if suffix == '.jpg':
+                data = stream.get_data()  # DCTDecode is passed through: these are the JPEG bytes
+                with open(path, 'wb') as f:
+                    f.write(data)
+                return True
+
+            colorspace = [getattr(c, 'name', c) for c in image.get('colorspace') or []]
+            width, height = image['srcsize']
+            if image.get('imagemask') or image.get('bits') == 1:
+                mode = '1'
+            elif image.get('bits') == 8 and colorspace == ['DeviceRGB']:
+                mode = 'RGB'
+            elif image.get('bits') == 8 and colorspace == ['DeviceGray']:
+                mode = 'L'
+            else:
+                return False
+            PIL.Image.frombytes(mode, (int(width), int(height)), stream.get_data()).save(path, format='PNG')
+            return True
+        except Exception:
+            # Unsupported filters (JBIG2, CCITT, ...) or short data: render instead.
+            return False
+
+    def crop(self, cur_page, image):
+        bbox = [
+            image['x0'],
+            cur_page.cropbox[3]-image['y1'], # top, where origin is top left
+            image['x1'],
+            cur_page.cropbox[3]-image['y0']  # bot, "
+            ]
+
+        # Ensure bbox is not larger than page.
+        if bbox[2] > cur_page.cropbox[2]:
+            bbox[2] = cur_page.cropbox[2]
+        if bbox[3] > cur_page.cropbox[3]:
+            bbox[3] = cur_page.cropbox[3]
+
+        return cur_page.crop(bbox=bbox)
+
 class NodesFromPageStrategy(ExtractionStrategy):
     def extract(self, page: Page) -> List[Dict]:
         
-        lines = page.get_textmap.to_string().split('\n')
+        lines = page.get_textmap().as_string.split('\n')
         
         # Parameter
         text_node_line_size = 2
@@ -80,15 +180,104 @@ class NodesFromPageStrategy(ExtractionStrategy):
         nodes = [TextNode(text= '\n'.join(lines[i:i+text_node_line_size])) for i in range(0, len(lines), text_node_line_size)]
         
 
-        out = []
-        # Hooking up the nodes
-        for i, n in enumerate(nodes):
-            if i > 0:
-                n.relationships[NodeRelationship.PREVIOUS] = RelatedNodeInfo(node_id=nodes[i-1].node_id)
-            if i < len(nodes) - 1:
-                n.relationships[NodeRelationship.NEXT] = RelatedNodeInfo(node_id=nodes[i+1].node_id)            
-            out.append(n)  
-        return out
+        return link_nodes(nodes)
+
+
+class TokenBudgetChunkingStrategy(ExtractionStrategy):
+    """Packs the lines of a page (text lines and table rows) into nodes of at most `max_tokens`.
+
+    Token counts come from src.index.tokenizer.estimate_tokens. A new node
+    repeats the trailing lines of the previous one, up to `overlap_tokens`, so
+    a sentence cut at a boundary is still found whole in one node. A line
+    longer than the budget is split on its own. merge() then joins nodes
+    across page boundaries while they fit in the budget.
+    """
+    def __init__(self, max_tokens: int = 512, overlap_tokens: int = 64):
+        self.max_tokens = max_tokens
+        self.overlap_tokens = min(overlap_tokens, max_tokens // 2)
+
+    def extract(self, page: Page) -> List[TextNode]:
+        lines = [line for line in page.get_textmap().as_string.split('\n') if line.strip()]
+        return link_nodes([TextNode(text=text) for text in self.pack(lines)])
+
+    def split_line(self, line: str) -> List[str]:
+        """Cuts a line into pieces that each fit in max_tokens with their newline.
+
+        Pieces are first sized in proportion to the line's token density, then
+        shortened while the rounding in estimate_tokens still puts them over the
+        budget. A piece keeps at least one character, even when max_tokens is too
+        small for it.
+        """
+        if estimate_tokens(line) + 1 <= self.max_tokens:  # + the newline joining it to the next line
+            return [line]
+        budget = max(1, self.max_tokens - 1)
+        pieces = []
+        start = 0
+        while start < len(line):
+            rest = line[start:]
+            end = start + max(1, len(rest) * budget // max(1, estimate_tokens(rest)))
+            while end - start > 1 and estimate_tokens(line[start:end]) > budget:
+                end -= 1
+            pieces.append(line[start:end])
+            start = end
+        return pieces
+
+    def pack(self, lines: List[str]) -> List[str]:
+        chunks = []
+        current: List[Tuple[str, int]] = []  # (line, tokens)
+        size = 0
+        fresh = False  # whether current holds more than the overlap of the previous chunk
+        for line in lines:
+            for piece in self.split_line(line):
+                tokens = estimate_tokens(piece) + 1
+                if fresh and size + tokens > self.max_tokens:
+                    chunks.append('\n'.join(text for text, _ in current))
+                    current, size = self.overlap(current)
+                    fresh = False
+                while current and size + tokens > self.max_tokens:
+                    size -= current.pop(0)[1]
+                current.append((piece, tokens))
+                size += tokens
+                fresh = True
+        if fresh:
+            chunks.append('\n'.join(text for text, _ in current))
+        return chunks
+
+    def overlap(self, lines: List[Tuple[str, int]]) -> Tuple[List[Tuple[str, int]], int]:
+        """The trailing lines that fit in overlap_tokens, and their size."""
+        kept, size = [], 0
+        for text, tokens in reversed(lines):
+            if size + tokens > self.overlap_tokens:
+                break
+            kept.append((text, tokens))
+            size += tokens
+        return kept[::-1], size
+
+    def merge(self, nodes: Iterable[TextNode]) -> Iterator[TextNode]:
+        """Joins each node with the first node of the next page while both fit in max_tokens.
+
+        Nodes must carry metadata['page']; a joined node is a new node that
+        records its last page in metadata['last_page'] (and its element type
+        again, if the nodes carry one). Relationships are left to the caller.
+        """
+        previous, previous_size = None, 0
+        for node in nodes:
+            size = sum(estimate_tokens(line) + 1 for line in node.text.split('\n'))
+            page = node.metadata.get('page')
+            if (previous is not None and page != previous.metadata.get('last_page', previous.metadata.get('page'))
+                    and previous_size + size <= self.max_tokens):
+                text = previous.text + '\n' + node.text
+                metadata = {**previous.metadata, 'last_page': page}
+                if 'element' in metadata:
+                    metadata['element'] = element_type(text)
+                previous = TextNode(text=text, metadata=metadata)
+                previous_size += size
+                continue
+            if previous is not None:
+                yield previous
+            previous, previous_size = node, size
+        if previous is not None:
+            yield previous
 
 
 class Table():
@@ -118,15 +307,7 @@ class Table():
             text=os.linesep.join(['<table_data>', self.header, self.format_strategy.format(row), '</table_data>'])
             ) for row in self.rows[1:]] 
         
-        out = []
-        # Hooking up the nodes
-        for i, n in enumerate(nodes):
-            if i > 0:
-                n.relationships[NodeRelationship.PREVIOUS] = RelatedNodeInfo(node_id=nodes[i-1].node_id)
-            if i < len(nodes) - 1:
-                n.relationships[NodeRelationship.NEXT] = RelatedNodeInfo(node_id=nodes[i+1].node_id)            
-            out.append(n)  
-        return out
+        return link_nodes(nodes)
             
         
 
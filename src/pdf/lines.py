@@ -0,0 +1,72 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+from pdfplumber.utils.text import DEFAULT_X_TOLERANCE, DEFAULT_Y_TOLERANCE, LIGATURES
+
+# This module assembles the text of a page from its chars with NumPy, giving the
+# same string as pdfplumber's default (non-layout) textmap for upright text.
+
+_LIGATURE_TABLE = str.maketrans(LIGATURES)
+
+
+def cluster_ids(values: np.ndarray, tolerance: float) -> np.ndarray:
+    """Cluster index of each value; sorted distinct values closer than `tolerance` chain together.
+
+    Same grouping as pdfplumber.utils.cluster_list over the set of values.
+    """
+    distinct = np.unique(values)
+    starts = np.concatenate(([False], distinct[1:] > distinct[:-1] + tolerance))
+    return np.cumsum(starts)[np.searchsorted(distinct, values)]
+
+
+def assemble_text(chars: List[Dict], x_tolerance: float = DEFAULT_X_TOLERANCE,
+                  y_tolerance: float = DEFAULT_Y_TOLERANCE) -> Optional[str]:
+    """Joins chars into words and lines, like `page.get_textmap().as_string`.
+
+    - chars are clustered into lines by `top` and ordered by `x0` within a line;
+    - a word ends at a blank char, or where the next char starts before the
+      previous one, more than `x_tolerance` after its end, or more than
+      `y_tolerance` above or below it;
+    - words are clustered into lines again by their `top`; words are joined with
+      ' ' and lines with '\\n'.
+
+    Returns None for pages with rotated (non-upright) chars, which this engine does not handle.
+    """
+    n = len(chars)
+    if n == 0:
+        return ''
+    if not all(c['upright'] for c in chars):
+        return None
+
+    top = np.fromiter((c['top'] for c in chars), dtype=np.float64, count=n)
+    x0 = np.fromiter((c['x0'] for c in chars), dtype=np.float64, count=n)
+    x1 = np.fromiter((c['x1'] for c in chars), dtype=np.float64, count=n)
+    text = np.array([c['text'] or '' for c in chars], dtype=object)
+    blank = np.fromiter((t.isspace() for t in text), dtype=bool, count=n)
+
+    # Lines, then x0 within a line; lexsort is stable, so ties keep content-stream order.
+    line = cluster_ids(top, y_tolerance)
+    order = np.lexsort((x0, line))
+    top, x0, x1, text, blank, line = top[order], x0[order], x1[order], text[order], blank[order], line[order]
+
+    new_word = np.ones(n, dtype=bool)
+    new_word[1:] = ((line[1:] != line[:-1]) | blank[:-1]
+                    | (x0[1:] < x0[:-1]) | (x0[1:] > x1[:-1] + x_tolerance)
+                    | (np.abs(top[1:] - top[:-1]) > y_tolerance))
+    keep = ~blank
+    if not keep.any():
+        return ''
+    top, text, new_word = top[keep], text[keep], new_word[keep]
+
+    # Word tops are clustered again, and consecutive words in different clusters start new lines.
+    word_starts = np.flatnonzero(new_word)
+    word_line = cluster_ids(np.minimum.reduceat(top, word_starts), y_tolerance)
+    new_line = np.concatenate(([False], word_line[1:] != word_line[:-1]))
+
+    separators = np.full(len(text), '', dtype=object)
+    separators[word_starts[1:]] = ' '
+    separators[word_starts[new_line]] = '\n'
+    joined = np.empty(2 * len(text), dtype=object)
+    joined[0::2] = separators
+    joined[1::2] = text
+    return ''.join(joined.tolist()).translate(_LIGATURE_TABLE)
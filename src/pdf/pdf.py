@@ -1,50 +1,332 @@
 from pathlib import Path
+import time
 import pdfplumber
-from typing import Dict, List, Tuple, Any
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Any
 
-from text import TopDownSerializeStrategy
-from utils import create_unique_directory
-from extract import MdExtractionStrategy, NodesFromPageStrategy
+from src.index.schema import TextNode
+from src.common.digest import file_digest
+from src.pdf.cache import fingerprint
+from src.pdf.element import element_type
+from src.pdf.text import TopDownSerializeStrategy
+from src.pdf.triage import PAGE_SCANNED, TriageReport, classify_page
+from src.pdf.utils import create_unique_directory
+from src.pdf.extract import MdExtractionStrategy, NodesFromPageStrategy, link_nodes
+
+# Part of every page cache key: bump it when a change in src/pdf alters the
+# markdown or nodes of a page, so cached pages are recomputed.
+PIPELINE_VERSION = 3
+
+
+# --- Page task: picklable per-page work, so pages can be sharded across processes ---
+class PageResult():
+    def __init__(self, page_number: int, text: str, nodes: List, page_class: Optional[str] = None,
+                 seconds: float = 0.0):
+        self.page_number = page_number
+        self.text = text
+        self.nodes = nodes
+        self.page_class = page_class  # see src.pdf.triage
+        self.seconds = seconds
+
+class PageTask():
+    """Serializes a page once and hands the result to every consumer (markdown + images, nodes).
+
+    With a page_cache (src.pdf.cache.PageCache) the markdown and nodes of a
+    page are looked up by file hash, page number and the fingerprint of the
+    strategies first; a hit skips serialization and only saves the images.
+    Without an extraction strategy the markdown is skipped and the text is ''
+    (callers that only want nodes, such as bulk ingest).
+    """
+    def __init__(self, serialization, extraction, chunking, tbl_settings=None, page_cache=None):
+        self.serialization = serialization
+        self.extraction = extraction
+        self.chunking = chunking
+        self.tbl_settings = tbl_settings
+        self.page_cache = page_cache
+        self._config = None
+
+    def config(self) -> Dict[str, Any]:
+        if self._config is None:
+            self._config = {
+                'version': PIPELINE_VERSION,
+                'tbl_settings': fingerprint(self.tbl_settings),
+                'serialization': fingerprint(self.serialization),
+                'extraction': fingerprint(self.extraction),
+                'chunking': fingerprint(self.chunking),
+            }
+        return self._config
+
+    def cache_key(self, page) -> Optional[str]:
+        path = getattr(page.pdf, 'path', None)
+        if self.page_cache is None or path is None:
+            return None
+        return self.page_cache.key(file_digest(path), page.page_number, self.config())
+
+    def cached(self, page, key: str) -> Optional[PageResult]:
+        entry = self.page_cache.get_page(key)
+        if entry is None:
+            return None
+        if entry['has_images'] and hasattr(self.extraction, 'save_images'):
+            self.extraction.save_images(page)
+        nodes = link_nodes([TextNode(text=node['text'], metadata=node['metadata']) for node in entry['nodes']])
+        return PageResult(page.page_number, entry['text'], nodes, entry['page_class'])
+
+    def store(self, key: str, page, text: str, nodes: List, page_class: str):
+        self.page_cache.put_page(key, text, [{'text': node.text, 'metadata': node.metadata} for node in nodes],
+                                 bool(page.images), page_class)
+
+    def serialize(self, page):
+        return self.serialization.serialize(page, self.tbl_settings)
+
+    def text(self, serialized) -> str:
+        if self.extraction is None:
+            return ''
+        return self.extraction.extract(serialized)
+
+    def nodes(self, serialized, page_class: Optional[str] = None) -> List:
+        # A page without a text layer would only give empty nodes; it is flagged as scanned instead.
+        if page_class == PAGE_SCANNED:
+            return []
+        nodes = self.chunking.extract(serialized)
+        for node in nodes:
+            node.metadata['page'] = serialized.page_number
+            node.metadata['element'] = element_type(node.text)
+        return nodes
+
+    def __call__(self, page) -> PageResult:
+        start = time.perf_counter()
+        key = self.cache_key(page)
+        result = self.cached(page, key) if key else None
+        if result is None:
+            page_class = classify_page(page)
+            serialized = self.serialize(page)
+            result = PageResult(page.page_number, self.text(serialized), self.nodes(serialized, page_class),
+                                page_class)
+            if key:
+                self.store(key, page, result.text, result.nodes, page_class)
+        result.seconds = time.perf_counter() - start
+        return result
+
+    def flush(self):
+        """Barrier: waits until files written in the background by the extraction strategy exist."""
+        if hasattr(self.extraction, 'flush'):
+            self.extraction.flush()
+
+
+class LazyPageResult():
+    """A page whose serialization, text and nodes are only computed when first accessed.
+
+    Pdf.iter_pages() releases the underlying pdfplumber page as soon as the
+    consumer moves on, so text and nodes must be read before advancing.
+    """
+    def __init__(self, page, task: PageTask):
+        self.page_number = page.page_number
+        self._page = page
+        self._task = task
+        self._serialized = None
+        self._text = None
+        self._nodes = None
+        self._key = None  # '' once looked up without a cache
+        self._page_class = None
+        self.seconds = 0.0  # time spent computing text and nodes
+
+    def _check_page(self):
+        if self._page is None:
+            raise RuntimeError(f'Page {self.page_number} was released; read text/nodes before advancing')
+
+    def _load_cached(self):
+        if self._key is None:
+            self._check_page()
+            self._key = self._task.cache_key(self._page) or ''
+            cached = self._task.cached(self._page, self._key) if self._key else None
+            if cached is not None:
+                self._text, self._nodes, self._page_class = cached.text, cached.nodes, cached.page_class
+                self._key = ''  # nothing to store back
+
+    def _get_serialized(self):
+        self._check_page()
+        if self._serialized is None:
+            self._serialized = self._task.serialize(self._page)
+        return self._serialized
+
+    @property
+    def page_class(self) -> str:
+        if self._page_class is None:
+            self._load_cached()
+        if self._page_class is None:
+            self._check_page()
+            self._page_class = classify_page(self._page)
+        return self._page_class
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            start = time.perf_counter()
+            self._load_cached()
+            if self._text is None:
+                self._text = self._task.text(self._get_serialized())
+            self.seconds += time.perf_counter() - start
+        return self._text
+
+    @property
+    def nodes(self) -> List:
+        if self._nodes is None:
+            start = time.perf_counter()
+            self._load_cached()
+            if self._nodes is None:
+                self._nodes = self._task.nodes(self._get_serialized(), self.page_class)
+            self.seconds += time.perf_counter() - start
+        return self._nodes
+
+    def release(self):
+        """Drops the page and flushes pdfplumber's per-page object and textmap caches.
+
+        A page whose text and nodes were both computed is written to the page cache first.
+        """
+        if self._key and self._text is not None and self._nodes is not None:
+            self._task.store(self._key, self._page, self._text, self._nodes, self.page_class)
+            self._key = ''
+        if self._page is not None:
+            self._page.close()
+        self._page = None
+        self._serialized = None
+
+
+def run_shard(path: Path, page_indices: range, task: Callable) -> List:
+    """Opens the pdf in this (worker) process and runs `task` on each page of the shard, in order."""
+    out = []
+    with pdfplumber.open(path) as pdf:
+        for i in page_indices:
+            page = pdf.pages[i]
+            out.append(task(page))
+            page.close()
+    if hasattr(task, 'flush'):
+        task.flush()
+    return out
+
+
+def map_pages(path: Path, doc, task: Callable, workers: int = 0, chunk_size: int = 16) -> List:
+    """Runs `task` on every page of `doc` (opened from `path`) and returns the results in page order.
+
+    With workers > 1 the pages are split into shards of `chunk_size` consecutive
+    pages, each handled by a worker process that opens the file itself. Larger
+    shards amortize the cost of opening the pdf; smaller ones balance load better.
+    """
+    if workers <= 1 or len(doc.pages) <= chunk_size:
+        out = []
+        for p in doc.pages:
+            out.append(task(p))
+            p.close()
+        return out
+
+    shards = [range(i, min(i + chunk_size, len(doc.pages))) for i in range(0, len(doc.pages), chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(run_shard, [path] * len(shards), shards, [task] * len(shards))
+        return [page_result for shard in results for page_result in shard]
 
-    
 
 # --- Update Pdf to use SerializationStrategy ---
 class Pdf():
 
     # This class uses the strategy pattern to combine functionality into the Pdf abstraction.
-    def __init__(self, path, chunking=None, serialization=None, extraction=None, uri=None):
+    # Each page is serialized exactly once; markdown, images and nodes are all
+    # derived from that one result. workers > 1 serializes page shards of
+    # `chunk_size` pages in parallel processes.
+    # lazy=True skips building text and nodes up front; use iter_pages(), iter_nodes()
+    # or write_md() to stream the document with memory that stays flat in its length.
+    # page_cache (src.pdf.cache.PageCache) reuses the output of unchanged pages across runs.
+    # self.triage counts pages and seconds per page class (src.pdf.triage); pages without
+    # a text layer get no nodes and are listed in self.scanned_pages instead.
+    def __init__(self, path, chunking=None, serialization=None, extraction=None, uri=None,
+                 workers=0, chunk_size=16, save_directory='processed_sources', tbl_settings=None,
+                 lazy=False, page_cache=None):
         self.serialization = serialization or TopDownSerializeStrategy()
-        self.chunking_strategy = NodesFromPageStrategy()
+        self.chunking_strategy = chunking or NodesFromPageStrategy()
+        self.workers = workers
+        self.chunk_size = chunk_size
         self.path = Path(path)
-        self._doc = pdfplumber.open(self.path)
-        self.text = self.as_md()
-        self.nodes = self.as_nodes()
-    
-    def as_nodes(self, pdfplumber_tbl_settings=None) -> List:
-        out_buffer = []
-        with pdfplumber.open(self.path) as pdf:
-            [out_buffer.append(
-                self.chunking_strategy(
-                    self.serialization.serialize(p, pdfplumber_tbl_settings)) 
-                for p in pdf.pages)]
-            
-        return out_buffer
-
-    def as_md(self, save_directory='processed_sources', tbl_settings=None) -> Dict:
-        
+
         # Todo: decouple saving from extraction
         self.md_directory = create_unique_directory(Path(save_directory, self.path.stem))
-        doc = MdExtractionStrategy(save_directory = self.md_directory)  # Creates folder and saves images to {save_directory}/images/...
-        text = '\n'.join(
-            [doc.extract(self.serialization.serialize(p, tbl_settings)) 
-             for p in self._doc.pages])
-
-        
-        with open(self.md_directory / Path(f'{self.path.stem}.md'), 'w') as file:
-            return file.write(text)
+        self.extraction = extraction or MdExtractionStrategy(save_directory = self.md_directory)  # Creates folder and saves images to {save_directory}/images/...
+
+        self.task = PageTask(self.serialization, self.extraction, self.chunking_strategy, tbl_settings, page_cache)
+        self.triage = TriageReport()
+        self.scanned_pages: List[int] = []
+        self.embedding = None  # src.index.embed.EmbeddingStats of the last index() call with an embedder
+        if lazy:
+            return
+        with pdfplumber.open(self.path) as doc:
+            self.pages: List[PageResult] = map_pages(self.path, doc, self.task, self.workers, self.chunk_size)
+        for page in self.pages:
+            self.add_to_triage(page)
+        self.text = self.as_md()
+        self.nodes = self.as_nodes()
+
+    def iter_pages(self) -> Iterator[LazyPageResult]:
+        """Yields pages one at a time, releasing each page's caches once the consumer moves on."""
+        with pdfplumber.open(self.path) as doc:
+            for page in doc.pages:
+                result = LazyPageResult(page, self.task)
+                try:
+                    yield result
+                    self.add_to_triage(result)
+                finally:
+                    result.release()
+
+    def add_to_triage(self, page):
+        self.triage.add(page.page_class, page.seconds)
+        if page.page_class == PAGE_SCANNED:
+            self.scanned_pages.append(page.page_number)
+
+    def iter_nodes(self) -> Iterator:
+        """Streams linked nodes; each node is yielded once its successor is known."""
+        previous = None
+        for node in self.merge_pages(node for page in self.iter_pages() for node in page.nodes):
+            if previous is not None:
+                link_nodes([previous, node])
+                yield previous
+            previous = node
+        if previous is not None:
+            yield previous
+
+    def write_md(self) -> Path:
+        """Streams the markdown to {md_directory}/{stem}.md page by page and returns its path."""
+        md_path = Path(self.md_directory, f'{self.path.stem}.md')
+        with open(md_path, 'w') as file:
+            for i, page in enumerate(self.iter_pages()):
+                file.write(('\n' if i else '') + page.text)
+        self.task.flush()
+        return md_path
     
+    def as_nodes(self) -> List:
+        # Link across page (and shard) boundaries once the pages are back in order.
+        return link_nodes(list(self.merge_pages(node for page in self.pages for node in page.nodes)))
+
+    def merge_pages(self, nodes: Iterator) -> Iterator:
+        """Lets the chunking strategy join nodes across page boundaries, if it can."""
+        merge = getattr(self.chunking_strategy, 'merge', None)
+        return merge(nodes) if merge is not None else nodes
+
+    def as_md(self) -> str:
+        text = '\n'.join(page.text for page in self.pages)
+        with open(Path(self.md_directory, f'{self.path.stem}.md'), 'w') as file:
+            file.write(text)
+        self.task.flush()
         return text
 
+    def index(self, index, embedder=None) -> bool:
+        """Writes the nodes to an src.index.core.Index; returns False if the document was unchanged.
+
+        With an src.index.embed.Embedder, the nodes are embedded before they are
+        written. If the endpoint fails they are written without vectors
+        (Embedder.try_embed_nodes); self.embedding holds the stats of the attempt.
+        """
+        nodes = [node.to_dict() for node in self.nodes]
+        if embedder is not None:
+            self.embedding = embedder.try_embed_nodes(nodes)
+        return index.index_doc(str(self.path), nodes)
+
 
 # # Example usage
 # project_folder = '/media/disk0/darren/testing/chatbot_api/experiment/darren/chunking_study'
@@ -53,7 +335,6 @@ class Pdf():
 #                  '/primary_sources/精準定位 MTAN001-A.pdf']
 # path = Path(f'{project_folder}{list_of_files[3]}')
 # pdf = Pdf(path)
-# nodes = pdf.as_nodes(extraction_config={"vertical":"lines_strict"})
-# print('\n---\n'.join([n.text for n in nodes]))
-# savdir= path.parents[1] / 'processed_sources' /  Path(path.stem)
-# text = pdf.as_md(savdir)
+# print('\n---\n'.join([n.text for n in pdf.nodes]))
+# savdir= path.parents[1] / 'processed_sources'
+# text = Pdf(path, save_directory=savdir, tbl_settings={"vertical_strategy":"lines_strict"}).text
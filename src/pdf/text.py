@@ -1,9 +1,15 @@
-from typing import Dict, List
+from typing import Dict, List, Tuple
+import bisect
+import numpy as np
 from pathlib import Path
 from pdfplumber.pdf import Page
 from pdfplumber.page import FilteredPage
 
-from element import GithubTableFormattingStrategy, UriFormattingStrategy
+from src.common.digest import file_digest
+from src.pdf.element import GithubTableFormattingStrategy, UriFormattingStrategy
+from src.pdf.lines import assemble_text
+from src.pdf.triage import PAGE_TEXT, classify_page, may_have_tables
+from src.pdf.utils import midpoints_in_bboxes
 
 
 # --- Strategy Pattern for Serialization ---
@@ -19,96 +25,90 @@ class TopDownSerializeStrategy(SerializationStrategy):
     as a sorted list of all text elements from the top of the page to the bottom.
     """
 
-    def __init__(self, table_formatter=None, uri_formatter=None):
+    fingerprint_exclude = ('table_cache', 'page_height')  # see src.pdf.cache.fingerprint
+
+    def __init__(self, table_formatter=None, uri_formatter=None, table_cache=None):
         self.table_formatting_strategy = table_formatter or GithubTableFormattingStrategy()
         self.uri_formatting_strategy = uri_formatter or UriFormattingStrategy()
-
-    def merge_elements_into_tuples(self, cd:str, ld:str, tuples:List[Dict],
-                                    elements:List[Dict]) -> List[Dict]:
+        self.table_cache = table_cache  # src.pdf.cache.TableCache, optional
+
+    def find_tables(self, page:Page, table_settings=None) -> List[Tuple[Tuple, List[List]]]:
+        """Returns (bbox, extracted rows) of each table on the page, from the table cache when possible."""
+        path = getattr(page.pdf, 'path', None)
+        if self.table_cache is None or path is None:
+            return [(t.bbox, t.extract()) for t in page.find_tables(table_settings=table_settings)]
+
+        key = self.table_cache.key(file_digest(path), page.page_number, table_settings)
+        tables = self.table_cache.get_tables(key)
+        if tables is None:
+            tables = [(t.bbox, t.extract()) for t in page.find_tables(table_settings=table_settings)]
+            self.table_cache.put_tables(key, tables)
+        return tables
+
+    def merge_elements_into_tuples(self, cd:str, ld:str, tuples:List[Tuple],
+                                    elements:List[Dict]) -> List[Tuple]:
         
         """   
-        Intro: This function reorders lists of tuples based on their verical positon on a page.
-        It operates of the pdfminer level, using T_object abstraction to write bounding boxes.
+        Intro: This function merges elements (tables, images) into the textmap tuples
+        based on their vertical position on the page, in O((n + e) log e) time.
 
         Args:
         cd : character direction: 'ltr' or 'rtl;
         ld : line direction : 'ttb' or 'btt';
         tuples : e.g. [('t' , {x0 : '600', ...}) , ...];
         elements : List : e.g. [{'content' : '', 'object' : Table}, ...]
-            Notes : List order matters. elements[0] should be at highest on the page.
-        
-        
+            Notes : Any order; elements are sorted by their top here.
+
+        Algorithm:
+        - one pass over the tuples records where each line starts and the top of its first char;
+        - each element is placed before the first line that starts below the element's top
+          (bisect over the line tops), or at the end if no line does;
+        - one more pass copies the tuples and drops the element tuples in at their positions.
+
         - bottom = page_height - y0
         - top = page_height - y1 
         - (y0,x0) is at the bottom of the page
         """
-
-        # Naive implementation: iterate through all object.
-        element_pop_index_list = []
-        try:
-            tuples_size = len(tuples)
-            if tuples_size == 0: return [(e['content'], e['object']) for e in elements]
-        except:
-            return [(e['content'], e['object']) for e in elements]
-             
-        if cd == 'ltr' and ld == 'ttb':
-
-            # for all tables that occur before the first text
-            for j, element in enumerate(elements): 
-
-                # Lower-bound occurs before the top of the first word.
-                _element_bot = element.get('object').get('bottom') or element.get('object').get('bot')
-                if _element_bot <  tuples[0][1]['top']: 
-                    tuples.insert(j, (element['content'], element['object']))
-                    element_pop_index_list.append(j)
-
-            # Clear all elements that have already been inserted in tuples.
-            [elements.pop(x) for x in element_pop_index_list] 
-            if len(elements) == 0: return tuples
-        
-            # Note: We use '\n' as the filter to indentify whitespace,
-            # so we can insert all tables that occur between the given charcters,
-            # so double-column text with not be serialized in the right order.
-            def pass_whitespace(tuple_before, whitespace_tuple ,tuple_after, index):
-                if (whitespace_tuple[0] == '\n' and whitespace_tuple[1] == None): 
-                    
-                    try:
-                        # (0,0) is a bottom left of the page, but (bot, top) orients (0,0) to the top left of the page
-                        top = 0 if index == 0 else self.page_height - tuple_before[1]['y0']  
-                        bot = self.page_height if index-tuples_size-1 == 0 else self.page_height - tuple_after[1]['y1'] 
-                        
-                        x0 = None # TODO: Implement for double column
-                        x1 = None
-                        calculated_whitespace = {'index': index, 'top': top, 'bot': bot, 'x0': x0, 'x1': x1}
-
-                    except Exception as e:
-                        print(e) 
-                    return calculated_whitespace
-            
-            # Fliter over a sliding window.
-            whitespace = map(pass_whitespace, tuples[:-2], tuples[1:-1],
-                             tuples[2:], range(1,len(tuples)-1))
-
-            for w in [x for x in list(whitespace) if x]:
-                    
-                # Compare tuples
-                e = elements[0]  # We only look at the first element because the list of elements is already sorted.
-                e_bbox_top = e['object'].get('top')
-                e_bbox_bot = e['object'].get('bot') or e['object'].get('bottom')
-                if e_bbox_top == None or e_bbox_bot == None: raise AttributeError
-
-                # insert custom tuple for element if the bbox of the 
-                # element comes after the previous word, and before
-                # the following word.
-                if e_bbox_top > w['bot'] and e_bbox_bot < w['top']:  # Note this condition will make it so that this only works w
-                    new_element_tuple = ('\n' + e['content'] + '\n', None)
-                    tuples.insert(w['index'] , new_element_tuple)
-                    elements.pop(0)
-
-                # Add any remaining tables to the end.
-                for element in elements:
-                    tuples.append(('\n' + element['content'] + '\n', None))
-                return tuples
+        if not elements:
+            return tuples
+        element_tuple = lambda e: ('\n' + e['content'] + '\n', None)
+        elements = sorted(elements, key=lambda e: e['object'].get('top'))
+        if ld not in ('ttb', 'btt') or not tuples:
+            return list(tuples) + [element_tuple(e) for e in elements]
+
+        # Line starts and their tops. A line starts after every '\n' tuple;
+        # its top is that of the first real char on it.
+        line_starts, line_tops = [], []
+        line_start, seeking = 0, True
+        for i, (text, obj) in enumerate(tuples):
+            if text == '\n' and obj is None:
+                line_start, seeking = i + 1, True
+            elif seeking and obj is not None:
+                line_starts.append(line_start)
+                line_tops.append(obj['top'] if ld == 'ttb' else -obj['top'])
+                seeking = False
+
+        # Keep the keys sorted for bisect even if a line sits slightly above the previous one.
+        for i in range(1, len(line_tops)):
+            line_tops[i] = max(line_tops[i], line_tops[i - 1])
+
+        positions = []
+        for e in elements:
+            top = e['object'].get('top') if ld == 'ttb' else -e['object'].get('top')
+            line = bisect.bisect_right(line_tops, top)
+            positions.append(line_starts[line] if line < len(line_starts) else len(tuples))
+        if ld == 'btt':
+            # Lines run bottom to top, so the lowest element comes first in the text.
+            order = sorted(range(len(elements)), key=lambda i: positions[i])
+            elements, positions = [elements[i] for i in order], [positions[i] for i in order]
+
+        merged, previous = [], 0
+        for e, position in zip(elements, positions):
+            merged.extend(tuples[previous:position])
+            merged.append(element_tuple(e))
+            previous = position
+        merged.extend(tuples[previous:])
+        return merged
     
     def serialize(self, page:Page, table_settings=None) -> FilteredPage:
 
@@ -124,18 +124,25 @@ class TopDownSerializeStrategy(SerializationStrategy):
 
         main abstraction: bbox (x0, top, x1, bot) 
             | where origin of top and bottom are top left of the page.
+
+        Pages are triaged first (see src.pdf.triage): text-only pages are
+        returned as they are, and table detection only runs where it can find something.
         """
+        page_class = classify_page(page)
+        if page_class == PAGE_TEXT and not may_have_tables(page_class, table_settings):
+            return page
+        tables = self.find_tables(page, table_settings) if may_have_tables(page_class, table_settings) else []
 
         elements = {
             'tables' : [
                 {
-                'content' : self.table_formatting_strategy.format(y.extract()),
-                'object' : {'x0': y.bbox[0], 'x1': y.bbox[2], 'top': y.bbox[1], 'bot': y.bbox[3]}  # bbox : (x0, top , x1, bottom)
-                } for y in page.find_tables(table_settings=table_settings)],
+                'content' : self.table_formatting_strategy.format(rows),
+                'object' : {'x0': bbox[0], 'x1': bbox[2], 'top': bbox[1], 'bot': bbox[3]}  # bbox : (x0, top , x1, bottom)
+                } for bbox, rows in tables],
 
             'images' : [
                 {
-                    'content' : self.uri_formatting_strategy.format(x['name']), # URI
+                    'content' : self.uri_formatting_strategy.format(x), # URI
                     'object' : x
                 } for x in page.images] # for propeties, see pdfplumber docs
                  # https://github.com/jsvine/pdfplumber?tab=readme-ov-file#objects     
@@ -146,25 +153,23 @@ class TopDownSerializeStrategy(SerializationStrategy):
         # Filter page from of tables; 
         # see page.outside_bbox(bounding_box, relative=False, strict=True)
         bboxes = [element['object'] for element in elements['tables'] if element!=None]
-        def not_within_bboxes(obj):
-            def obj_in_bbox(_bbox):
-                v_mid = (obj["top"] + obj["bottom"]) / 2
-                h_mid = (obj["x0"] + obj["x1"]) / 2
-                x0, x1, top, bottom = _bbox.get('x0'), _bbox.get('x1'), _bbox.get('top'), (_bbox.get('bottom') or _bbox.get('bot') )
-                return (h_mid) >= x0 and (h_mid) < x1 and (v_mid >= top) and (v_mid < bottom)
-            return not any(obj_in_bbox(__bbox) for __bbox in bboxes)
-        filtered_page = page.filter(not_within_bboxes)
+
+        # Midpoint-in-box test for all objects at once; the filter is then a set lookup.
+        dropped = set()
+        if bboxes:
+            for objs in page.objects.values():
+                dropped.update(id(objs[i]) for i in np.flatnonzero(midpoints_in_bboxes(objs, bboxes)))
+        filtered_page = page.filter(lambda obj: id(obj) not in dropped)
 
         # Note: result is written implictly; pass-by-reference
         tm = filtered_page.get_textmap() 
-        for k in elements.keys():
 
-            # modify existing textmap
-            tm.tuples = self.merge_elements_into_tuples(
-                tm.char_dir_render,
-                tm.line_dir_render,
-                tm.tuples,
-                elements[k])
+        # modify existing textmap
+        tm.tuples = self.merge_elements_into_tuples(
+            tm.char_dir_render,
+            tm.line_dir_render,
+            tm.tuples,
+            elements['tables'] + elements['images'])
 
         # refresh string representation
         tm.as_string = tm.to_string()
@@ -179,4 +184,54 @@ class TopDownSerializeStrategy(SerializationStrategy):
         for i, rect in enumerate(_objects): 
             print(rect[i].__dict__.get('bbox')[1] == rect[i].__dict__.get('bbox')[1] and rect[i].__dict__.get('bbox')[3] == rect[i].__dict__.get('bbox')[3])
 
-    
\ No newline at end of file
+    
+
+class AssembledTextMap():
+    """Stands in for pdfplumber's TextMap where only the string is needed."""
+    def __init__(self, as_string: str):
+        self.as_string = as_string
+
+
+class AssembledPage():
+    """A page whose default textmap comes from src.pdf.lines; everything else is the page's own."""
+    def __init__(self, page: Page, text: str):
+        self._page = page
+        self._textmap = AssembledTextMap(text)
+
+    def get_textmap(self, **kwargs):
+        return self._page.get_textmap(**kwargs) if kwargs else self._textmap
+
+    def extract_text(self, **kwargs) -> str:
+        return self.get_textmap(**kwargs).as_string
+
+    def __getattr__(self, name):
+        return getattr(self._page, name)
+
+
+class LineAssemblySerializeStrategy(TopDownSerializeStrategy):
+    """TopDownSerializeStrategy with a NumPy text engine for text-only pages.
+
+    Text-only pages (see src.pdf.triage) are assembled from `page.chars` by
+    src.pdf.lines.assemble_text, which gives the same string as the textmap
+    without building one; other pages, and pages with rotated text, go
+    through the textmap as before.
+    """
+
+    def serialize(self, page:Page, table_settings=None):
+        page_class = classify_page(page)
+        if page_class == PAGE_TEXT and not may_have_tables(page_class, table_settings):
+            text = assemble_text(page.chars)
+            if text is not None:
+                return AssembledPage(page, text)
+        return super().serialize(page, table_settings)
+
+
+# Names accepted by [pdf].text_engine.
+TEXT_ENGINES = {'textmap': TopDownSerializeStrategy, 'numpy': LineAssemblySerializeStrategy}
+
+
+def serialization_strategy(text_engine: str = 'textmap', table_cache=None) -> TopDownSerializeStrategy:
+    """The serialization strategy of a [pdf].text_engine: 'textmap' (pdfplumber) or 'numpy' (line assembly)."""
+    if text_engine not in TEXT_ENGINES:
+        raise ValueError(f'Unknown text engine {text_engine!r}; expected one of {sorted(TEXT_ENGINES)}')
+    return TEXT_ENGINES[text_engine](table_cache=table_cache)
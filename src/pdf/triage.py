@@ -0,0 +1,58 @@
+from typing import Dict, Optional
+
+from pdfplumber.pdf import Page
+
+# Page classes, from cheapest to most expensive to serialize.
+PAGE_TEXT = 'text'          # prose only: no tables to detect, nothing to merge
+PAGE_IMAGE = 'image'        # images but no rects/lines/curves: no ruled tables
+PAGE_TABLE = 'table'        # has rects/lines/curves: may hold a ruled table
+PAGE_SCANNED = 'scanned'    # no text layer (scanned or empty); needs OCR
+PAGE_CLASSES = (PAGE_TEXT, PAGE_IMAGE, PAGE_TABLE, PAGE_SCANNED)
+
+# Table strategies that only find tables drawn with rects/lines/curves.
+_RULED_STRATEGIES = ('lines', 'lines_strict')
+
+
+def classify_page(page: Page) -> str:
+    """Classifies a page from its object counts, without any layout analysis."""
+    if not page.chars:
+        return PAGE_SCANNED
+    if page.rects or page.lines or page.curves:
+        return PAGE_TABLE
+    if page.images:
+        return PAGE_IMAGE
+    return PAGE_TEXT
+
+
+def may_have_tables(page_class: str, table_settings: Optional[Dict] = None) -> bool:
+    """False when `find_tables` cannot find anything on a page of this class.
+
+    Only holds for the ruled strategies (pdfplumber's default); the 'text' and
+    'explicit' strategies can find tables on any page.
+    """
+    settings = table_settings or {}
+    ruled = all(settings.get(key, 'lines') in _RULED_STRATEGIES
+                for key in ('vertical_strategy', 'horizontal_strategy'))
+    return page_class == PAGE_TABLE or not ruled
+
+
+class TriageReport:
+    """Pages and seconds spent per page class."""
+
+    def __init__(self):
+        self.pages = {page_class: 0 for page_class in PAGE_CLASSES}
+        self.seconds = {page_class: 0.0 for page_class in PAGE_CLASSES}
+
+    def add(self, page_class: str, seconds: float):
+        self.pages[page_class] += 1
+        self.seconds[page_class] += seconds
+
+    def update(self, other: Dict[str, Dict]):
+        """Adds a report in its to_dict() form, e.g. one returned by a worker process."""
+        for page_class, counts in other.items():
+            self.pages[page_class] += counts['pages']
+            self.seconds[page_class] += counts['seconds']
+
+    def to_dict(self) -> Dict[str, Dict]:
+        return {page_class: {'pages': self.pages[page_class], 'seconds': round(self.seconds[page_class], 3)}
+                for page_class in PAGE_CLASSES}
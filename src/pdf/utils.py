@@ -1,5 +1,10 @@
+from pdfminer.pdftypes import LITERALS_DCT_DECODE
 from pdfplumber.pdf import Page
+import hashlib
+import numpy as np
 import os
+import weakref
+from typing import Dict, List
 
 def create_unique_directory(dir_path):
     """
@@ -39,3 +44,50 @@ def is_b_inside_a(a, b)-> bool:
     if a['x1'] < b['x1']:
         return False
     return True
+
+
+def midpoints_in_bboxes(objects: List[Dict], bboxes: List[Dict]) -> np.ndarray:
+    """Boolean mask: True where an object's midpoint lies in any bbox.
+
+    Boxes use top-left origin keys (x0, x1, top, bot/bottom) and are half-open,
+    [x0, x1) x [top, bottom). Tests every object against every box in one
+    broadcast instead of a Python call per object.
+    """
+    if not objects or not bboxes:
+        return np.zeros(len(objects), dtype=bool)
+    coords = np.array([(o['x0'], o['x1'], o['top'], o['bottom']) for o in objects], dtype=np.float64)
+    h_mid = ((coords[:, 0] + coords[:, 1]) / 2)[:, None]
+    v_mid = ((coords[:, 2] + coords[:, 3]) / 2)[:, None]
+    boxes = np.array([(b.get('x0'), b.get('x1'), b.get('top'), b.get('bottom') or b.get('bot')) for b in bboxes],
+                     dtype=np.float64)
+    inside = (h_mid >= boxes[:, 0]) & (h_mid < boxes[:, 1]) & (v_mid >= boxes[:, 2]) & (v_mid < boxes[:, 3])
+    return inside.any(axis=1)
+
+
+# Embedded images
+# Digests are memoized per stream: pdfminer drops the raw bytes once a stream
+# is decoded, and the URI (at serialization) and the file (at extraction) must agree.
+_IMAGE_DIGESTS = weakref.WeakKeyDictionary()
+_IMAGE_KEYS = ('Width', 'Height', 'BitsPerComponent', 'ImageMask', 'Filter', 'DecodeParms')
+
+
+def image_digest(image: Dict) -> str:
+    """sha256 of an embedded image's encoded stream bytes and decoding parameters.
+
+    Identical images (e.g. a logo drawn on every page) hash the same, without decoding them.
+    """
+    stream = image['stream']
+    digest = _IMAGE_DIGESTS.get(stream)
+    if digest is None:
+        h = hashlib.sha256(repr([stream.attrs.get(key) for key in _IMAGE_KEYS]).encode())
+        raw = stream.get_rawdata()
+        h.update(raw if raw is not None else stream.get_data())
+        digest = _IMAGE_DIGESTS[stream] = h.hexdigest()
+    return digest
+
+
+def image_filename(image: Dict) -> str:
+    """Content-addressed file name of an embedded image: JPEG streams keep their bytes, the rest become PNG."""
+    filters = image['stream'].get_filters()
+    suffix = '.jpg' if filters and filters[-1][0] in LITERALS_DCT_DECODE else '.png'
+    return image_digest(image)[:32] + suffix
@@ -0,0 +1,37 @@
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+import uvicorn
+import hashlib
+import numpy as np
+import random
+import sys
+
+app = FastAPI()
+
+DIM = 384
+# Share of requests answered with 503, to exercise the client's retries.
+FAILURE_RATE = float(sys.argv[1]) if len(sys.argv) > 1 else 0.0
+
+
+def fake_embedding(text: str) -> list:
+    # Deterministic per text, so re-embedding the same text gives the same vector.
+    seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], 'little')
+    return np.random.default_rng(seed).standard_normal(DIM).astype(np.float32).tolist()
+
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    if random.random() < FAILURE_RATE:
+        return JSONResponse({"error": "busy"}, status_code=503)
+    body = await request.json()
+    texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+    return {
+        "object": "list",
+        "model": body.get("model", "stub"),
+        "data": [{"object": "embedding", "index": i, "embedding": fake_embedding(text)}
+                 for i, text in enumerate(texts)],
+    }
+
+if __name__ == "__main__":
+    uvicorn.run(app, host="0.0.0.0", port=5043)
@@ -0,0 +1,175 @@
+"""Writes small synthetic PDFs for the tests: Latin (Helvetica) and CJK (MingLiU, UCS-2) text.
+
+A page is a list of content-stream operators, built with `latin`, `cjk` and
+`table` or by one of the seeded page generators below.
+Neither font is embedded; pdfplumber takes the widths from the standard
+Helvetica metrics and the CID font's default width, which is all the text
+engines look at.
+"""
+import random
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from pdfminer.fontmetrics import FONT_METRICS
+
+FONTS = (
+    b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+    b'<< /Type /Font /Subtype /CIDFontType0 /BaseFont /MingLiU'
+    b' /CIDSystemInfo << /Registry (Adobe) /Ordering (CNS1) /Supplement 0 >>'
+    b' /FontDescriptor << /Type /FontDescriptor /FontName /MingLiU /Flags 4 /FontBBox [0 -200 1000 900]'
+    b' /ItalicAngle 0 /Ascent 880 /Descent -120 /CapHeight 700 /StemV 80 >> /DW 1000 >>',
+    b'<< /Type /Font /Subtype /Type0 /BaseFont /MingLiU /Encoding /UniCNS-UCS2-H /DescendantFonts [2 0 R] >>',
+)
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+CJK_CHARS = '新進同仁入職指南內容說明第段'
+LATIN_CHARS = 'abcdefghijklmnopqrstuvwxyz0123456789-.'
+_HELVETICA_WIDTHS = FONT_METRICS['Helvetica'][1]
+
+
+def latin(x: float, y: float, text: str, size: float = 10) -> str:
+    """Shows `text` in Helvetica with its baseline starting at (x, y), PDF coordinates."""
+    escaped = text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+    return f'BT /F1 {size} Tf {x:.2f} {y:.2f} Td ({escaped}) Tj ET'
+
+
+def cjk(x: float, y: float, text: str, size: float = 10) -> str:
+    """Shows `text` in the CJK font (each char one em wide) with its baseline starting at (x, y)."""
+    codes = ''.join(f'{ord(c):04X}' for c in text)
+    return f'BT /F2 {size} Tf {x:.2f} {y:.2f} Td <{codes}> Tj ET'
+
+
+def latin_width(text: str, size: float) -> float:
+    return sum(_HELVETICA_WIDTHS.get(c, 0) for c in text) * size / 1000
+
+
+def table(x: float, top: float, rows: List[List[str]], col_width: float = 80, row_height: float = 18) -> List[str]:
+    """A ruled table (one stroked line per row and column border) with Latin cells; `top` from the page top."""
+    y_top = PAGE_HEIGHT - top
+    width, height = len(rows[0]) * col_width, len(rows) * row_height
+    ops = [f'{x} {y_top - r * row_height} m {x + width} {y_top - r * row_height} l S' for r in range(len(rows) + 1)]
+    ops += [f'{x + c * col_width} {y_top} m {x + c * col_width} {y_top - height} l S' for c in range(len(rows[0]) + 1)]
+    for r, row in enumerate(rows):
+        for c, cell in enumerate(row):
+            ops.append(latin(x + c * col_width + 4, y_top - (r + 1) * row_height + 5, cell))
+    return ops
+
+
+def text_page(lines: List[str], size: float = 10) -> List[str]:
+    """One line of Latin text per entry, top to bottom."""
+    return [latin(50, PAGE_HEIGHT - 60 - i * (size + 4), line, size) for i, line in enumerate(lines)]
+
+
+def cjk_page(seed: int) -> List[str]:
+    """Lines of CJK words with a few Latin ones, at jittered positions, sizes and stream order."""
+    return _jittered_page(seed, cjk_share=0.8)
+
+
+def latin_page(seed: int) -> List[str]:
+    """Lines of Latin words (some with inner spaces), at jittered positions, sizes and stream order."""
+    return _jittered_page(seed, cjk_share=0.0)
+
+
+def gap_page(seed: int, tolerance: float = 3.0) -> List[str]:
+    """Words separated by gaps on both sides of the x tolerance, runs of spaces and small baseline shifts.
+
+    Covers where the text engines split or join words and lines: gaps of
+    exactly `tolerance`, just under and just over it, touching and
+    overlapping words, and baselines shifted by about the y tolerance.
+    """
+    rng = random.Random(seed)
+    gaps = [0.0, -1.0, tolerance - 0.01, tolerance, tolerance + 0.01, 2 * tolerance, 20.0]
+    ops = []
+    y = PAGE_HEIGHT - 60
+    while y > 60:
+        x = 40.0
+        size = rng.choice([8, 10, 12])
+        while x < PAGE_WIDTH - 120:
+            shift = rng.choice([0.0, 0.0, 0.0, tolerance - 0.01, tolerance, -tolerance - 0.01])
+            if rng.random() < 0.3:
+                word = ''.join(rng.choice(CJK_CHARS) for _ in range(rng.randint(1, 4)))
+                ops.append(cjk(x, y + shift, word, size))
+                x += size * len(word)
+            else:
+                word = ''.join(rng.choice(LATIN_CHARS) for _ in range(rng.randint(1, 6)))
+                word += ' ' * rng.choice([0, 0, 1, 2, 3]) + rng.choice(['', 'x', 'yz'])
+                ops.append(latin(x, y + shift, word, size))
+                x += latin_width(word, size)
+            x += rng.choice(gaps)
+        y -= rng.choice([size + 4, size + 1, 2 * size])
+    rng.shuffle(ops)
+    return ops
+
+
+def _jittered_page(seed: int, cjk_share: float) -> List[str]:
+    rng = random.Random(seed)
+    ops = []
+    y = PAGE_HEIGHT - 60.0
+    while y > 60:
+        x = 40 + rng.uniform(0, 20)
+        size = rng.choice([8, 9, 10, 12, 14])
+        while x < PAGE_WIDTH - 75:
+            baseline = y + rng.choice([0, 0, 0, rng.uniform(-4, 4)])
+            if rng.random() < cjk_share:
+                word = ''.join(rng.choice(CJK_CHARS) for _ in range(rng.randint(1, 6)))
+                ops.append(cjk(x, baseline, word, size))
+                x += size * len(word) + rng.uniform(0, 8)
+            else:
+                word = ''.join(rng.choice(LATIN_CHARS) for _ in range(rng.randint(1, 9)))
+                if rng.random() < 0.5:
+                    word = word + ' ' + word[::-1]
+                ops.append(latin(x, baseline, word, size))
+                x += latin_width(word, size) + rng.uniform(0, 8)
+        y -= rng.uniform(8, 18)
+    rng.shuffle(ops)
+    return ops
+
+
+def image_xobject(width: int, height: int, data: bytes, colorspace: str = 'DeviceRGB', bits: int = 8,
+                  filter: str = '') -> bytes:
+    """An image XObject for write_pdf's `images`: raw samples, or encoded bytes with `filter` (e.g. 'DCTDecode')."""
+    params = f'/Type /XObject /Subtype /Image /Width {width} /Height {height} /ColorSpace /{colorspace}' \
+             f' /BitsPerComponent {bits}' + (f' /Filter /{filter}' if filter else '')
+    return f'<< {params} /Length {len(data)} >>\nstream\n'.encode() + data + b'\nendstream'
+
+
+def draw_image(name: str, x: float, top: float, width: float, height: float) -> str:
+    """Draws the image XObject `name` with its top-left corner at (x, top), `top` from the page top."""
+    return f'q {width} 0 0 {height} {x} {PAGE_HEIGHT - top - height} cm /{name} Do Q'
+
+
+def write_pdf(path, pages: List[List[str]], images: Optional[Dict[str, bytes]] = None) -> Path:
+    """Writes a PDF with one page per list of operators and returns its path.
+
+    `images` maps XObject names to image_xobject() bodies; every page can draw them with draw_image().
+    """
+    objects = list(FONTS)
+    font_refs = '/F1 1 0 R /F2 3 0 R'
+    image_refs = ''
+    for name, body in (images or {}).items():
+        objects.append(body)
+        image_refs += f' /{name} {len(objects)} 0 R'
+    resources = f'/Font << {font_refs} >>' + (f' /XObject <<{image_refs} >>' if image_refs else '')
+    pages_id = len(objects) + 2 * len(pages) + 1
+    page_ids = []
+    for ops in pages:
+        data = '\n'.join(ops).encode()
+        objects.append(b'<< /Length %d >>\nstream\n' % len(data) + data + b'\nendstream')
+        objects.append(f'<< /Type /Page /Parent {pages_id} 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}]'
+                       f' /Resources << {resources} >> /Contents {len(objects)} 0 R >>'.encode())
+        page_ids.append(len(objects))
+    kids = ' '.join(f'{i} 0 R' for i in page_ids)
+    objects.append(f'<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>'.encode())
+    objects.append(f'<< /Type /Catalog /Pages {pages_id} 0 R >>'.encode())
+
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f'{number} 0 obj\n'.encode() + body + b'\nendobj\n'
+    xref = len(out)
+    out += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode()
+    out += b''.join(f'{offset:010d} 00000 n \n'.encode() for offset in offsets)
+    out += f'trailer\n<< /Size {len(objects) + 1} /Root {len(objects)} 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode()
+    path = Path(path)
+    path.write_bytes(out)
+    return path
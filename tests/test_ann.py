@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from src.index.ann import IVFIndex, recall_at_k
+from src.index.core import Index
+from src.index.search import VectorSearch
+
+DIM = 16
+
+
+def clustered(n: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, n // 100), DIM)).astype(np.float32)
+    return centers[rng.integers(0, len(centers), n)] + 0.3 * rng.standard_normal((n, DIM)).astype(np.float32)
+
+
+def add_doc(index: Index, directory, name: str, vectors: np.ndarray):
+    doc = directory / f'{name}.pdf'
+    doc.write_bytes(name.encode())
+    index.index_doc(str(doc), [{'node_id': f'{name}-{i}', 'embedding': v.tobytes(), 'metadata': {}}
+                               for i, v in enumerate(vectors)])
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = Index(str(tmp_path / 'index.db'))
+    add_doc(index, tmp_path, 'a', clustered(2000, seed=0))
+    yield index
+    index.close()
+
+
+def test_recall_against_exact_search(index):
+    ivf = IVFIndex(index, n_lists=32, nprobe=8).load()
+    queries = clustered(50, seed=1)
+    exact = VectorSearch(index)
+    assert recall_at_k(ivf, exact, queries, k=10) >= 0.9
+    # Probing every list is exact search.
+    assert recall_at_k(ivf, exact, queries, k=10, nprobe=32) == 1.0
+
+
+def test_sidecar_is_reloaded(index, tmp_path):
+    built = IVFIndex(index, n_lists=16).load()
+    assert (tmp_path / 'index.db.ivf.npz').exists()
+    loaded = IVFIndex(index, n_lists=16).load()
+    np.testing.assert_array_equal(loaded.centroids, built.centroids)
+    query = clustered(1, seed=2)[0]
+    np.testing.assert_array_equal(loaded.top_k(query, 5)[0], built.top_k(query, 5)[0])
+
+
+def test_new_and_removed_nodes_are_picked_up(index, tmp_path):
+    ivf = IVFIndex(index, n_lists=16, nprobe=16).load()
+    extra = clustered(10, seed=3)
+    add_doc(index, tmp_path, 'b', extra)
+    ivf.invalidate()
+    ids, scores = ivf.top_k(extra[4], 1)
+    assert index.get_nodes_by_ids([int(ids[0])])[int(ids[0])]['node_id'] == 'b-4'
+    assert scores[0] == pytest.approx(1.0, abs=1e-5)
+
+    index.remove_doc(str(tmp_path / 'a.pdf'))
+    ivf.invalidate()
+    ids, _ = ivf.top_k(extra[0], 20)
+    assert len(ids) == 10
+    assert sum(len(list_ids) for list_ids in ivf.list_ids) == 10
@@ -0,0 +1,43 @@
+import random
+
+import pytest
+
+from src.index.schema import TextNode
+from src.index.tokenizer import estimate_tokens
+from src.pdf.extract import TokenBudgetChunkingStrategy
+from tests.pdf_samples import CJK_CHARS, LATIN_CHARS
+
+
+def node_tokens(text: str) -> int:
+    """Tokens of a node as the strategy counts them: each line plus its newline."""
+    return sum(estimate_tokens(line) + 1 for line in text.split('\n'))
+
+
+def random_lines(seed: int, n: int = 60):
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(n):
+        chars = rng.choice([CJK_CHARS, LATIN_CHARS, LATIN_CHARS + '  ', CJK_CHARS + LATIN_CHARS + ' '])
+        lines.append(''.join(rng.choice(chars) for _ in range(rng.choice([1, 5, 30, 80, 200, 600]))))
+    return lines
+
+
+@pytest.mark.parametrize('line', ['a' * 200, '新' * 100, 'ab cd ' * 50, 'x' * 79 + '新' * 7])
+def test_split_line_pieces_fit_the_budget(line):
+    strategy = TokenBudgetChunkingStrategy(max_tokens=20, overlap_tokens=4)
+    pieces = strategy.split_line(line)
+    assert ''.join(pieces) == line
+    assert all(estimate_tokens(piece) + 1 <= 20 for piece in pieces)
+
+
+@pytest.mark.parametrize('max_tokens', [2, 7, 20, 64, 512])
+@pytest.mark.parametrize('seed', range(5))
+def test_no_packed_node_is_over_budget(max_tokens, seed):
+    strategy = TokenBudgetChunkingStrategy(max_tokens=max_tokens, overlap_tokens=max_tokens // 4)
+    chunks = strategy.pack(random_lines(seed))
+    assert chunks
+    assert max(node_tokens(chunk) for chunk in chunks) <= max_tokens
+
+    nodes = [TextNode(text=chunk, metadata={'page': i // 3 + 1}) for i, chunk in enumerate(chunks)]
+    merged = list(strategy.merge(nodes))
+    assert max(node_tokens(node.text) for node in merged) <= max_tokens
@@ -0,0 +1,64 @@
+import sqlite3
+
+from src.pdf.cache import DiskLRU
+
+
+def stored_bytes(cache: DiskLRU) -> int:
+    return cache._conn().execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+
+def used(cache: DiskLRU, key: str) -> float:
+    return cache._conn().execute("SELECT used FROM entries WHERE key = ?", (key,)).fetchone()[0]
+
+
+def test_running_total_follows_writes(tmp_path):
+    cache = DiskLRU(str(tmp_path / 'cache.db'), max_mb=1)
+    cache.put('a', b'x' * 1000)
+    cache.put_many([('b', b'y' * 500), ('c', b'z' * 10)])
+    cache.put('a', b'x' * 300)  # replaced: the old size is subtracted
+    assert cache.size() == stored_bytes(cache) == 810
+
+    for i in range(30):  # 30 * 64 KiB overflows 1 MiB
+        cache.put(f'big{i}', b'0' * 65536)
+    assert cache.get('a') is None
+    assert cache.size() == stored_bytes(cache) <= cache.max_bytes
+
+    cache.clear()
+    assert cache.size() == 0
+
+
+def test_total_of_older_files_is_computed_once(tmp_path):
+    path = tmp_path / 'cache.db'
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE entries (key TEXT PRIMARY KEY, value BLOB, size INTEGER, used REAL)")
+    conn.executemany("INSERT INTO entries VALUES (?, ?, ?, ?)", [('a', b'12345', 5, 1.0), ('b', b'123', 3, 2.0)])
+    conn.commit()
+    conn.close()
+
+    cache = DiskLRU(str(path))
+    assert cache.size() == 8
+    cache.put('c', b'1')
+    assert DiskLRU(str(path)).size() == 9
+
+
+def test_hits_only_touch_stale_entries(tmp_path):
+    cache = DiskLRU(str(tmp_path / 'cache.db'), touch_seconds=3600)
+    cache.put('a', b'1')
+    first = used(cache, 'a')
+    assert cache.get('a') == b'1'
+    assert used(cache, 'a') == first
+
+    cache._conn().execute("UPDATE entries SET used = used - 7200 WHERE key = 'a'")
+    assert cache.get('a') == b'1'
+    assert used(cache, 'a') >= first
+
+
+def test_recently_read_entries_survive_eviction(tmp_path):
+    cache = DiskLRU(str(tmp_path / 'cache.db'), max_mb=1, touch_seconds=0)
+    cache.put('old', b'0' * 400_000)
+    cache.put('new', b'1' * 400_000)
+    cache._conn().execute("UPDATE entries SET used = used - 100")
+    assert cache.get('old') is not None  # now the most recently used
+    cache.put('newest', b'2' * 400_000)
+    assert cache.get('old') is not None
+    assert cache.get('new') is None
@@ -0,0 +1,63 @@
+import httpx
+import numpy as np
+import pytest
+from fastapi import FastAPI
+
+from src.index.embed import Embedder, EmbeddingCache
+from tests.conftest import serve_app
+
+app = FastAPI()
+
+
+@app.post('/{server}/embeddings')
+async def embeddings(server: str, body: dict):
+    """Two servers whose one unnamed model gives different vectors, and one that answers garbage."""
+    if server == 'garbled':
+        return {'data': [{'index': 0}]}
+    value = 1.0 if server == 'a' else -1.0
+    return {'data': [{'index': i, 'embedding': [value, float(i), 0.5]} for i in range(len(body['input']))]}
+
+
+@pytest.fixture(scope='module')
+def url():
+    with serve_app(app) as url:
+        yield url
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return EmbeddingCache(str(tmp_path / 'embedding_cache.db'), 16)
+
+
+def vector(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype=np.float32)
+
+
+def test_cache_is_keyed_by_endpoint(url, cache):
+    a = Embedder(f'{url}/a', cache=cache)
+    b = Embedder(f'{url}/b', cache=cache)
+    assert vector(a.embed(['same text'])[0])[0] == 1.0
+    assert vector(b.embed(['same text'])[0])[0] == -1.0
+    assert b.stats.cached == 0 and b.stats.requests == 1
+
+    again = Embedder(f'{url}/a', cache=cache)
+    assert vector(again.embed(['same text'])[0])[0] == 1.0
+    assert again.stats.cached == 1 and again.stats.requests == 0
+
+
+def test_garbled_response_defers_the_nodes(url):
+    embedder = Embedder(f'{url}/garbled', retries=0)
+    with pytest.raises(httpx.DecodingError):
+        embedder.embed(['text'])
+    nodes = [{'text': 'text'}]
+    stats = embedder.try_embed_nodes(nodes)
+    assert stats.deferred == 1 and 'embedding' not in nodes[0]
+
+
+def test_bugs_are_not_taken_for_an_outage(url, monkeypatch):
+    def broken_pack(keys, results):
+        raise KeyError('bug')
+
+    monkeypatch.setattr(Embedder, '_pack', staticmethod(broken_pack))
+    with pytest.raises(KeyError):
+        Embedder(f'{url}/a').try_embed_nodes([{'text': 'text'}])
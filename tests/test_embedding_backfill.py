@@ -0,0 +1,85 @@
+import hashlib
+
+import numpy as np
+import pytest
+
+from src.index.ann import IVFIndex
+from src.index.core import Index
+from src.index.embed import Embedder
+from src.index.search import VectorSearch
+from src.pdf.pdf import Pdf
+from tests.pdf_samples import text_page, write_pdf
+
+DIM = 8
+
+
+def fake_vector(text: str) -> np.ndarray:
+    seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], 'little')
+    return np.random.default_rng(seed).standard_normal(DIM).astype(np.float32)
+
+
+async def fake_request(self, client, throttle, texts):
+    return np.stack([fake_vector(text) for text in texts])
+
+
+@pytest.fixture
+def down_embedder():
+    # Nothing listens on port 9 (discard); the connection is refused at once.
+    return Embedder('http://127.0.0.1:9/v1', retries=0, timeout=2.0)
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = Index(str(tmp_path / 'index.db'))
+    yield index
+    index.close()
+
+
+def add_doc(index: Index, directory, name: str, embedder: Embedder, n_nodes: int = 20):
+    doc = directory / f'{name}.pdf'
+    doc.write_bytes(name.encode())
+    nodes = [{'node_id': f'{name}-{i}', 'text': f'{name} node {i}', 'metadata': {'page': 1}}
+             for i in range(n_nodes)]
+    stats = embedder.try_embed_nodes(nodes)
+    index.index_doc(str(doc), nodes)
+    return stats
+
+
+def test_failed_embedding_is_deferred_then_backfilled(index, tmp_path, down_embedder, monkeypatch):
+    stats = add_doc(index, tmp_path, 'a', down_embedder)
+    assert stats.deferred == 20 and stats.nodes == 0
+    assert len(list(index.iter_unembedded())) == 20
+    assert index.get_embeddings() == []
+
+    monkeypatch.setattr(Embedder, '_request', fake_request)
+    stats = down_embedder.embed_missing(index, batch_size=7)
+    assert stats.nodes == 20
+    assert list(index.iter_unembedded()) == []
+
+    ids, scores = VectorSearch(index).top_k(fake_vector('a node 3'), 1)
+    assert index.get_nodes_by_ids([int(ids[0])])[int(ids[0])]['node_id'] == 'a-3'
+    assert scores[0] == pytest.approx(1.0, abs=1e-5)
+
+
+def test_ivf_picks_up_backfilled_nodes(index, tmp_path, down_embedder, monkeypatch):
+    with monkeypatch.context() as patch:
+        patch.setattr(Embedder, '_request', fake_request)
+        add_doc(index, tmp_path, 'a', down_embedder)
+    ivf = IVFIndex(index, n_lists=2, path=str(tmp_path / 'index.ivf.npz')).load()
+    add_doc(index, tmp_path, 'b', down_embedder)  # endpoint down: stored without vectors
+
+    monkeypatch.setattr(Embedder, '_request', fake_request)
+    add_doc(index, tmp_path, 'c', down_embedder)  # inserted after the deferred nodes
+    down_embedder.embed_missing(index)
+    ivf.invalidate()
+    ids, _ = ivf.top_k(fake_vector('b node 5'), 1, nprobe=2)
+    assert index.get_nodes_by_ids([int(ids[0])])[int(ids[0])]['node_id'] == 'b-5'
+    assert sum(len(list_ids) for list_ids in ivf.list_ids) == 60
+
+
+def test_pdf_is_indexed_when_embedding_fails(index, tmp_path, down_embedder):
+    path = write_pdf(tmp_path / 'doc.pdf', [text_page(['alpha beta gamma'] * 5)])
+    pdf = Pdf(path, save_directory=tmp_path / 'out')
+    assert pdf.index(index, down_embedder)
+    assert pdf.embedding.deferred == len(pdf.nodes) > 0
+    assert len(list(index.iter_nodes(str(path)))) == len(pdf.nodes)
@@ -0,0 +1,68 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import src.common.digest as digests
+from src.common.digest import file_key
+from src.index.core import Index
+from src.index.ingest import pdf_to_nodes
+from tests.conftest import ROOT
+from tests.pdf_samples import text_page, write_pdf
+
+
+@pytest.fixture
+def hashed(monkeypatch):
+    """Paths passed to hash_file, with the digest memo emptied (a fresh process)."""
+    calls = []
+    hash_file = digests.hash_file
+
+    def counting_hash_file(path):
+        calls.append(str(path))
+        return hash_file(path)
+
+    monkeypatch.setattr(digests, 'hash_file', counting_hash_file)
+    monkeypatch.setattr(digests, '_DIGESTS', {})
+    return calls
+
+
+def test_changed_file_is_hashed_once(tmp_path, hashed):
+    path = write_pdf(tmp_path / 'doc.pdf', [text_page(['first version'])])
+    index = Index(str(tmp_path / 'index.db'))
+    assert index.needs_indexing(str(path))
+    assert index.index_doc(str(path), [])
+    assert len(hashed) == 1
+
+    write_pdf(path, [text_page(['second version'])])
+    os.utime(path, ns=(1, 1))
+    assert index.needs_indexing(str(path))
+    assert index.index_doc(str(path), [])
+    assert not index.needs_indexing(str(path))
+    assert len(hashed) == 2
+    index.close()
+
+
+def test_worker_reuses_the_callers_digest(tmp_path, hashed):
+    path = write_pdf(tmp_path / 'doc.pdf', [text_page(['some text'])])
+    key = file_key(path)
+    digest = digests.hash_file(path)
+    hashed.clear()
+
+    doc_path, doc_hash, nodes, _, _ = pdf_to_nodes(str(path), digest=(key, digest))
+    assert doc_hash == digest
+    assert hashed == []
+
+    # A digest taken before the file changed is not trusted.
+    write_pdf(path, [text_page(['other text'])])
+    os.utime(path, ns=(2, 2))
+    _, doc_hash, _, _, _ = pdf_to_nodes(str(path), digest=(key, digest))
+    assert doc_hash != digest
+    assert len(hashed) == 1
+
+
+def test_pdf_does_not_import_the_index():
+    # src.index.core imports src.pdf (metadata migration), so src.pdf must not import it back.
+    probe = "import sys, src.pdf.pdf, src.pdf.text; print('src.index.core' in sys.modules)"
+    result = subprocess.run([sys.executable, '-c', probe], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == 'False'
@@ -0,0 +1,52 @@
+import anyio
+import pytest
+from mcp import ClientSession
+from mcp.client.streamable_http import streamablehttp_client
+
+from src.common.http_client import UpstreamClient
+from test_stubs.chatbot_generation_stub import app as chatbot_stub
+from tests.conftest import serve_app
+
+
+async def call_generate(url: str, arguments: dict):
+    progress = []
+
+    async def on_progress(value, total, message):
+        progress.append((value, message))
+
+    async with streamablehttp_client(f'{url}/mcp') as (read, write, _):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            result = await session.call_tool('generate', arguments, progress_callback=on_progress)
+    return result.content[0].text, progress
+
+
+@pytest.fixture
+def mcp_url(server, monkeypatch):
+    with serve_app(chatbot_stub) as chatbot_url:
+        monkeypatch.setattr(server, 'upstream', UpstreamClient(chatbot_url))
+        monkeypatch.setattr(server.mcp, '_session_manager', None)  # a fresh transport per test
+        with serve_app(server.mcp.streamable_http_app()) as url:
+            yield url
+
+
+def test_streamed_tokens_arrive_as_progress(server, mcp_url):
+    assert not server.mcp_json_response, 'progress notifications need the SSE transport'
+    answer, progress = anyio.run(call_generate, mcp_url, {'input': {'content': 'hi', 'stream': True}})
+    # The stub sends 15 '.' frames before [DONE].
+    assert [value for value, _ in progress] == list(range(1, 16))
+    assert all(message.strip() == '.' for _, message in progress)
+    assert answer == ''.join(message for _, message in progress)
+
+
+def test_without_stream_there_is_no_progress(mcp_url):
+    answer, progress = anyio.run(call_generate, mcp_url, {'input': {'content': 'hi'}})
+    assert progress == []
+    assert 'data: [DONE]' in answer
+
+
+@pytest.mark.parametrize('timeout', ['abc', -1, 'nan', [5]])
+def test_bad_timeout_is_an_error_reply(mcp_url, timeout):
+    answer, progress = anyio.run(call_generate, mcp_url, {'input': {'content': 'hi', 'timeout': timeout}})
+    assert answer.startswith('Error: timeout must be a positive number of seconds')
+    assert progress == []
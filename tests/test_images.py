@@ -0,0 +1,151 @@
+import io
+import re
+import threading
+import time
+
+import PIL.Image
+import pdfplumber
+import pytest
+from pdfplumber.page import Page
+
+from src.pdf.extract import ImageExtractionStrategy
+from src.pdf.pdf import Pdf
+from tests.pdf_samples import draw_image, image_xobject, text_page, write_pdf
+
+RGB = bytes(range(48))  # 4 x 4 pixels
+
+
+def jpeg_bytes() -> bytes:
+    buffer = io.BytesIO()
+    PIL.Image.new('RGB', (8, 8), (200, 10, 10)).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+JPEG = jpeg_bytes()
+IMAGES = {
+    'Logo': image_xobject(4, 4, RGB),
+    'Copy': image_xobject(4, 4, RGB),  # the same image in a second XObject
+    'Photo': image_xobject(8, 8, JPEG, filter='DCTDecode'),
+    'Print': image_xobject(2, 2, bytes(range(16)), colorspace='DeviceCMYK'),
+}
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    """Pages rendered to get an image, instead of saving its stream."""
+    rendered = []
+    to_image = Page.to_image
+
+    def counting_to_image(self, *args, **kwargs):
+        rendered.append(self.page_number)
+        return to_image(self, *args, **kwargs)
+
+    monkeypatch.setattr(Page, 'to_image', counting_to_image)
+    return rendered
+
+
+def images_pdf(tmp_path, names):
+    pages = [text_page(['first page']) + [draw_image(name, 50, 100 + 60 * i, 40, 40) for i, name in enumerate(names)],
+             text_page(['second page']) + [draw_image(names[0], 50, 100, 40, 40)]]
+    return write_pdf(tmp_path / 'images.pdf', pages, images={name: IMAGES[name] for name in names})
+
+
+def test_each_distinct_image_is_saved_once(tmp_path, renders):
+    pdf = Pdf(images_pdf(tmp_path, ['Logo', 'Copy', 'Photo']), save_directory=tmp_path / 'out')
+    links = re.findall(r'\]\((images/[^)]+)\)', pdf.text)
+    assert len(links) == 4
+    assert len(set(links)) == 2  # Logo, its copy and its repeat on page 2 share one file
+    files = sorted(str(path.relative_to(pdf.md_directory)) for path in (pdf.md_directory / 'images').iterdir())
+    assert files == sorted(set(links))
+    assert renders == []
+
+
+def test_embedded_streams_are_saved_without_rendering(tmp_path, renders):
+    pdf = Pdf(images_pdf(tmp_path, ['Logo', 'Photo']), save_directory=tmp_path / 'out')
+    images = {path.suffix: path for path in (pdf.md_directory / 'images').iterdir()}
+    assert images['.jpg'].read_bytes() == JPEG
+    with PIL.Image.open(images['.png']) as png:
+        assert png.mode == 'RGB' and png.tobytes() == RGB
+    assert renders == []
+
+
+def test_other_colorspaces_are_rendered(tmp_path, renders):
+    pdf = Pdf(images_pdf(tmp_path, ['Print']), save_directory=tmp_path / 'out')
+    [image] = (pdf.md_directory / 'images').iterdir()
+    assert image.suffix == '.png'
+    with PIL.Image.open(image) as png:
+        assert png.size[0] > 2  # rendered at the page resolution, not the 2 x 2 samples
+    assert renders == [1]
+
+
+def test_existing_files_are_not_written_again(tmp_path, monkeypatch):
+    path = images_pdf(tmp_path, ['Logo', 'Photo'])
+    with pdfplumber.open(path) as pdf:
+        ImageExtractionStrategy(workers=0).extract(pdf.pages[0], tmp_path / 'md')
+    written = []
+    monkeypatch.setattr(ImageExtractionStrategy, 'write', lambda self, image, image_path, *args: written.append(image_path))
+    strategy = ImageExtractionStrategy(workers=0)  # a new run: nothing remembered but the files
+    with pdfplumber.open(path) as pdf:
+        saved = [strategy.extract(page, tmp_path / 'md') for page in pdf.pages]
+    assert len(saved[0]) == 2 and saved[1] == saved[0][:1]
+    assert written == []
+
+
+class SlowWriter(ImageExtractionStrategy):
+    """Writes take a while; records how many images were queued but not yet written."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.lock = threading.Lock()
+        self.submitted = self.finished = self.peak = 0
+        self.threads = set()
+
+    def submit(self, *args):
+        super().submit(*args)
+        with self.lock:
+            self.submitted += 1
+            self.peak = max(self.peak, self.submitted - self.finished)
+
+    def write(self, image, image_path, img_page, res):
+        self.threads.add(threading.current_thread().name)
+        time.sleep(0.02)
+        super().write(image, image_path, img_page, res)
+        with self.lock:
+            self.finished += 1
+
+
+def many_images_pdf(tmp_path, n: int = 12):
+    images = {f'Im{i}': image_xobject(4, 4, bytes([i]) * 48) for i in range(n)}
+    ops = [draw_image(name, 50 + 40 * (i % 10), 100 + 60 * (i // 10), 30, 30) for i, name in enumerate(images)]
+    return write_pdf(tmp_path / 'many.pdf', [ops], images=images)
+
+
+def test_images_are_written_in_the_background_with_backpressure(tmp_path):
+    strategy = SlowWriter(workers=2, max_pending=3)
+    with pdfplumber.open(many_images_pdf(tmp_path)) as pdf:
+        paths = strategy.extract(pdf.pages[0], tmp_path / 'md')
+    assert strategy.peak <= 3
+    strategy.flush()
+    assert strategy.finished == 12 and all(path.exists() for path in paths)
+    assert strategy.threads and all(name.startswith('image-writer') for name in strategy.threads)
+
+
+def test_flush_reraises_writer_errors(tmp_path, monkeypatch):
+    def failing_write(self, image, image_path, img_page, res):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(ImageExtractionStrategy, 'write', failing_write)
+    strategy = ImageExtractionStrategy(workers=2)
+    with pdfplumber.open(many_images_pdf(tmp_path, 3)) as pdf:
+        strategy.extract(pdf.pages[0], tmp_path / 'md')
+    with pytest.raises(OSError, match='disk full'):
+        strategy.flush()
+
+
+def test_pickling_waits_for_queued_images(tmp_path):
+    strategy = SlowWriter(workers=1)
+    with pdfplumber.open(many_images_pdf(tmp_path, 4)) as pdf:
+        paths = strategy.extract(pdf.pages[0], tmp_path / 'md')
+    state = strategy.__getstate__()
+    assert all(path.exists() for path in paths)
+    assert state['_pool'] is None and state['_pending'] == []
@@ -0,0 +1,63 @@
+import os
+
+import pytest
+
+from src.index.core import Index
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = Index(str(tmp_path / 'index.db'))
+    yield index
+    index.close()
+
+
+def texts(index: Index, path) -> list:
+    return [node['text'] for node in index.iter_nodes(str(path), ('text',))]
+
+
+def write(path, content: bytes, mtime_ns: int):
+    path.write_bytes(content)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_unchanged_document_is_skipped(index, tmp_path):
+    path = tmp_path / 'doc.pdf'
+    write(path, b'v1', 1)
+    assert index.index_doc(str(path), [{'text': 'first'}])
+    assert not index.needs_indexing(str(path))
+    assert not index.index_doc(str(path), [{'text': 'ignored'}])
+    assert texts(index, path) == ['first']
+
+    # Touched but not modified: still unchanged, and the new mtime is stored.
+    write(path, b'v1', 2)
+    assert not index.index_doc(str(path), [{'text': 'ignored'}])
+    assert [doc['mtime_ns'] for doc in index.iter_documents(('mtime_ns',))] == [2]
+
+    assert index.index_doc(str(path), [{'text': 'forced'}], force=True)
+    assert texts(index, path) == ['forced']
+
+
+def test_changed_document_replaces_its_nodes(index, tmp_path):
+    path = tmp_path / 'doc.pdf'
+    write(path, b'v1', 1)
+    index.index_doc(str(path), [{'text': 'old a'}, {'text': 'old b'}])
+    write(path, b'v2', 2)
+    assert index.needs_indexing(str(path))
+    assert index.index_doc(str(path), [{'text': 'new'}])
+    assert texts(index, path) == ['new']
+    assert len(index.get_documents()) == 1
+
+
+def test_remove_missing_only_under_root(index, tmp_path):
+    inside, outside = tmp_path / 'docs', tmp_path / 'other'
+    inside.mkdir()
+    outside.mkdir()
+    for path in (inside / 'a.pdf', inside / 'b.pdf', outside / 'c.pdf'):
+        write(path, path.name.encode(), 1)
+        index.index_doc(str(path), [{'text': path.name}])
+    (inside / 'a.pdf').unlink()
+    (outside / 'c.pdf').unlink()
+    assert index.remove_missing(str(inside)) == [str(inside / 'a.pdf')]
+    assert sorted(doc['name'] for doc in index.get_documents()) == ['b.pdf', 'c.pdf']
+    assert texts(index, inside / 'a.pdf') == []
@@ -0,0 +1,107 @@
+import gc
+import sqlite3
+import threading
+
+import pytest
+
+from src.index.core import Index
+
+
+def test_connections_close_with_their_threads(tmp_path):
+    index = Index(str(tmp_path / 'index.db'))
+    opened = []
+
+    def worker():
+        conn = index._conn()
+        conn.execute("SELECT COUNT(*) FROM nodes").fetchone()
+        opened.append(conn)
+
+    for _ in range(50):  # like anyio recycling idle worker threads
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+    gc.collect()
+
+    assert len(index._connections) == 1  # the main thread's, from opening the index
+    for conn in opened:
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+    index.close()
+
+
+def test_close_closes_live_threads_connections(tmp_path):
+    index = Index(str(tmp_path / 'index.db'))
+    ready, done = threading.Event(), threading.Event()
+    opened = []
+
+    def worker():
+        opened.append(index._conn())
+        ready.set()
+        done.wait()
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    ready.wait()
+    main = index._conn()
+    index.close()
+    for conn in (main, *opened):
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+    done.set()
+    thread.join()
+
+    assert index._conn().execute("SELECT COUNT(*) FROM documents").fetchone() == (0,)
+    index.close()
+
+
+def nodes(name: str, n: int):
+    return [{'node_id': f'{name}-{i}', 'text': f'{name} node {i}', 'metadata': {}} for i in range(n)]
+
+
+def test_one_wal_connection_per_thread(tmp_path):
+    index = Index(str(tmp_path / 'index.db'))
+    assert index._conn() is index._conn()
+    assert index._conn().execute("PRAGMA journal_mode").fetchone() == ('wal',)
+    index.close()
+
+
+def test_index_docs_writes_all_or_nothing(tmp_path):
+    index = Index(str(tmp_path / 'index.db'))
+    docs = []
+    for name in ('a', 'b', 'c'):
+        (tmp_path / f'{name}.pdf').write_bytes(name.encode())
+        docs.append((str(tmp_path / f'{name}.pdf'), '', nodes(name, 100)))
+    assert index.index_docs(docs) == 3
+    assert sum(1 for _ in index.iter_nodes()) == 300
+
+    (tmp_path / 'd.pdf').write_bytes(b'd')
+    missing = (str(tmp_path / 'gone.pdf'), 'x' * 64, nodes('gone', 1))
+    with pytest.raises(FileNotFoundError):
+        index.index_docs([(str(tmp_path / 'd.pdf'), '', nodes('d', 5)), missing])
+    assert [doc['name'] for doc in index.get_documents()] == ['a.pdf', 'b.pdf', 'c.pdf']
+    assert sum(1 for _ in index.iter_nodes()) == 300
+    index.close()
+
+
+def test_readers_are_not_blocked_by_a_writer(tmp_path):
+    index = Index(str(tmp_path / 'index.db'))
+    (tmp_path / 'a.pdf').write_bytes(b'a')
+    index.index_doc(str(tmp_path / 'a.pdf'), nodes('a', 10))
+    writing, read = threading.Event(), threading.Event()
+    counts = []
+
+    def reader():
+        writing.wait()
+        counts.append(sum(1 for _ in index.iter_nodes()))
+        read.set()
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    with index._transaction() as c:
+        c.execute("DELETE FROM nodes")
+        writing.set()
+        assert read.wait(timeout=5), 'the reader waited for the write transaction'
+    thread.join()
+    assert counts == [10]  # the last committed state
+    assert sum(1 for _ in index.iter_nodes()) == 0
+    index.close()
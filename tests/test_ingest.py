@@ -0,0 +1,94 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from src.index import ingest
+from src.index.core import Index
+from src.pdf.extract import MdExtractionStrategy
+from tests.pdf_samples import text_page, write_pdf
+
+_pdf_to_nodes = ingest.pdf_to_nodes
+
+
+def pdf_to_nodes_or_die(path, *args):
+    """Worker stand-in that kills its process on crash.pdf, as the OOM killer or a native crash would."""
+    if Path(path).stem == 'crash':
+        os._exit(1)
+    return _pdf_to_nodes(path, *args)
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    pages = [text_page([f'Page {n} line {i}: alpha beta gamma' for i in range(10)]) for n in (1, 2)]
+    return write_pdf(tmp_path / 'sample.pdf', pages)
+
+
+def test_workers_do_not_build_markdown(pdf_path, monkeypatch):
+    def extract(self, page):
+        raise AssertionError('markdown built for bulk ingest')
+
+    monkeypatch.setattr(MdExtractionStrategy, 'extract', extract)
+    path, digest, nodes, triage, scanned = ingest.pdf_to_nodes(str(pdf_path))
+    dicts = nodes.to_dicts()
+    assert path == str(pdf_path) and len(digest) == 64
+    assert dicts and {node['metadata']['page'] for node in dicts} == {1, 2}
+    assert 'alpha beta gamma' in dicts[0]['text']
+    assert scanned == []
+
+
+def test_dead_worker_fails_its_file_and_the_run_goes_on(tmp_path, monkeypatch):
+    docs = tmp_path / 'docs'
+    docs.mkdir()
+    for name in ('a', 'b', 'crash', 'd', 'e'):
+        write_pdf(docs / f'{name}.pdf', [text_page([f'{name} alpha beta gamma'])])
+    monkeypatch.setattr(ingest, 'pdf_to_nodes', pdf_to_nodes_or_die)
+    index = Index(str(tmp_path / 'index.db'))
+
+    # One file in flight at a time, so the pool is broken when the next file is submitted.
+    report = ingest.BulkIngest(index, workers=1, max_in_flight_mb=0).run(str(docs))
+    assert list(report['failed']) == [str(docs / 'crash.pdf')]
+    assert report['failed'][str(docs / 'crash.pdf')].startswith('BrokenProcessPool')
+    assert report['indexed'] == 4
+    assert sorted(Path(doc['path']).stem for doc in index.get_documents()) == ['a', 'b', 'd', 'e']
+    index.close()
+
+
+def test_bulk_ingest_indexes_new_and_changed_files_only(tmp_path):
+    docs = tmp_path / 'docs'
+    (docs / 'sub').mkdir(parents=True)
+    paths = [docs / 'a.pdf', docs / 'b.pdf', docs / 'sub' / 'c.pdf']
+    for path in paths:
+        write_pdf(path, [text_page([f'{path.stem} alpha beta gamma'])] * 2)
+    (docs / 'notes.txt').write_text('not a pdf')
+    assert ingest.expand_paths(str(docs)) == sorted(paths)
+    assert ingest.expand_paths(str(docs / '*.pdf')) == paths[:2]
+
+    index = Index(str(tmp_path / 'index.db'))
+    bulk = ingest.BulkIngest(index, workers=2, batch_size=2)
+    report = bulk.run(str(docs))
+    assert (report['found'], report['indexed'], report['unchanged'], report['failed']) == (3, 3, 0, {})
+    assert report['pages']
+    texts = [node['text'] for node in index.iter_nodes(str(docs / 'sub' / 'c.pdf'), ('text',))]
+    assert texts and all(text.startswith('c alpha') for text in texts)
+
+    write_pdf(paths[0], [text_page(['a changed'])])
+    os.utime(paths[0], ns=(1, 1))
+    paths[1].unlink()
+    report = bulk.run(str(docs))
+    assert (report['found'], report['indexed'], report['unchanged']) == (2, 1, 1)
+    assert report['removed'] == [str(paths[1])]
+    assert sorted(doc['name'] for doc in index.get_documents()) == ['a.pdf', 'c.pdf']
+    index.close()
+
+
+def test_unreadable_pdf_is_reported_as_failed(tmp_path):
+    docs = tmp_path / 'docs'
+    docs.mkdir()
+    write_pdf(docs / 'good.pdf', [text_page(['alpha'])])
+    (docs / 'bad.pdf').write_bytes(b'not a pdf at all')
+    index = Index(str(tmp_path / 'index.db'))
+    report = ingest.BulkIngest(index, workers=1).run(str(docs))
+    assert report['indexed'] == 1
+    assert list(report['failed']) == [str(docs / 'bad.pdf')]
+    index.close()
@@ -0,0 +1,105 @@
+import json
+
+import anyio
+import numpy as np
+import pytest
+
+from src.index.core import Index
+
+N_NODES = 7
+
+
+def add_doc(index: Index, directory, name: str, n: int, page: int = 1):
+    doc = directory / f'{name}.pdf'
+    doc.write_bytes(name.encode())
+    index.index_doc(str(doc), [
+        {'node_id': f'{name}-{i}', 'text': f'{name} {i}', 'metadata': {'page': page + i},
+         'embedding': np.full(4, i, dtype=np.float32).tobytes()}
+        for i in range(n)
+    ])
+    return doc
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = Index(str(tmp_path / 'index.db'))
+    add_doc(index, tmp_path, 'a', N_NODES)
+    add_doc(index, tmp_path, 'b', 3)
+    yield index
+    index.close()
+
+
+@pytest.mark.parametrize('batch_size', [1, 2, 3, N_NODES, 100])
+def test_iter_nodes_batches(index, tmp_path, batch_size):
+    nodes = list(index.iter_nodes(str(tmp_path / 'a.pdf'), ('node_id',), batch_size=batch_size))
+    assert [node['node_id'] for node in nodes] == [f'a-{i}' for i in range(N_NODES)]
+    assert [node['id'] for node in nodes] == sorted(node['id'] for node in nodes)
+
+    after = nodes[2]['id']
+    assert [node['node_id'] for node in index.iter_nodes(columns=('node_id',), after_id=after,
+                                                         batch_size=batch_size, limit=5)] == \
+        ['a-3', 'a-4', 'a-5', 'a-6', 'b-0']
+
+
+def test_batches_do_not_hold_a_snapshot(index, tmp_path):
+    nodes = index.iter_nodes(columns=('node_id',), batch_size=2)
+    seen = [next(nodes)['node_id'], next(nodes)['node_id']]
+    # Written between batches from another connection: later batches see it.
+    writer = Index(str(tmp_path / 'index.db'))
+    add_doc(writer, tmp_path, 'c', 2)
+    writer.close()
+    seen += [node['node_id'] for node in nodes]
+    assert seen[-2:] == ['c-0', 'c-1']
+    assert len(seen) == N_NODES + 5
+
+
+def test_columns_are_projected(index, tmp_path):
+    node = next(index.iter_nodes(columns=('page', 'element', 'embedding')))
+    assert set(node) == {'id', 'page', 'element', 'embedding'}
+    assert node['page'] == 1 and node['element'] is None
+    assert np.frombuffer(node['embedding'], dtype=np.float32).tolist() == [0, 0, 0, 0]
+
+    node = next(index.iter_nodes(columns=('doc_path', 'metadata')))
+    assert node['doc_path'] == str(tmp_path / 'a.pdf') and node['metadata'] == {'page': 1}
+
+    with pytest.raises(ValueError, match='vector'):
+        list(index.iter_nodes(columns=('vector',)))
+    with pytest.raises(ValueError, match='title'):
+        list(index.iter_documents(('title',)))
+
+
+def test_page_nodes_walks_every_node_once(index):
+    cursor, pages = 0, []
+    while cursor is not None:
+        items, cursor = index.page_nodes(cursor=cursor, limit=3, columns=('node_id',))
+        pages.append([item['node_id'] for item in items])
+    assert pages == [['a-0', 'a-1', 'a-2'], ['a-3', 'a-4', 'a-5'], ['a-6', 'b-0', 'b-1'], ['b-2']]
+
+    items, cursor = index.page_nodes(cursor=0, limit=10, columns=('node_id',), filters={'page_from': 5})
+    assert [item['node_id'] for item in items] == ['a-4', 'a-5', 'a-6'] and cursor is None
+    with pytest.raises(ValueError):
+        index.page_nodes(limit=0)
+
+
+def test_page_documents(index, tmp_path):
+    items, cursor = index.page_documents(limit=1, columns=('name',))
+    assert items == [{'id': items[0]['id'], 'name': 'a.pdf'}] and cursor == items[0]['id']
+    items, cursor = index.page_documents(cursor, limit=1, columns=('path',))
+    assert items[0]['path'] == str(tmp_path / 'b.pdf') and cursor is None
+    assert index.page_documents(cursor=items[0]['id']) == ([], None)
+
+
+def test_list_tools(server, index, monkeypatch):
+    monkeypatch.setattr(server, '_index', index)
+    monkeypatch.setattr(server, 'page_size', 4)
+    monkeypatch.setattr(server, 'max_page_size', 5)
+
+    listed = json.loads(anyio.run(server.list_nodes))
+    assert len(listed['items']) == 4 and listed['next_cursor'] == listed['items'][-1]['id']
+    listed = json.loads(anyio.run(server.list_nodes, '', listed['next_cursor'], 50, ['node_id', 'embedding']))
+    assert [item['node_id'] for item in listed['items']] == ['a-4', 'a-5', 'a-6', 'b-0', 'b-1']
+    assert listed['items'][0]['embedding'] == [4.0, 4.0, 4.0, 4.0]
+
+    documents = json.loads(anyio.run(server.list_documents, 0, 1))
+    assert [item['name'] for item in documents['items']] == ['a.pdf'] and documents['next_cursor']
+    assert anyio.run(server.list_nodes, '', 0, 0, ['vector']).startswith('Error:')
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from src.index.core import Index
+from src.index.search import HybridSearch, LexicalSearch, VectorSearch, reciprocal_rank_fusion
+from src.index.tokenizer import fts_query, token_runs
+
+TEXTS = {
+    'guide': '新進同仁入職指南：報到當天請攜帶證件',
+    'product': '精準定位模組 MTAN001-A 規格說明',
+    'company': 'About the company: founded in 1986, offices in Taipei',
+    'leave': '請假規定與特休天數說明',
+}
+
+
+def test_token_runs():
+    assert token_runs('入職指南') == [['入職', '職指', '指南']]
+    assert token_runs('MTAN001-A spec') == [['mtan001', 'a'], ['spec']]
+    assert token_runs('職') == [['職']]
+    assert fts_query('') == ''
+    assert fts_query('入職 MTAN001-A') == '"入職" OR "mtan001 a"'
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = Index(str(tmp_path / 'index.db'))
+    for i, (name, text) in enumerate(TEXTS.items()):
+        doc = tmp_path / f'{name}.pdf'
+        doc.write_bytes(text.encode())
+        vector = np.eye(len(TEXTS), dtype=np.float32)[i]
+        index.index_doc(str(doc), [{'node_id': name, 'text': text, 'embedding': vector.tobytes(), 'metadata': {}}])
+    yield index
+    index.close()
+
+
+def node_ids(results):
+    return [result['node_id'] for result in results]
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('入職', 'guide'),            # a two-character word inside a CJK run
+    ('特休', 'leave'),
+    ('MTAN001-A', 'product'),     # a code-like word, matched whole
+    ('mtan001-a', 'product'),
+    ('Founded', 'company'),
+])
+def test_lexical_search(index, query, expected):
+    assert node_ids(LexicalSearch(index).search(query, k=1)) == [expected]
+
+
+def test_unmatched_query_returns_nothing(index):
+    assert LexicalSearch(index).search('離職', k=5) == []
+    assert LexicalSearch(index).search('   ', k=5) == []
+
+
+def test_fts_follows_reindexing(index, tmp_path):
+    doc = tmp_path / 'leave.pdf'
+    doc.write_bytes(b'changed')
+    index.index_doc(str(doc), [{'node_id': 'leave2', 'text': '加班費計算方式', 'metadata': {}}])
+    search = LexicalSearch(index)
+    assert search.search('特休', k=5) == []
+    assert node_ids(search.search('加班', k=5)) == ['leave2']
+    index.remove_doc(str(doc))
+    assert search.search('加班', k=5) == []
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 1]], k=60)
+    assert [row_id for row_id, _ in fused] == [1, 3, 2]
+    assert fused[0][1] == pytest.approx(1 / 61 + 1 / 62)
+
+
+def test_hybrid_ranks_nodes_found_by_both_engines_first(index):
+    hybrid = HybridSearch(VectorSearch(index), LexicalSearch(index), candidates=4)
+    # Lexically only 'guide' matches; the vector points at 'leave' but also leans towards 'guide'.
+    query_embedding = np.array([0.6, 0.0, 0.0, 0.8], dtype=np.float32)
+    assert node_ids(hybrid.search('入職', query_embedding, k=2)) == ['guide', 'leave']
+    # Without an embedding, hybrid is lexical only.
+    assert node_ids(hybrid.search('入職', None, k=2)) == ['guide']
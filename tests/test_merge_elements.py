@@ -0,0 +1,59 @@
+import random
+
+import pytest
+
+from src.pdf.text import TopDownSerializeStrategy
+
+
+def insert_baseline(tuples, elements):
+    """The list.insert placement merge_elements_into_tuples replaced: before the line of the first char below."""
+    tuples = list(tuples)
+    for e in sorted(elements, key=lambda e: e['object']['top']):
+        for i, (text, obj) in enumerate(tuples):
+            if obj is not None and obj['top'] > e['object']['top']:
+                while i > 0 and tuples[i - 1][1] is not None:
+                    i -= 1
+                tuples.insert(i, ('\n' + e['content'] + '\n', None))
+                break
+        else:
+            tuples.append(('\n' + e['content'] + '\n', None))
+    return tuples
+
+
+def page(seed: int):
+    """Textmap-like tuples (lines of chars separated by '\\n') and elements at random heights."""
+    rng = random.Random(seed)
+    tuples, top = [], 0.0
+    for _ in range(rng.randint(1, 30)):
+        top += rng.choice([12.0, 14.0, 30.0])
+        for c in range(rng.randint(1, 8)):
+            tuples.append(('x', {'top': top, 'bottom': top + 10, 'x0': c * 5.0, 'x1': c * 5.0 + 5}))
+        tuples.append(('\n', None))
+    tops = [obj['top'] for _, obj in tuples if obj is not None]
+    elements = [{'content': f'element {i}',
+                 'object': {'top': rng.choice([rng.uniform(-10, top + 20), rng.choice(tops)]), 'bot': 0}}
+                for i in range(rng.randint(0, 12))]
+    return tuples, elements
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_merge_matches_insert_baseline(seed):
+    tuples, elements = page(seed)
+    merged = TopDownSerializeStrategy().merge_elements_into_tuples('ltr', 'ttb', tuples, elements)
+    assert merged == insert_baseline(tuples, elements)
+
+
+def test_bottom_to_top_lines():
+    # Lines are read upwards, so an element goes before the first line above it.
+    tuples = [('b', {'top': 50.0}), ('\n', None), ('a', {'top': 10.0})]
+    elements = [{'content': 'high', 'object': {'top': 5.0}}, {'content': 'low', 'object': {'top': 40.0}}]
+    merged = TopDownSerializeStrategy().merge_elements_into_tuples('ltr', 'btt', tuples, elements)
+    assert [text for text, _ in merged] == ['b', '\n', '\nlow\n', 'a', '\nhigh\n']
+
+
+def test_no_lines_or_no_elements():
+    strategy = TopDownSerializeStrategy()
+    elements = [{'content': 'b', 'object': {'top': 9.0}}, {'content': 'a', 'object': {'top': 1.0}}]
+    assert strategy.merge_elements_into_tuples('ltr', 'ttb', [], elements) == [('\na\n', None), ('\nb\n', None)]
+    tuples = [('x', {'top': 1.0})]
+    assert strategy.merge_elements_into_tuples('ltr', 'ttb', tuples, []) == tuples
@@ -0,0 +1,68 @@
+import multiprocessing
+import pickle
+
+import pytest
+
+from src.index.schema import NodeBatch, NodeRelationship, TextNode, new_node_id
+
+PREVIOUS, NEXT = NodeRelationship.PREVIOUS.value, NodeRelationship.NEXT.value
+
+
+def make_batch() -> NodeBatch:
+    return NodeBatch(['first', 'second', 'third'], [{'page': 1}, {'page': 1}, {'page': 2}])
+
+
+def test_to_dicts_links_neighbours():
+    batch = make_batch()
+    dicts = batch.to_dicts()
+    ids = [f'{batch.batch_id}-{i}' for i in range(3)]
+    assert [d['node_id'] for d in dicts] == ids
+    assert [d['text'] for d in dicts] == batch.texts
+    assert dicts[0]['metadata'] == {'page': 1, NEXT: ids[1]}
+    assert dicts[1]['metadata'] == {'page': 1, PREVIOUS: ids[0], NEXT: ids[2]}
+    assert dicts[2]['metadata'] == {'page': 2, PREVIOUS: ids[1]}
+    assert batch.metadata[0] == {'page': 1}  # links are not written into the batch
+
+
+def test_nodes_match_to_dicts():
+    batch = make_batch()
+    assert [node.to_dict() for node in batch.nodes()] == batch.to_dicts()
+
+
+def test_from_nodes_and_append():
+    nodes = [TextNode('a', {'page': 1}), TextNode('b')]
+    batch = NodeBatch.from_nodes(nodes)
+    batch.append('c')
+    assert len(batch) == 3
+    assert batch.texts == ['a', 'b', 'c']
+    assert batch.metadata == [{'page': 1}, {}, {}]
+    assert NodeBatch().to_dicts() == [] and list(NodeBatch().nodes()) == []
+
+
+def test_metadata_must_match_texts():
+    with pytest.raises(ValueError):
+        NodeBatch(['a', 'b'], [{}])
+
+
+def test_pickle_round_trip():
+    batch = make_batch()
+    copy = pickle.loads(pickle.dumps(batch))
+    assert copy.to_dicts() == batch.to_dicts()
+
+
+def _child_ids(queue):
+    queue.put([new_node_id(), NodeBatch(['x']).batch_id])
+
+
+@pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason='needs fork')
+def test_forked_children_do_not_repeat_ids():
+    context = multiprocessing.get_context('fork')
+    queue = context.Queue()
+    children = [context.Process(target=_child_ids, args=(queue,)) for _ in range(2)]
+    for child in children:
+        child.start()
+    ids = queue.get(timeout=30) + queue.get(timeout=30)
+    for child in children:
+        child.join()
+    ids += [new_node_id(), new_node_id()]
+    assert len(set(ids)) == len(ids)
@@ -0,0 +1,106 @@
+import json
+import sqlite3
+
+import numpy as np
+import pytest
+
+from src.index.core import Index
+from src.index.search import LexicalSearch, VectorSearch
+
+# (document, text, metadata); every node mentions 'policy' for the lexical search.
+NODES = [
+    ('a', 'policy intro', {'page': 1, 'element': 'text'}),
+    ('a', '|policy | table|', {'page': 2, 'element': 'table'}),
+    ('a', 'policy across pages', {'page': 3, 'last_page': 5, 'element': 'text'}),
+    ('b', 'policy figure ![chart](images/chart.png)', {'page': 4, 'element': 'image'}),
+    ('b', 'policy appendix 說明', {'page': 9, 'element': 'text'}),
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = Index(str(tmp_path / 'index.db'))
+    for name in ('a', 'b'):
+        doc = tmp_path / f'{name}.pdf'
+        doc.write_bytes(name.encode())
+        index.index_doc(str(doc), [
+            {'node_id': f'n{i}', 'text': text, 'metadata': metadata,
+             'embedding': np.ones(4, dtype=np.float32).tobytes()}
+            for i, (doc_name, text, metadata) in enumerate(NODES) if doc_name == name
+        ])
+    yield index
+    index.close()
+
+
+def matching(index: Index, filters) -> list:
+    nodes = index.get_nodes_by_ids(index.filter_ids(filters))
+    return sorted(node['node_id'] for node in nodes.values())
+
+
+@pytest.mark.parametrize('filters, expected', [
+    ({}, ['n0', 'n1', 'n2', 'n3', 'n4']),
+    ({'page_from': 4}, ['n2', 'n3', 'n4']),
+    ({'page_to': 2}, ['n0', 'n1']),
+    ({'page_from': 5, 'page_to': 5}, ['n2']),
+    ({'element': 'table'}, ['n1']),
+    ({'element': ['image', 'table']}, ['n1', 'n3']),
+    ({'element': 'text', 'page_from': 2}, ['n2', 'n4']),
+    ({'page_from': None, 'element': ''}, ['n0', 'n1', 'n2', 'n3', 'n4']),
+])
+def test_filter_clause(index, filters, expected):
+    assert matching(index, filters) == expected
+
+
+def test_doc_path_filter(index, tmp_path):
+    assert matching(index, {'doc_path': str(tmp_path / 'b.pdf')}) == ['n3', 'n4']
+    assert matching(index, {'doc_path': [str(tmp_path / 'a.pdf'), str(tmp_path / 'b.pdf')], 'page_to': 1}) == ['n0']
+    assert matching(index, {'doc_path': str(tmp_path / 'missing.pdf')}) == []
+
+
+def test_unknown_filter_is_rejected(index):
+    with pytest.raises(ValueError, match='page_number'):
+        index.filter_clause({'page_number': 1})
+
+
+def test_metadata_is_json(index):
+    stored = [row[0] for row in index._conn().execute('SELECT metadata FROM nodes ORDER BY id')]
+    assert [json.loads(value) for value in stored] == [metadata for _, _, metadata in NODES]
+    assert [node['metadata'] for node in index.iter_nodes()] == [metadata for _, _, metadata in NODES]
+
+
+@pytest.mark.parametrize('filters, expected', [
+    ({'element': 'table'}, ['n1']),
+    ({'page_from': 3, 'page_to': 4}, ['n2', 'n3']),
+])
+def test_filtered_search(index, filters, expected):
+    vector = VectorSearch(index).search(np.ones(4, dtype=np.float32), k=5, filters=filters)
+    lexical = LexicalSearch(index).search('policy', k=5, filters=filters)
+    assert sorted(result['node_id'] for result in vector) == expected
+    assert sorted(result['node_id'] for result in lexical) == expected
+
+
+def test_repr_metadata_is_migrated(tmp_path):
+    db_path = str(tmp_path / 'old.db')
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE documents (id INTEGER PRIMARY KEY AUTOINCREMENT, path TEXT UNIQUE, name TEXT, hash TEXT)')
+    conn.execute('CREATE TABLE nodes (id INTEGER PRIMARY KEY AUTOINCREMENT, doc_id INTEGER, node_id TEXT, '
+                 'embedding BLOB, metadata TEXT, text TEXT)')
+    conn.execute("INSERT INTO documents (path, name, hash) VALUES ('old.pdf', 'old.pdf', 'x')")
+    conn.executemany('INSERT INTO nodes (doc_id, node_id, metadata, text) VALUES (1, ?, ?, ?)', [
+        ('n0', repr({'page': 2, 'next': 'n1'}), 'intro'),
+        ('n1', repr({'page': 3, 'last_page': 4}), '|a | b|'),
+        ('n2', None, 'no metadata'),
+    ])
+    conn.commit()
+    conn.close()
+
+    index = Index(db_path)
+    rows = index._conn().execute('SELECT metadata, page, last_page, element FROM nodes ORDER BY id').fetchall()
+    assert [json.loads(row[0]) for row in rows] == [
+        {'page': 2, 'next': 'n1', 'element': 'text'},
+        {'page': 3, 'last_page': 4, 'element': 'table'},
+        {'element': 'text'},
+    ]
+    assert [row[1:] for row in rows] == [(2, 2, 'text'), (3, 4, 'table'), (None, None, 'text')]
+    assert matching(index, {'page_from': 4}) == ['n1']
+    index.close()
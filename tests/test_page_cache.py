@@ -0,0 +1,82 @@
+import os
+
+import pytest
+
+import src.pdf.pdf as pdf_module
+from src.pdf.cache import PageCache
+from src.pdf.extract import TokenBudgetChunkingStrategy
+from src.pdf.pdf import Pdf
+from src.pdf.text import TopDownSerializeStrategy
+from tests.pdf_samples import draw_image, image_xobject, table, text_page, write_pdf
+
+N_PAGES = 3
+
+
+@pytest.fixture
+def serialized(monkeypatch):
+    """Page numbers passed to TopDownSerializeStrategy.serialize."""
+    pages = []
+    serialize = TopDownSerializeStrategy.serialize
+
+    def counting_serialize(self, page, table_settings=None):
+        pages.append(page.page_number)
+        return serialize(self, page, table_settings)
+
+    monkeypatch.setattr(TopDownSerializeStrategy, 'serialize', counting_serialize)
+    return pages
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    pages = [text_page([f'page {n} line {i} alpha beta' for i in range(8)]) for n in range(1, N_PAGES + 1)]
+    pages[1] += table(50, 300, [['a', 'b'], ['1', '2']]) + [draw_image('Logo', 300, 300, 30, 30)]
+    return write_pdf(tmp_path / 'doc.pdf', pages, images={'Logo': image_xobject(2, 2, bytes(12))})
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return PageCache(str(tmp_path / 'page_cache.db'), 16)
+
+
+def run(pdf_path, out, cache, **kwargs) -> Pdf:
+    return Pdf(pdf_path, save_directory=out, page_cache=cache, **kwargs)
+
+
+def output(pdf: Pdf):
+    return pdf.text, [(node.text, node.metadata) for node in pdf.nodes], pdf.triage.pages
+
+
+def test_unchanged_pages_come_from_the_cache(pdf_path, tmp_path, cache, serialized):
+    first = run(pdf_path, tmp_path / 'a', cache)
+    assert serialized == [1, 2, 3]
+    second = run(pdf_path, tmp_path / 'b', cache)
+    assert serialized == [1, 2, 3]
+    assert output(second) == output(first)
+    assert [path.name for path in (second.md_directory / 'images').iterdir()]  # images are still saved
+
+
+def test_lazy_mode_shares_the_cache(pdf_path, tmp_path, cache, serialized):
+    lazy = run(pdf_path, tmp_path / 'a', cache, lazy=True)
+    texts = [page.text + str(len(page.nodes)) for page in lazy.iter_pages()]
+    assert serialized == [1, 2, 3]
+    eager = run(pdf_path, tmp_path / 'b', cache)
+    assert serialized == [1, 2, 3]
+    assert [page.text + str(len(page.nodes)) for page in eager.pages] == texts
+
+
+def test_config_version_and_content_changes_miss(pdf_path, tmp_path, cache, serialized, monkeypatch):
+    run(pdf_path, tmp_path / 'a', cache)
+    run(pdf_path, tmp_path / 'b', cache, chunking=TokenBudgetChunkingStrategy(64, 8))
+    assert serialized == [1, 2, 3] * 2
+    run(pdf_path, tmp_path / 'c', cache, tbl_settings={'snap_tolerance': 5})
+    assert serialized == [1, 2, 3] * 3
+
+    monkeypatch.setattr(pdf_module, 'PIPELINE_VERSION', pdf_module.PIPELINE_VERSION + 1)
+    run(pdf_path, tmp_path / 'd', cache)
+    assert serialized == [1, 2, 3] * 4
+
+    write_pdf(pdf_path, [text_page(['a new first page'])])
+    os.utime(pdf_path, ns=(1, 1))
+    changed = run(pdf_path, tmp_path / 'e', cache)
+    assert serialized == [1, 2, 3] * 4 + [1]
+    assert 'a new first page' in changed.text
@@ -0,0 +1,69 @@
+import pytest
+
+from src.index.schema import NodeRelationship
+from src.pdf.extract import TokenBudgetChunkingStrategy
+from src.pdf.pdf import Pdf
+from tests.pdf_samples import cjk_page, latin_page, text_page, write_pdf
+
+N_PAGES = 7
+
+
+@pytest.fixture(scope='module')
+def pdf_path(tmp_path_factory):
+    pages = [[cjk_page, latin_page][n % 2](n) if n % 3 else text_page([f'page {n} short end'])
+             for n in range(N_PAGES)]
+    return write_pdf(tmp_path_factory.mktemp('pipeline') / 'sample.pdf', pages)
+
+
+def chunking():
+    return TokenBudgetChunkingStrategy(max_tokens=120, overlap_tokens=16)
+
+
+def summary(nodes):
+    """Texts and metadata of linked nodes, checking that each links to its neighbours."""
+    for i, node in enumerate(nodes):
+        previous = node.relationships.get(NodeRelationship.PREVIOUS)
+        following = node.relationships.get(NodeRelationship.NEXT)
+        assert (previous.node_id if previous else None) == (nodes[i - 1].node_id if i else None)
+        assert (following.node_id if following else None) == (nodes[i + 1].node_id if i + 1 < len(nodes) else None)
+    return [(node.text, node.metadata) for node in nodes]
+
+
+@pytest.fixture(scope='module')
+def eager(pdf_path, tmp_path_factory):
+    return Pdf(pdf_path, chunking=chunking(), save_directory=tmp_path_factory.mktemp('eager'))
+
+
+def test_eager_pages_in_order(eager):
+    assert [page.page_number for page in eager.pages] == list(range(1, N_PAGES + 1))
+    assert len(eager.nodes) > N_PAGES
+    assert any('last_page' in node.metadata for node in eager.nodes)  # short page ends are merged
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3])
+def test_sharded_output_matches_eager(pdf_path, tmp_path, eager, chunk_size):
+    sharded = Pdf(pdf_path, chunking=chunking(), save_directory=tmp_path, workers=2, chunk_size=chunk_size)
+    assert [page.page_number for page in sharded.pages] == list(range(1, N_PAGES + 1))
+    assert sharded.text == eager.text
+    assert summary(sharded.nodes) == summary(eager.nodes)
+    assert sharded.triage.pages == eager.triage.pages
+
+
+def test_lazy_output_matches_eager(pdf_path, tmp_path, eager):
+    lazy = Pdf(pdf_path, chunking=chunking(), save_directory=tmp_path, lazy=True)
+    assert not hasattr(lazy, 'pages')  # nothing is serialized up front
+    assert summary(list(lazy.iter_nodes())) == summary(eager.nodes)
+    assert lazy.triage.pages == eager.triage.pages
+    assert lazy.write_md().read_text() == eager.text
+
+
+def test_lazy_pages_are_released(pdf_path, tmp_path):
+    lazy = Pdf(pdf_path, chunking=chunking(), save_directory=tmp_path, lazy=True)
+    seen = []
+    for page in lazy.iter_pages():
+        assert page.nodes
+        seen.append(page)
+    assert [page.page_number for page in seen] == list(range(1, N_PAGES + 1))
+    assert all(page._page is None for page in seen)
+    with pytest.raises(RuntimeError):
+        seen[0].text  # text was never read before the page was released
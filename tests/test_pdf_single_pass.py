@@ -0,0 +1,58 @@
+import multiprocessing
+
+import pytest
+
+from src.pdf.pdf import Pdf
+from src.pdf.text import TopDownSerializeStrategy
+from tests.pdf_samples import text_page, write_pdf
+
+N_PAGES = 6
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    pages = [text_page([f'Page {n} line {i}: alpha beta gamma' for i in range(20)]) for n in range(1, N_PAGES + 1)]
+    return write_pdf(tmp_path / 'sample.pdf', pages)
+
+
+@pytest.fixture
+def serialized_pages(tmp_path, monkeypatch):
+    """Page numbers passed to TopDownSerializeStrategy.serialize, in any process.
+
+    Each call appends a line to a file, so calls made in forked page-shard
+    workers are counted too.
+    """
+    log = tmp_path / 'serialize.log'
+    log.touch()
+    serialize = TopDownSerializeStrategy.serialize
+
+    def counting_serialize(self, page, table_settings=None):
+        with open(log, 'a') as file:
+            file.write(f'{page.page_number}\n')
+        return serialize(self, page, table_settings)
+
+    monkeypatch.setattr(TopDownSerializeStrategy, 'serialize', counting_serialize)
+    return lambda: sorted(int(line) for line in log.read_text().split())
+
+
+def test_eager_serializes_each_page_once(pdf_path, tmp_path, serialized_pages):
+    pdf = Pdf(pdf_path, save_directory=tmp_path / 'out')
+    assert pdf.text and pdf.nodes
+    assert serialized_pages() == list(range(1, N_PAGES + 1))
+
+
+def test_lazy_serializes_each_page_once(pdf_path, tmp_path, serialized_pages):
+    pdf = Pdf(pdf_path, save_directory=tmp_path / 'out', lazy=True)
+    for page in pdf.iter_pages():
+        assert page.text
+        assert page.nodes
+        assert page.text  # cached on the page, not serialized again
+    assert serialized_pages() == list(range(1, N_PAGES + 1))
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != 'fork',
+                    reason='the patched serialize only reaches forked workers')
+def test_sharded_serializes_each_page_once(pdf_path, tmp_path, serialized_pages):
+    pdf = Pdf(pdf_path, save_directory=tmp_path / 'out', workers=2, chunk_size=2)
+    assert [page.page_number for page in pdf.pages] == list(range(1, N_PAGES + 1))
+    assert serialized_pages() == list(range(1, N_PAGES + 1))
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from src.index.core import Index
+from src.index.quantize import PRECISIONS, QuantizedMatrix, decode, encode, row_dtype
+from src.index.search import VectorSearch, normalize
+
+DIM = 32
+
+
+def vectors(n: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal((n, DIM)).astype(np.float32)
+
+
+def add_doc(index: Index, path, matrix: np.ndarray):
+    path.write_bytes(path.name.encode())
+    index.index_doc(str(path), [{'node_id': f'{path.stem}-{i}', 'embedding': v.tobytes(), 'metadata': {}}
+                                for i, v in enumerate(matrix)])
+
+
+def stored_embeddings(index: Index) -> np.ndarray:
+    return np.stack([np.frombuffer(node['embedding'], dtype='<f4')
+                     for node in index.iter_nodes(columns=('embedding',))])
+
+
+@pytest.mark.parametrize('precision, atol', [('float32', 0), ('float16', 2e-3), ('int8', 2e-2)])
+def test_encode_decode_round_trip(precision, atol):
+    matrix = vectors(50)
+    buffer = encode(matrix, precision)
+    row_bytes = row_dtype(DIM, precision).itemsize
+    assert len(buffer) == 50 * row_bytes
+    # int8 error is bounded by half a step of each row's own scale.
+    np.testing.assert_allclose(decode(buffer, precision, row_bytes), matrix,
+                               atol=atol * np.abs(matrix).max())
+
+
+def test_int8_scale_is_per_row():
+    matrix = np.stack([np.full(DIM, 0.001, dtype=np.float32), np.full(DIM, 1000, dtype=np.float32),
+                       np.zeros(DIM, dtype=np.float32)])
+    decoded = decode(encode(matrix, 'int8'), 'int8', DIM + 4)
+    np.testing.assert_allclose(decoded, matrix, rtol=1e-6)
+
+
+@pytest.mark.parametrize('precision', PRECISIONS)
+def test_scores_are_cosine_similarities(precision):
+    matrix = vectors(3000)
+    query = normalize(vectors(1, seed=1)[0])
+    quantized = QuantizedMatrix.from_float32(matrix, precision, block=256)
+    expected = normalize(matrix) @ query
+    np.testing.assert_allclose(quantized.scores(query), expected, atol=0.02)
+    positions = np.array([2999, 5, 1024])
+    np.testing.assert_allclose(quantized.scores(query, positions), expected[positions], atol=0.02)
+
+
+def test_changing_precision_re_encodes_stored_embeddings(tmp_path):
+    matrix = vectors(20)
+    index = Index(str(tmp_path / 'index.db'))
+    add_doc(index, tmp_path / 'a.pdf', matrix)
+    index.close()
+
+    index = Index(str(tmp_path / 'index.db'), embedding_precision='int8')
+    row_bytes = index.get_embedding_buffer()[2]
+    assert row_bytes == DIM + 4
+    # Node dicts still carry float32 embeddings.
+    np.testing.assert_allclose(stored_embeddings(index), matrix, atol=0.02 * np.abs(matrix).max())
+    index.close()
+
+    # Reopening without a precision keeps the recorded one.
+    index = Index(str(tmp_path / 'index.db'))
+    assert index.embedding_precision == 'int8'
+    index.close()
+
+
+@pytest.mark.parametrize('stored, searched', [('float32', 'int8'), ('float16', 'int8'), ('int8', None)])
+def test_quantized_search_recall(tmp_path, stored, searched):
+    index = Index(str(tmp_path / 'index.db'), embedding_precision=stored)
+    add_doc(index, tmp_path / 'a.pdf', vectors(2000))
+    exact = VectorSearch(Index(str(tmp_path / 'exact.db')))
+    add_doc(exact.index, tmp_path / 'a.pdf', vectors(2000))
+    search = VectorSearch(index, precision=searched)
+    assert search.snapshot()[1].precision == (searched or stored)
+
+    queries = vectors(20, seed=2)
+    hits = sum(len(np.intersect1d(search.top_k(q, 10)[0], exact.top_k(q, 10)[0])) for q in queries)
+    assert hits / (len(queries) * 10) >= (1.0 if stored == 'float32' else 0.9)
+    index.close()
+    exact.index.close()
@@ -0,0 +1,50 @@
+import json
+import subprocess
+import sys
+
+from tests.conftest import ROOT
+
+# Records the path of every DiskLRU (table, page and embedding caches) opened while importing server.
+PROBE = """
+import json
+import sys
+import src.pdf.cache as cache
+opened = []
+init = cache.DiskLRU.__init__
+def recording_init(self, path, *args, **kwargs):
+    opened.append(type(self).__name__)
+    init(self, path, *args, **kwargs)
+cache.DiskLRU.__init__ = recording_init
+import server
+imported = list(opened)
+server.table_cache_path = sys.argv[1] + '/table_cache.db'
+server.get_table_cache()
+server.page_cache_path = sys.argv[1] + '/page_cache.db'
+server.get_page_cache()
+server.get_config_value(['embedding'], {})['cache'] = sys.argv[1] + '/embedding_cache.db'
+server.get_embedder()
+print(json.dumps({'imported': imported, 'used': opened}))
+"""
+
+
+def opened_caches(tmp_path):
+    out = subprocess.run([sys.executable, '-c', PROBE, str(tmp_path)], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def test_import_opens_no_table_cache(tmp_path):
+    caches = opened_caches(tmp_path)
+    assert 'TableCache' not in caches['imported']
+    assert caches['used'].count('TableCache') == 1
+
+
+def test_import_opens_no_page_cache(tmp_path):
+    caches = opened_caches(tmp_path)
+    assert 'PageCache' not in caches['imported']
+    assert caches['used'].count('PageCache') == 1
+
+
+def test_import_opens_no_embedding_cache(tmp_path):
+    caches = opened_caches(tmp_path)
+    assert caches['imported'] == []
+    assert caches['used'].count('EmbeddingCache') == 1
@@ -0,0 +1,48 @@
+import json
+
+import anyio
+import pytest
+
+from src.index.core import Index
+from src.pdf.text import LineAssemblySerializeStrategy
+from tests.pdf_samples import text_page, write_pdf
+
+
+@pytest.fixture
+def index_tool(server, tmp_path, monkeypatch):
+    """server.index writing to a fresh index, without caches or embedder, with its output under tmp_path."""
+    index = Index(str(tmp_path / 'index.db'))
+    monkeypatch.setattr(server, '_index', index)
+    monkeypatch.setattr(server, '_vector_search', None)
+    for accessor in ('get_table_cache', 'get_page_cache', 'get_embedder'):
+        monkeypatch.setattr(server, accessor, lambda: None)
+    monkeypatch.chdir(tmp_path)  # Pdf writes its markdown to ./processed_sources
+    yield lambda path: json.loads(anyio.run(server.index, str(path)))
+    index.close()
+
+
+def test_index_reports_what_it_wrote(index_tool, tmp_path):
+    pdf_path = write_pdf(tmp_path / 'sample.pdf', [text_page([f'line {i}: alpha beta gamma' for i in range(10)])])
+
+    first = index_tool(pdf_path)
+    assert first['indexed'] == 1 and first['unchanged'] == 0
+    assert first['nodes'] > 0
+    assert 'embedding' not in first
+
+    again = index_tool(pdf_path)
+    assert again['indexed'] == 0 and again['unchanged'] == 1 and again['nodes'] == 0
+
+
+def test_index_uses_the_configured_text_engine(index_tool, server, tmp_path, monkeypatch):
+    pages = []
+    serialize = LineAssemblySerializeStrategy.serialize
+
+    def counting_serialize(self, page, table_settings=None):
+        pages.append(page.page_number)
+        return serialize(self, page, table_settings)
+
+    monkeypatch.setattr(LineAssemblySerializeStrategy, 'serialize', counting_serialize)
+    monkeypatch.setattr(server, 'text_engine', 'numpy')
+    pdf_path = write_pdf(tmp_path / 'sample.pdf', [text_page(['alpha beta gamma'])] * 2)
+    assert index_tool(pdf_path)['indexed'] == 1
+    assert pages == [1, 2]
@@ -0,0 +1,66 @@
+import pytest
+from pdfplumber.page import Page
+
+from src.pdf.cache import TableCache
+from src.pdf.pdf import Pdf
+from src.pdf.text import TopDownSerializeStrategy
+from tests.pdf_samples import table, text_page, write_pdf
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    pages = [text_page(['before the table']) + table(50, 200, [['name', 'qty'], ['bolt', '12']]),
+             text_page(['a second table']) + table(50, 200, [['x', 'y'], ['1', '2'], ['3', '4']])]
+    return write_pdf(tmp_path / 'tables.pdf', pages)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return TableCache(str(tmp_path / 'table_cache.db'), 16)
+
+
+@pytest.fixture
+def table_searches(monkeypatch):
+    pages = []
+    find_tables = Page.find_tables
+
+    def counting_find_tables(self, *args, **kwargs):
+        pages.append(self.page_number)
+        return find_tables(self, *args, **kwargs)
+
+    monkeypatch.setattr(Page, 'find_tables', counting_find_tables)
+    return pages
+
+
+def run(pdf_path, out, cache, **kwargs) -> Pdf:
+    return Pdf(pdf_path, save_directory=out, serialization=TopDownSerializeStrategy(table_cache=cache), **kwargs)
+
+
+def test_warm_run_skips_table_detection(pdf_path, tmp_path, cache, table_searches):
+    cold = run(pdf_path, tmp_path / 'a', cache)
+    assert table_searches == [1, 2]
+    warm = run(pdf_path, tmp_path / 'b', cache)
+    assert table_searches == [1, 2]
+    assert warm.text == cold.text
+    assert '|bolt | 12|' in warm.text
+
+
+def test_key_covers_settings_and_content(pdf_path, tmp_path, cache, table_searches):
+    run(pdf_path, tmp_path / 'a', cache)
+    run(pdf_path, tmp_path / 'b', cache, tbl_settings={'snap_tolerance': 5})
+    assert table_searches == [1, 2, 1, 2]
+
+    write_pdf(pdf_path, [text_page(['changed']) + table(50, 200, [['new', 'cell']])])
+    changed = run(pdf_path, tmp_path / 'c', cache)
+    assert table_searches == [1, 2, 1, 2, 1]
+    assert '|new | cell|' in changed.text
+    assert cache.key('hash', 1, None) != cache.key('hash', 2, None) != cache.key('other', 2, None)
+
+
+def test_tables_round_trip(cache):
+    tables = [((10.0, 20.5, 110.0, 60.0), [['a', None], ['說明', '2']])]
+    cache.put_tables('k', tables)
+    assert cache.get_tables('k') == tables
+    assert cache.get_tables('missing') is None
+    cache.put_tables('empty', [])
+    assert cache.get_tables('empty') == []
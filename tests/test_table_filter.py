@@ -0,0 +1,46 @@
+import random
+
+import numpy as np
+import pdfplumber
+import pytest
+
+from src.pdf.text import TopDownSerializeStrategy
+from src.pdf.utils import midpoints_in_bboxes
+from tests.pdf_samples import PAGE_HEIGHT, latin, table, text_page, write_pdf
+
+
+def midpoint_in_any(obj, bboxes) -> bool:
+    """The per-object test the vectorized filter replaced."""
+    h_mid, v_mid = (obj['x0'] + obj['x1']) / 2, (obj['top'] + obj['bottom']) / 2
+    return any(b['x0'] <= h_mid < b['x1'] and b['top'] <= v_mid < b['bot'] for b in bboxes)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_midpoints_in_bboxes_matches_the_per_object_test(seed):
+    rng = random.Random(seed)
+    grid = [0, 10, 20, 30, 40]  # shared edges, so midpoints land exactly on box borders
+    objects = []
+    for _ in range(300):
+        x0, top = rng.choice([rng.uniform(0, 50), rng.choice(grid)]), rng.choice([rng.uniform(0, 50), rng.choice(grid)])
+        width, height = rng.choice([0, 10, 20, rng.uniform(0, 15)]), rng.choice([0, 10, 20, rng.uniform(0, 15)])
+        objects.append({'x0': x0, 'x1': x0 + width, 'top': top, 'bottom': top + height})
+    bboxes = [{'x0': 5, 'x1': 25, 'top': 5, 'bot': 15}, {'x0': 20, 'x1': 40, 'top': 10, 'bot': 30}]
+    expected = [midpoint_in_any(obj, bboxes) for obj in objects]
+    assert midpoints_in_bboxes(objects, bboxes).tolist() == expected
+    assert any(expected) and not all(expected)
+
+
+def test_no_objects_or_no_boxes():
+    assert midpoints_in_bboxes([], [{'x0': 0, 'x1': 1, 'top': 0, 'bot': 1}]).shape == (0,)
+    mask = midpoints_in_bboxes([{'x0': 0, 'x1': 1, 'top': 0, 'bottom': 1}], [])
+    assert mask.dtype == np.bool_ and mask.tolist() == [False]
+
+
+def test_table_text_only_appears_in_the_table(tmp_path):
+    rows = [['Name', 'Qty'], ['apple', '3'], ['pear', '5']]
+    ops = text_page(['Before the table']) + table(50, 120, rows) + [latin(50, PAGE_HEIGHT - 220, 'After the table')]
+    path = write_pdf(tmp_path / 'table.pdf', [ops])
+    with pdfplumber.open(path) as pdf:
+        text = TopDownSerializeStrategy().serialize(pdf.pages[0]).get_textmap().as_string
+    lines = [line for line in text.split('\n') if line.strip()]
+    assert lines == ['Before the table', '|Name | Qty|', '|-- | --|', '|apple | 3|', '|pear | 5|', 'After the table']
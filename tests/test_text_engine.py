@@ -0,0 +1,60 @@
+import pdfplumber
+import pytest
+
+import src.pdf.text as text
+from src.index.ingest import BulkIngest, pdf_to_nodes
+from src.pdf.lines import assemble_text
+from src.pdf.text import (AssembledPage, LineAssemblySerializeStrategy, TopDownSerializeStrategy,
+                          serialization_strategy)
+from tests.pdf_samples import cjk_page, gap_page, latin_page, write_pdf
+
+SEEDS = range(5)
+PAGES = {'cjk': cjk_page, 'latin': latin_page, 'gaps': gap_page}
+
+
+@pytest.fixture(scope='module')
+def samples(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('text_engine')
+    return {name: write_pdf(directory / f'{name}.pdf', [make_page(seed) for seed in SEEDS])
+            for name, make_page in PAGES.items()}
+
+
+@pytest.mark.parametrize('name', PAGES)
+def test_line_assembly_matches_textmap(samples, name):
+    strategy = LineAssemblySerializeStrategy()
+    with pdfplumber.open(samples[name]) as pdf:
+        for page in pdf.pages:
+            serialized = strategy.serialize(page)
+            assert isinstance(serialized, AssembledPage)  # the NumPy engine, not the textmap fallback
+            expected = page.get_textmap().as_string
+            assert expected.strip()
+            assert serialized.get_textmap().as_string == expected, f'{name} page {page.page_number}'
+
+
+def test_empty_and_rotated_chars():
+    assert assemble_text([]) == ''
+    assert assemble_text([{'upright': False, 'text': 'a', 'top': 0, 'x0': 0, 'x1': 1}]) is None
+
+
+def test_text_engine_names():
+    assert type(serialization_strategy('textmap')) is TopDownSerializeStrategy
+    assert type(serialization_strategy('numpy')) is LineAssemblySerializeStrategy
+    with pytest.raises(ValueError):
+        serialization_strategy('ocr')
+    with pytest.raises(ValueError):
+        BulkIngest(None, text_engine='ocr')
+
+
+def test_ingest_worker_uses_the_text_engine(samples, monkeypatch):
+    assembled = []
+
+    def counting_assemble_text(chars):
+        assembled.append(len(chars))
+        return assemble_text(chars)
+
+    monkeypatch.setattr(text, 'assemble_text', counting_assemble_text)
+    _, _, textmap_nodes, _, _ = pdf_to_nodes(str(samples['latin']))
+    assert assembled == []
+    _, _, numpy_nodes, _, _ = pdf_to_nodes(str(samples['latin']), text_engine='numpy')
+    assert len(assembled) == len(SEEDS)
+    assert [node['text'] for node in numpy_nodes.to_dicts()] == [node['text'] for node in textmap_nodes.to_dicts()]
@@ -0,0 +1,79 @@
+import pdfplumber
+import pytest
+from pdfplumber.page import Page
+
+from src.pdf.pdf import Pdf
+from src.pdf.text import TopDownSerializeStrategy
+from src.pdf.triage import (PAGE_IMAGE, PAGE_SCANNED, PAGE_TABLE, PAGE_TEXT, TriageReport, classify_page,
+                            may_have_tables)
+from tests.pdf_samples import draw_image, image_xobject, table, text_page, write_pdf
+
+PAGES = {
+    PAGE_TEXT: text_page(['just prose', 'more prose']),
+    PAGE_IMAGE: text_page(['a figure']) + [draw_image('Logo', 50, 200, 40, 40)],
+    PAGE_TABLE: text_page(['a table']) + table(50, 200, [['a', 'b'], ['1', '2']]),
+    PAGE_SCANNED: [draw_image('Logo', 50, 50, 400, 600)],
+}
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    return write_pdf(tmp_path / 'triage.pdf', list(PAGES.values()), images={'Logo': image_xobject(2, 2, bytes(12))})
+
+
+@pytest.fixture
+def table_searches(monkeypatch):
+    pages = []
+    find_tables = Page.find_tables
+
+    def counting_find_tables(self, *args, **kwargs):
+        pages.append(self.page_number)
+        return find_tables(self, *args, **kwargs)
+
+    monkeypatch.setattr(Page, 'find_tables', counting_find_tables)
+    return pages
+
+
+def test_classify_page(pdf_path):
+    with pdfplumber.open(pdf_path) as pdf:
+        assert [classify_page(page) for page in pdf.pages] == list(PAGES)
+
+
+def test_may_have_tables():
+    assert may_have_tables(PAGE_TABLE)
+    assert not may_have_tables(PAGE_TEXT)
+    assert not may_have_tables(PAGE_IMAGE, {'vertical_strategy': 'lines_strict'})
+    assert may_have_tables(PAGE_TEXT, {'vertical_strategy': 'text'})
+    assert may_have_tables(PAGE_IMAGE, {'horizontal_strategy': 'explicit'})
+
+
+def test_only_table_pages_are_searched_for_tables(pdf_path, tmp_path, table_searches):
+    pdf = Pdf(pdf_path, save_directory=tmp_path)
+    assert table_searches == [3]
+    assert '|a | b|' in pdf.pages[2].text
+    assert pdf.triage.pages == {PAGE_TEXT: 1, PAGE_IMAGE: 1, PAGE_TABLE: 1, PAGE_SCANNED: 1}
+    assert pdf.scanned_pages == [4]
+    assert pdf.pages[3].nodes == []
+
+    table_searches.clear()
+    Pdf(pdf_path, save_directory=tmp_path, tbl_settings={'vertical_strategy': 'text'})
+    assert table_searches == [1, 2, 3, 4]
+
+
+def test_text_page_serializes_to_its_textmap(pdf_path):
+    with pdfplumber.open(pdf_path) as pdf:
+        page = pdf.pages[0]
+        assert TopDownSerializeStrategy().serialize(page).get_textmap().as_string == page.get_textmap().as_string
+
+
+def test_report_round_trip():
+    report = TriageReport()
+    report.add(PAGE_TEXT, 0.25)
+    report.add(PAGE_TEXT, 0.25)
+    report.add(PAGE_SCANNED, 1.0)
+    total = TriageReport()
+    total.update(report.to_dict())
+    total.update(report.to_dict())
+    assert total.to_dict()[PAGE_TEXT] == {'pages': 4, 'seconds': 1.0}
+    assert total.to_dict()[PAGE_SCANNED] == {'pages': 2, 'seconds': 2.0}
+    assert total.to_dict()[PAGE_TABLE] == {'pages': 0, 'seconds': 0.0}
@@ -0,0 +1,74 @@
+import json
+
+import anyio
+import numpy as np
+import pytest
+
+from src.index.core import Index
+from src.index.search import VectorSearch, normalize, select_top_k
+
+DIM = 8
+N_NODES = 200
+
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(0).standard_normal((N_NODES, DIM)).astype(np.float32)
+
+
+@pytest.fixture
+def index(tmp_path, vectors):
+    index = Index(str(tmp_path / 'index.db'))
+    doc = tmp_path / 'doc.pdf'
+    doc.write_bytes(b'doc')
+    index.index_doc(str(doc), [{'node_id': f'n{i}', 'text': f'node {i}', 'embedding': v.tobytes(),
+                                'metadata': {'page': 1}} for i, v in enumerate(vectors)])
+    yield index
+    index.close()
+
+
+def test_select_top_k():
+    scores = np.array([0.1, 0.9, 0.5, 0.9, -1.0], dtype=np.float32)
+    assert select_top_k(scores, 3).tolist() == [1, 3, 2]
+    assert select_top_k(scores, 10).tolist() == [1, 3, 2, 0, 4]
+    assert select_top_k(scores, 0).tolist() == []
+
+
+def test_top_k_matches_a_full_sort(index, vectors):
+    search = VectorSearch(index)
+    for query in np.random.default_rng(1).standard_normal((10, DIM)).astype(np.float32):
+        expected = np.argsort(-(normalize(vectors) @ normalize(query)), kind='stable')[:10]
+        ids, scores = search.top_k(query * 3, 10)  # queries need not be unit length
+        assert [f'n{i}' for i in expected] == [node['node_id'] for node in search.search(query, 10)]
+        np.testing.assert_allclose(scores, np.sort(normalize(vectors) @ normalize(query))[::-1][:10], rtol=1e-5)
+        assert len(ids) == 10
+
+
+def test_k_and_dimension_edge_cases(index, tmp_path):
+    search = VectorSearch(index)
+    assert len(search.top_k(np.ones(DIM), N_NODES + 50)[0]) == N_NODES
+    assert len(search.top_k(np.ones(DIM), 0)[0]) == 0
+    with pytest.raises(ValueError, match='dimension'):
+        search.top_k(np.ones(DIM + 1), 5)
+    empty = Index(str(tmp_path / 'empty.db'))
+    assert len(VectorSearch(empty).top_k(np.ones(DIM), 5)[0]) == 0
+    empty.close()
+
+
+def test_deleted_nodes_are_dropped_from_results(index, tmp_path):
+    search = VectorSearch(index).load()
+    index.remove_doc(str(tmp_path / 'doc.pdf'))
+    assert search.search(np.ones(DIM), 5) == []
+    search.invalidate()
+    assert search.top_k(np.ones(DIM), 5)[0].tolist() == []
+
+
+def test_retrieve_tool(server, index, vectors, monkeypatch):
+    monkeypatch.setattr(server, '_index', index)
+    monkeypatch.setattr(server, '_vector_search', None)
+    monkeypatch.setattr(server, 'use_ann', False)
+    monkeypatch.setattr(server, 'get_embedder', lambda: None)
+    nodes = json.loads(anyio.run(server.retrieve, '', vectors[7].tolist(), 3))
+    assert nodes[0]['node_id'] == 'n7' and nodes[0]['score'] == pytest.approx(1.0)
+    assert len(nodes) == 3 and set(nodes[0]) >= {'id', 'node_id', 'doc_path', 'text', 'score', 'metadata'}
+    assert anyio.run(server.retrieve, '', [1.0, 2.0], 3).startswith('Error:')
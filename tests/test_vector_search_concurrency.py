@@ -0,0 +1,102 @@
+import threading
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import src.index.search as search_module
+from src.index.ann import IVFIndex
+from src.index.core import Index
+from src.index.search import VectorSearch
+
+DIM = 16
+
+
+def add_doc(index: Index, directory: Path, name: str, n_nodes: int, seed: int):
+    doc = directory / f'{name}.pdf'
+    doc.write_bytes(f'{name}:{seed}'.encode())
+    vectors = np.random.default_rng(seed).standard_normal((n_nodes, DIM)).astype(np.float32)
+    index.index_doc(str(doc), [{'node_id': f'{name}-{i}', 'text': f'node {i}', 'embedding': v.tobytes(),
+                                'metadata': {'page': 1}} for i, v in enumerate(vectors)])
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = Index(str(tmp_path / 'index.db'))
+    for n in range(4):
+        add_doc(index, tmp_path, f'doc{n}', 50, n)
+    yield index
+    index.close()
+
+
+def run_concurrently(search, index, tmp_path, searchers=4, rounds=20):
+    """Searches from several threads while another re-indexes a document and invalidates after each write."""
+    errors = []
+    stop = threading.Event()
+    queries = np.random.default_rng(99).standard_normal((8, DIM)).astype(np.float32)
+
+    def searcher():
+        try:
+            while not stop.is_set():
+                for query in queries:
+                    ids, scores = search.top_k(query, 5)
+                    assert len(ids) == len(scores) == 5
+                    ids, scores = search.top_k(query, 5, filters={'page_from': 1})
+                    assert len(ids) == len(scores)
+        except Exception as e:  # collected and re-raised in the test thread
+            errors.append(e)
+            stop.set()
+
+    threads = [threading.Thread(target=searcher) for _ in range(searchers)]
+    for thread in threads:
+        thread.start()
+    try:
+        for seed in range(100, 100 + rounds):
+            if stop.is_set():
+                break
+            add_doc(index, tmp_path, 'changing', 30, seed)
+            search.invalidate()
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+    if errors:
+        raise errors[0]
+
+
+@pytest.mark.parametrize('precision', [None, 'int8'])
+def test_search_while_invalidating(index, tmp_path, precision):
+    run_concurrently(VectorSearch(index, precision=precision), index, tmp_path)
+
+
+def test_ivf_search_while_invalidating(index, tmp_path):
+    run_concurrently(IVFIndex(index, n_lists=4, nprobe=4, path=str(tmp_path / 'index.ivf.npz')), index, tmp_path)
+
+
+def test_cold_cache_loads_once(index, monkeypatch):
+    calls = []
+    load_matrix = search_module.load_matrix
+    barrier = threading.Barrier(4)
+
+    def counting_load_matrix(*args, **kwargs):
+        calls.append(1)
+        return load_matrix(*args, **kwargs)
+
+    monkeypatch.setattr(search_module, 'load_matrix', counting_load_matrix)
+    search = VectorSearch(index)
+    query = np.ones(DIM, dtype=np.float32)
+
+    def searcher():
+        barrier.wait()
+        search.top_k(query, 3)
+
+    threads = [threading.Thread(target=searcher) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+
+    search.invalidate()
+    search.top_k(query, 3)
+    assert len(calls) == 2